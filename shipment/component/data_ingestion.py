@@ -1,15 +1,26 @@
-from msilib import schema
 from shipment.entity.config_entity import DataIngestionConfig
 from shipment.entity.artifact_entity import DataIngestionArtifact
+from shipment.entity.cleaning_engine import CleaningEngine
 from shipment.constant import *
-from shipment.util.util import read_yaml_file
+from shipment.config.registry import get_schema
+from shipment.util.columnar_store import ColumnarStoreWriter,is_columnar_store,COLUMN_KIND_CATEGORY, \
+    COLUMN_KIND_NUMERIC,COLUMN_KIND_DATETIME
+from shipment.util.raw_data_cache import RawDataCache,link_or_copy,get_local_source_path
+from shipment.util.split_manifest import SplitManifestWriter,is_split_manifest,read_split_manifest, \
+    SPLIT_MANIFEST_SNAPSHOTS_KEY,SNAPSHOT_SOURCE_SHA256_KEY,SNAPSHOT_STORE_ROWS_KEY
 from shipment.logger import logging
 from shipment.exception import ShipmentException
 import os,sys
+import hashlib
+import shutil
+import glob
+import json
 
-from urllib.request import urlretrieve
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
 from sklearn.model_selection import train_test_split
 import pandas as pd
+import numpy as np
 
 class DataIngestion:
 
@@ -18,7 +29,14 @@ class DataIngestion:
 
             logging.info(f"{'='*20}Data Ingestion log started.{'='*20} ")
             self.data_ingestion_config = data_ingestion_config
-            
+
+            schema_file_path = os.path.join(ROOT_DIR,CONFIG_DIR,'schema.yaml')
+            self.dataset_schema = get_schema(schema_file_path=schema_file_path)
+            self.cleaning_engine = CleaningEngine.from_schema(dataset_schema=self.dataset_schema.info)
+
+            self.raw_data_cache = RawDataCache(cache_dir=self.data_ingestion_config.raw_data_cache_dir)
+            self.raw_data_sha256 = None
+
         except Exception as e:
             raise ShipmentException(e,sys) from e
 
@@ -27,70 +45,509 @@ class DataIngestion:
             # getting download url 
             data_download_url = self.data_ingestion_config.dataset_download_url
 
+            # fetching into the raw data cache, unchanged sources are not transferred again
+            logging.info(f"Fetching file from :[{data_download_url}] into raw data cache :[{self.raw_data_cache.cache_dir}]")
+            self.raw_data_sha256 = self.raw_data_cache.fetch(source=data_download_url)
+
             # creating directory
             raw_data_dir = self.data_ingestion_config.raw_data_dir
-
-            if os.path.exists(raw_data_dir):
-                os.remove(raw_data_dir)
-
             os.makedirs(raw_data_dir,exist_ok=True)
 
-            # download file
+            # linking cached file into this run
             raw_data_file_path = os.path.join(self.data_ingestion_config.raw_data_dir,
-                                            os.path.basename(data_download_url))
+                                            os.path.basename(urlparse(data_download_url).path))
+
+            link_or_copy(source_path=self.raw_data_cache.get_object_path(self.raw_data_sha256),
+                         destination_path=raw_data_file_path)
+            logging.info(f"File :[{raw_data_file_path}] with sha256 [{self.raw_data_sha256}] is available.")
+            return raw_data_file_path
 
-            logging.info(f"Downloading file from :[{data_download_url}] into :[{raw_data_file_path}]")                            
-            urlretrieve(data_download_url,raw_data_file_path)
-            logging.info(f"File :[{raw_data_file_path}] has been downloaded successfully.")
-            
         except Exception as e:
             raise ShipmentException(e,sys) from e
 
-    def data_cleaner(self,df:pd.DataFrame) -> pd.DataFrame:
+    def is_batch_source(self) -> bool:
+        """
+        return: True when dataset_download_url is a local directory or glob of raw shard files
+        """
+        source_path = get_local_source_path(self.data_ingestion_config.dataset_download_url)
+        return source_path is not None and (os.path.isdir(source_path) or glob.has_magic(source_path))
+
+    def list_raw_batch_sources(self) -> list:
+        """
+        return: the csv files of a local dataset directory or the files matching a glob in name order,
+        else the dataset url itself as the only batch
+        """
         try:
-            schema_file_path = os.path.join(ROOT_DIR,CONFIG_DIR,'schema.yaml')
-            dataset_schema = read_yaml_file(file_path=schema_file_path)
+            data_download_url = self.data_ingestion_config.dataset_download_url
+            source_path = get_local_source_path(data_download_url)
+            if source_path is not None and os.path.isdir(source_path):
+                return [os.path.join(source_path,file_name) for file_name in sorted(os.listdir(source_path))
+                        if file_name.endswith(DATA_INGESTION_RAW_BATCH_FILE_EXTENSION)]
+            if source_path is not None and glob.has_magic(source_path):
+                return sorted(file_path for file_path in glob.glob(source_path) if os.path.isfile(file_path))
+            return [data_download_url]
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
 
-            target_column = dataset_schema[DATASET_TARGET_COLUMN_KEY]
-            numerical_columns = dataset_schema[DATASET_NUMERICAL_COLUMNS_KEY]
+    def download_shipment_batches(self) -> list:
+        """
+        Fetches every raw batch into the raw data cache and links it into raw_data_dir.
+        return: [{"source": batch, "sha256": checksum, "file_path": linked raw file}]
+        """
+        try:
+            raw_data_dir = self.data_ingestion_config.raw_data_dir
+            os.makedirs(raw_data_dir,exist_ok=True)
 
-            drop_col = ["index","ID","PQ #","PO / SO #","ASN/DN #"]
-            
-            if target_column in df.columns:
-                df[target_column] = df[target_column].apply(lambda x: pd.to_numeric(x,errors="coerce"))
-                df.dropna(subset=[target_column],axis=0,inplace=True)
-                df.reset_index(inplace=True)
-            else:
-                raise Exception(f"{target_column} NOT FOUND IN DATASET.")
+            batches = []
+            for source in self.list_raw_batch_sources():
+                sha256 = self.raw_data_cache.fetch(source=source)
+                raw_data_file_path = os.path.join(raw_data_dir,os.path.basename(urlparse(source).path))
+                link_or_copy(source_path=self.raw_data_cache.get_object_path(sha256),
+                             destination_path=raw_data_file_path)
+                batches.append({"source":source,"sha256":sha256,"file_path":raw_data_file_path})
+
+            logging.info(f"[{len(batches)}] raw batch files available in :[{raw_data_dir}]")
+            # the snapshot checksum covers the set of batches it was built from
+            self.raw_data_sha256 = hashlib.sha256(" ".join(sorted(batch["sha256"] for batch in batches)).encode()).hexdigest()
+            return batches
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
 
-            for col in numerical_columns: 
-                if col in df.columns:
-                    df[col] = df[col].apply(lambda x: pd.to_numeric(x,errors="coerce"))
-            
-            for d in drop_col:
-                if d in df.columns:
-                    df.drop(columns=[d],axis=1,inplace=True)
+    def get_ingestion_fingerprint(self) -> str:
+        """
+        Fingerprint of everything besides the raw data that shapes the ingested output,
+        a previous ingestion is only reused when it matches.
+        """
+        try:
+            ingestion_settings = {
+                "schema": self.dataset_schema.schema_hash,
+                "test_size": self.data_ingestion_config.test_size,
+                "random_state": self.data_ingestion_config.random_state,
+                # streaming, incremental and sharded ingestion route rows with the hash split
+                "hash_split": self.data_ingestion_config.streaming or self.data_ingestion_config.incremental \
+                              or self.is_batch_source(),
+                "split_key_column": self.data_ingestion_config.split_key_column,
+                "n_folds": self.data_ingestion_config.n_folds,
+                "export_split_csv": self.data_ingestion_config.export_split_csv,
+            }
+            return hashlib.sha256(json.dumps(ingestion_settings,sort_keys=True,default=str).encode()).hexdigest()
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    @staticmethod
+    def is_artifact_available(data_ingestion_artifact:DataIngestionArtifact) -> bool:
+        """
+        return: True when the store, split manifest and exported csv files of the artifact all exist
+        """
+        for file_path in [data_ingestion_artifact.train_file_path,data_ingestion_artifact.test_file_path]:
+            if file_path is not None and not os.path.exists(file_path):
+                return False
+        return is_columnar_store(data_ingestion_artifact.store_path) \
+               and is_split_manifest(data_ingestion_artifact.split_manifest_path)
+
+    def get_reusable_ingestion_artifact(self) -> DataIngestionArtifact:
+        """
+        return: artifact of the last successful ingestion of the same raw data and settings
+        when all of its files still exist, else None
+        """
+        try:
+            previous_artifact = self.raw_data_cache.get_last_ingestion(
+                source=self.data_ingestion_config.dataset_download_url,
+                sha256=self.raw_data_sha256,
+                ingestion_fingerprint=self.get_ingestion_fingerprint())
+
+            if previous_artifact is None:
+                return None
+
+            previous_artifact = DataIngestionArtifact(**previous_artifact)
+            if not self.is_artifact_available(previous_artifact):
+                return None
+            return previous_artifact._replace(message=f"Raw data unchanged, reusing previous data ingestion.")
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
 
+    def data_cleaner(self,df:pd.DataFrame) -> pd.DataFrame:
+        try:
+            df,cleaning_report = self.cleaning_engine.clean(df=df)
+
+            logging.info(f"Cleaned [{cleaning_report.input_rows}] rows into [{cleaning_report.output_rows}] rows, "
+                         f"dropped columns: {cleaning_report.dropped_columns}")
+            for column,counts in cleaning_report.column_report.items():
+                if counts["sentinel"] or counts["coerced"]:
+                    logging.info(f"Column [{column}] sentinel values: [{counts['sentinel']}] "
+                                 f"coerced to NaN: [{counts['coerced']}]")
             return df
         except Exception as e:
             raise ShipmentException(e,sys) from e
 
     def train_test_columns_category_check(self,train_df:pd.DataFrame,test_df:pd.DataFrame)->pd.DataFrame:
         try:
-            schema_file_path = os.path.join(os.getcwd(),CONFIG_DIR,"schema.yaml")
+            # rows with categories outside the schema domain are dropped in one pass
+            test_df,domain_filter_report = self.cleaning_engine.filter_domain(test_df)
+
+            for column,column_report in domain_filter_report.column_report.items():
+                logging.info(f"Column [{column}]: [{column_report['dropped']}] rows with unknown categories "
+                             f"e.g. {column_report['unknown_values']}")
+            logging.info(f"train test column category checking completed, "
+                         f"rows: [{domain_filter_report.input_rows}] -> [{domain_filter_report.output_rows}]")
+            return test_df
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
 
-            dataset_schema_info = read_yaml_file(file_path=schema_file_path)
+    def get_split_hash(self,df:pd.DataFrame) -> np.ndarray:
+        """
+        Salted 64 bit hash of the split key of every raw row.
+        df: raw (not yet cleaned) dataframe
+        return: np.array of uint64 aligned with df
+        """
+        try:
+            split_key_column = self.data_ingestion_config.split_key_column
+            random_state = self.data_ingestion_config.random_state
 
-            for column in test_df.columns:
-                if column in dataset_schema_info[DATASET_DOMAIN_VALUE_KEY].keys():
-                    category = test_df[column].value_counts().to_dict().keys()
-                    for cat in category:
-                        if cat not in dataset_schema_info[DATASET_DOMAIN_VALUE_KEY][column]:
-                            # droping the category of column
-                            test_df.drop(test_df[test_df[column]==cat].index,axis=0,inplace=True)
+            if split_key_column in df.columns:
+                split_key = df[split_key_column].astype(str)
             else:
-                logging.info("train test column category checking completed.")
-            return test_df
+                split_key = df.astype(str)
+
+            hash_key = f"{random_state:016d}"[-16:]
+            return pd.util.hash_pandas_object(split_key,index=False,hash_key=hash_key).to_numpy()
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_test_split_mask(self,df:pd.DataFrame,row_hash:np.ndarray=None) -> pd.Series:
+        """
+        Deterministic hash split of raw rows.
+        A row goes to test when the salted hash of its split key falls in the
+        lowest test_size share of the hash space, so the decision depends only
+        on the row itself and not on the chunk or file it was read from.
+        df: raw (not yet cleaned) dataframe
+        row_hash: precomputed get_split_hash(df)
+        return: boolean series aligned with df.index, True for test rows
+        """
+        try:
+            test_size = self.data_ingestion_config.test_size
+            if row_hash is None:
+                row_hash = self.get_split_hash(df=df)
+
+            is_test = (row_hash % HASH_SPLIT_BUCKETS) < int(round(test_size * HASH_SPLIT_BUCKETS))
+            return pd.Series(is_test,index=df.index)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_fold_ids(self,row_hash:np.ndarray) -> np.ndarray:
+        """
+        Cross validation fold of every row, taken from the hash bits above the ones deciding the split,
+        so folds are as stable as the train/test membership.
+        """
+        try:
+            return ((row_hash // HASH_SPLIT_BUCKETS) % self.data_ingestion_config.n_folds).astype(np.int8)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_store_column_kinds(self) -> dict:
+        """
+        Maps the schema columns to the columnar store kinds:
+        datetime columns -> datetime64, numerical and target columns -> float, everything else -> dictionary codes.
+        """
+        try:
+            column_kinds = {column:COLUMN_KIND_CATEGORY for column in self.dataset_schema.columns}
+            for column in self.dataset_schema.numerical_columns:
+                column_kinds[column] = COLUMN_KIND_NUMERIC
+            column_kinds[self.dataset_schema.target_column] = COLUMN_KIND_NUMERIC
+            for column in self.dataset_schema.datetime_columns:
+                column_kinds[column] = COLUMN_KIND_DATETIME
+            return column_kinds
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_store_writer(self,store_dir:str) -> ColumnarStoreWriter:
+        return ColumnarStoreWriter(store_dir=store_dir,
+                                   column_kinds=self.get_store_column_kinds(),
+                                   datetime_format=self.dataset_schema.datetime_format)
+
+    def get_split_manifest_details(self,split_method:str,store_rows:int,previous_snapshots:list=None) -> dict:
+        """
+        store_rows: rows of the ingested store
+        previous_snapshots: snapshots of the ingestion the store was extended from
+        """
+        snapshot = {SNAPSHOT_SOURCE_SHA256_KEY:self.raw_data_sha256,SNAPSHOT_STORE_ROWS_KEY:store_rows}
+        return {"source_sha256":self.raw_data_sha256,
+                "ingestion_fingerprint":self.get_ingestion_fingerprint(),
+                "split_method":split_method,
+                "split_key_column":self.data_ingestion_config.split_key_column,
+                "random_state":self.data_ingestion_config.random_state,
+                "test_size":self.data_ingestion_config.test_size,
+                "n_folds":self.data_ingestion_config.n_folds,
+                SPLIT_MANIFEST_SNAPSHOTS_KEY:list(previous_snapshots or []) + [snapshot]}
+
+    def prepare_split_csv_files(self,shipment_file_name:str):
+        """
+        return: train and test csv file paths, both None when the split csv export is disabled
+        """
+        try:
+            if not self.data_ingestion_config.export_split_csv:
+                return None,None
+
+            train_file_path = os.path.join(self.data_ingestion_config.ingested_train_dir,shipment_file_name)
+            test_file_path = os.path.join(self.data_ingestion_config.ingested_test_dir,shipment_file_name)
+
+            os.makedirs(self.data_ingestion_config.ingested_train_dir,exist_ok=True)
+            os.makedirs(self.data_ingestion_config.ingested_test_dir,exist_ok=True)
+
+            for file_path in [train_file_path,test_file_path]:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            return train_file_path,test_file_path
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    @staticmethod
+    def append_to_csv(df:pd.DataFrame,file_path:str) -> int:
+        """
+        Appends the rows of df to file_path, writing the header only when the file is new.
+        Nothing is written when file_path is None.
+        return: number of rows
+        """
+        try:
+            if file_path is not None:
+                df.to_csv(file_path,mode="a",header=not os.path.exists(file_path),index=False)
+            return len(df)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def write_split(self,shipment_data:pd.DataFrame,is_test:pd.Series,fold_ids:np.ndarray,
+                    train_file_path:str,test_file_path:str,
+                    store_writer:ColumnarStoreWriter,manifest_writer:SplitManifestWriter):
+        """
+        Appends cleaned rows once to the ingested store and records their split in the manifest.
+        Test rows with categories outside the schema domain are left out.
+        is_test, fold_ids: aligned with shipment_data
+        return: train rows, test rows written
+        """
+        try:
+            test_data = shipment_data[is_test]
+            test_data = self.train_test_columns_category_check(train_df=None,test_df=test_data)
+
+            keep = ~is_test | shipment_data.index.isin(test_data.index)
+            shipment_data,is_test,fold_ids = shipment_data[keep],is_test[keep].to_numpy(),fold_ids[keep.to_numpy()]
+
+            row_numbers = np.arange(len(shipment_data)) + store_writer.rows
+            store_writer.append(shipment_data)
+            manifest_writer.add(train_rows=row_numbers[~is_test],
+                                test_rows=row_numbers[is_test],
+                                fold_ids=fold_ids[~is_test])
+
+            train_rows = self.append_to_csv(df=shipment_data[~is_test],file_path=train_file_path)
+            test_rows = self.append_to_csv(df=shipment_data[is_test],file_path=test_file_path)
+            return train_rows,test_rows
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def split_file_in_chunks(self,shipment_file_path:str,train_file_path:str,test_file_path:str,
+                             store_writer:ColumnarStoreWriter,manifest_writer:SplitManifestWriter):
+        """
+        Reads shipment_file_path chunk by chunk, cleans and hash splits every chunk and appends
+        the rows to the ingested store, the split manifest and the train/test csv files.
+        return: train rows, test rows written
+        """
+        try:
+            chunk_size = self.data_ingestion_config.chunk_size
+            target_column = self.cleaning_engine.target_column
+            train_rows,test_rows = 0,0
+
+            logging.info(f"Streaming csv file: [{shipment_file_path}] in chunks of [{chunk_size}] rows")
+            for chunk_number,shipment_chunk in enumerate(pd.read_csv(shipment_file_path,chunksize=chunk_size)):
+                row_hash = pd.Series(self.get_split_hash(df=shipment_chunk),index=shipment_chunk.index)
+
+                shipment_chunk = self.data_cleaner(df=shipment_chunk)
+                row_hash = row_hash.loc[shipment_chunk.index].to_numpy()
+
+                # keeping the target as the last column, same as the in-memory split
+                columns = [column for column in shipment_chunk.columns if column != target_column]
+                shipment_chunk = shipment_chunk[columns + [target_column]]
+
+                chunk_train_rows,chunk_test_rows = self.write_split(
+                    shipment_data=shipment_chunk,
+                    is_test=self.get_test_split_mask(df=shipment_chunk,row_hash=row_hash),
+                    fold_ids=self.get_fold_ids(row_hash=row_hash),
+                    train_file_path=train_file_path,
+                    test_file_path=test_file_path,
+                    store_writer=store_writer,
+                    manifest_writer=manifest_writer)
+                train_rows += chunk_train_rows
+                test_rows += chunk_test_rows
+                logging.info(f"Chunk [{chunk_number}] ingested. train rows: [{train_rows}] test rows: [{test_rows}]")
+
+            return train_rows,test_rows
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def split_shard(self,shard_file_path:str,shard_dir:str) -> dict:
+        """
+        Cleans and splits one raw shard into its own store, split manifest and csv files under shard_dir.
+        return: paths of the shard outputs
+        """
+        try:
+            shard_output = {"train_file_path":None,"test_file_path":None,
+                            "store_path":os.path.join(shard_dir,os.path.basename(self.data_ingestion_config.ingested_store_dir)),
+                            "split_manifest_path":os.path.join(shard_dir,os.path.basename(self.data_ingestion_config.split_manifest_dir))}
+            if self.data_ingestion_config.export_split_csv:
+                shard_output["train_file_path"] = os.path.join(shard_dir,f"{DATA_INGESTION_TRAIN_SPLIT_NAME}.csv")
+                shard_output["test_file_path"] = os.path.join(shard_dir,f"{DATA_INGESTION_TEST_SPLIT_NAME}.csv")
+            os.makedirs(shard_dir,exist_ok=True)
+
+            store_writer = self.get_store_writer(store_dir=shard_output["store_path"])
+            manifest_writer = SplitManifestWriter(manifest_dir=shard_output["split_manifest_path"])
+            self.split_file_in_chunks(shipment_file_path=shard_file_path,
+                                      train_file_path=shard_output["train_file_path"],
+                                      test_file_path=shard_output["test_file_path"],
+                                      store_writer=store_writer,
+                                      manifest_writer=manifest_writer)
+            store_writer.close()
+            manifest_writer.close()
+            return shard_output
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    @staticmethod
+    def append_csv_file(source_file_path:str,destination_file_path:str):
+        """
+        Appends the rows of one csv file to another byte for byte, without parsing.
+        The header of source_file_path is skipped when destination_file_path already exists
+        and must be identical to its header.
+        """
+        try:
+            if source_file_path is None or destination_file_path is None or not os.path.exists(source_file_path):
+                return
+            with open(source_file_path,"rb") as source_file:
+                header = source_file.readline()
+                if os.path.exists(destination_file_path):
+                    with open(destination_file_path,"rb") as destination_file:
+                        destination_header = destination_file.readline()
+                    if header != destination_header:
+                        raise Exception(f"Header of [{source_file_path}] does not match [{destination_file_path}]")
+                    with open(destination_file_path,"ab") as destination_file:
+                        shutil.copyfileobj(source_file,destination_file)
+                else:
+                    with open(destination_file_path,"wb") as destination_file:
+                        destination_file.write(header)
+                        shutil.copyfileobj(source_file,destination_file)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    @staticmethod
+    def link_split(store_path:str,split_manifest_path:str,
+                   store_writer:ColumnarStoreWriter,manifest_writer:SplitManifestWriter) -> int:
+        """
+        Adds an existing store and its split manifest to the ones being written, without copying rows.
+        return: number of rows added
+        """
+        try:
+            row_offset = store_writer.rows
+            rows = store_writer.link_store(source_store_dir=store_path)
+            manifest_writer.extend(source_manifest_dir=split_manifest_path,row_offset=row_offset)
+            return rows
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_n_jobs(self) -> int:
+        n_jobs = self.data_ingestion_config.n_jobs
+        if n_jobs is None or n_jobs < 1:
+            return os.cpu_count() or 1
+        return n_jobs
+
+    def split_files(self,file_paths:list,train_file_path:str,test_file_path:str,
+                    store_writer:ColumnarStoreWriter,manifest_writer:SplitManifestWriter):
+        """
+        Cleans and splits raw shard files into the given store, split manifest and csv files.
+        With more than one worker the shards are processed in a process pool, each into its own
+        directory, and merged afterwards in shard order: csv files are concatenated byte for byte,
+        store segments are linked and manifests are offset, so no shard is loaded again in the main process.
+        """
+        try:
+            n_jobs = min(self.get_n_jobs(),len(file_paths))
+            if n_jobs <= 1:
+                for file_path in file_paths:
+                    self.split_file_in_chunks(shipment_file_path=file_path,
+                                              train_file_path=train_file_path,
+                                              test_file_path=test_file_path,
+                                              store_writer=store_writer,
+                                              manifest_writer=manifest_writer)
+                return
+
+            shards_dir = os.path.join(self.data_ingestion_config.ingested_dir,DATA_INGESTION_SHARDS_DIR_NAME)
+            logging.info(f"Splitting [{len(file_paths)}] raw shards with [{n_jobs}] workers into [{shards_dir}]")
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                shard_outputs = list(executor.map(split_shard,
+                                                  [self.data_ingestion_config]*len(file_paths),
+                                                  file_paths,
+                                                  [os.path.join(shards_dir,f"{shard_number:05d}")
+                                                   for shard_number in range(len(file_paths))]))
+
+            for shard_output in shard_outputs:
+                self.append_csv_file(source_file_path=shard_output["train_file_path"],
+                                     destination_file_path=train_file_path)
+                self.append_csv_file(source_file_path=shard_output["test_file_path"],
+                                     destination_file_path=test_file_path)
+                self.link_split(store_path=shard_output["store_path"],
+                                split_manifest_path=shard_output["split_manifest_path"],
+                                store_writer=store_writer,
+                                manifest_writer=manifest_writer)
+
+            # merged store holds its own links to the shard segments
+            shutil.rmtree(shards_dir)
+            logging.info(f"Merged [{len(shard_outputs)}] shards into [{store_writer.store_dir}]")
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_data_ingestion_artifact(self,train_file_path:str,test_file_path:str,message:str) -> DataIngestionArtifact:
+        try:
+            logging.info(f"Exported dataset to store: [{self.data_ingestion_config.ingested_store_dir}] "
+                         f"with split manifest: [{self.data_ingestion_config.split_manifest_dir}]")
+            if train_file_path is not None:
+                logging.info(f"Exported train dataset to file: [{train_file_path}]")
+                logging.info(f"Exported test dataset to file: [{test_file_path}]")
+
+            data_ingestion_artifact = DataIngestionArtifact(train_file_path=train_file_path,
+                                test_file_path=test_file_path,
+                                store_path=self.data_ingestion_config.ingested_store_dir,
+                                split_manifest_path=self.data_ingestion_config.split_manifest_dir,
+                                is_ingested=True,
+                                message=message
+                                )
+
+            logging.info(f"Data Ingestion artifact:[{data_ingestion_artifact}]")
+            return data_ingestion_artifact
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def split_data_as_train_test_streaming(self) -> DataIngestionArtifact:
+        try:
+            raw_data_dir = self.data_ingestion_config.raw_data_dir
+
+            shipment_file_name = os.listdir(raw_data_dir)[0]
+
+            shipment_file_path = os.path.join(raw_data_dir,shipment_file_name)
+
+            train_file_path,test_file_path = self.prepare_split_csv_files(shipment_file_name=shipment_file_name)
+
+            store_writer = self.get_store_writer(store_dir=self.data_ingestion_config.ingested_store_dir)
+            manifest_writer = SplitManifestWriter(manifest_dir=self.data_ingestion_config.split_manifest_dir)
+
+            self.split_file_in_chunks(shipment_file_path=shipment_file_path,
+                                      train_file_path=train_file_path,
+                                      test_file_path=test_file_path,
+                                      store_writer=store_writer,
+                                      manifest_writer=manifest_writer)
+
+            store_writer.close()
+            manifest_writer.close(**self.get_split_manifest_details(split_method=SPLIT_METHOD_HASH,
+                                                                    store_rows=store_writer.rows))
+
+            return self.get_data_ingestion_artifact(train_file_path=train_file_path,
+                                                    test_file_path=test_file_path,
+                                                    message=f"Data ingestion completed successfully in streaming mode.")
+
         except Exception as e:
             raise ShipmentException(e,sys) from e
 
@@ -104,57 +561,198 @@ class DataIngestion:
 
             logging.info(f"Reading csv file: [{shipment_file_path}]")
             shipment_data_frame = pd.read_csv(shipment_file_path)
+            row_hash = pd.Series(self.get_split_hash(df=shipment_data_frame),index=shipment_data_frame.index)
 
             logging.info(f"Data cleaning process started")
             shipment_data_frame = self.data_cleaner(df=shipment_data_frame)
             logging.info("Data cleaning is done")
 
-            X_train, X_test, y_train, y_test = train_test_split(shipment_data_frame.drop(["Freight Cost (USD)"],axis=1),
-                                                                shipment_data_frame["Freight Cost (USD)"],
-                                                                test_size=0.2,
-                                                                 random_state=42
-                                                                 )
+            target_column = self.cleaning_engine.target_column
+            X_train, X_test, y_train, y_test = train_test_split(shipment_data_frame.drop([target_column],axis=1),
+                                                                shipment_data_frame[target_column],
+                                                                test_size=self.data_ingestion_config.test_size,
+                                                                random_state=self.data_ingestion_config.random_state
+                                                                )
             train_data = X_train.join(y_train)
             test_data = X_test.join(y_test)
             
             # making the category of test data same as of train data
             test_data = self.train_test_columns_category_check(train_df=train_data,test_df=test_data)
 
-            train_file_path = os.path.join(self.data_ingestion_config.ingested_train_dir,
-                                            shipment_file_name)
+            # the store keeps the cleaned rows once in file order, the manifest keeps the shuffled split order
+            is_kept = shipment_data_frame.index.isin(train_data.index) | shipment_data_frame.index.isin(test_data.index)
+            shipment_data_frame = shipment_data_frame.loc[is_kept,list(train_data.columns)]
+
+            store_writer = self.get_store_writer(store_dir=self.data_ingestion_config.ingested_store_dir)
+            store_writer.append(shipment_data_frame)
+            store_writer.close()
 
-            test_file_path = os.path.join(self.data_ingestion_config.ingested_test_dir,
-                                        shipment_file_name)
+            manifest_writer = SplitManifestWriter(manifest_dir=self.data_ingestion_config.split_manifest_dir)
+            manifest_writer.add(train_rows=shipment_data_frame.index.get_indexer(train_data.index),
+                                test_rows=shipment_data_frame.index.get_indexer(test_data.index),
+                                fold_ids=self.get_fold_ids(row_hash=row_hash.loc[train_data.index].to_numpy()))
+            manifest_writer.close(**self.get_split_manifest_details(split_method=SPLIT_METHOD_TRAIN_TEST_SPLIT,
+                                                                    store_rows=store_writer.rows))
 
-            if train_data is not None:
-                os.makedirs(self.data_ingestion_config.ingested_train_dir,exist_ok=True)
+            train_file_path,test_file_path = self.prepare_split_csv_files(shipment_file_name=shipment_file_name)
+
+            if train_file_path is not None:
                 logging.info(f"Exporting train dataset to file: [{train_file_path}]")
                 train_data.to_csv(train_file_path,index=False)
             
-            if test_data is not None:
-                os.makedirs(self.data_ingestion_config.ingested_test_dir,exist_ok=True)
+            if test_file_path is not None:
                 logging.info(f"Exporting test dataset to file: [{test_file_path}]")
                 test_data.to_csv(test_file_path,index=False)
 
-            data_ingestion_artifact = DataIngestionArtifact(train_file_path=train_file_path,
-                                test_file_path=test_file_path,
-                                is_ingested=True,
-                                message=f"Data ingestion completed successfully."
-                                )
-            
-            logging.info(f"Data Ingestion artifact:[{data_ingestion_artifact}]")
-            return data_ingestion_artifact    
+            return self.get_data_ingestion_artifact(train_file_path=train_file_path,
+                                                    test_file_path=test_file_path,
+                                                    message=f"Data ingestion completed successfully.")
+
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_previous_snapshot(self,batches:list):
+        """
+        Finds the last successful ingestion that can be extended with the given batches:
+        same ingestion settings, all of its batches still present and all of its files in place.
+        return: previous DataIngestionArtifact or None, batches not ingested yet
+        """
+        try:
+            last_ingestion = self.raw_data_cache.get_last_ingestion_entry(
+                source=self.data_ingestion_config.dataset_download_url)
+
+            previous_batches = last_ingestion.get("batches")
+            if previous_batches is None or last_ingestion.get("ingestion_fingerprint") != self.get_ingestion_fingerprint():
+                logging.info(f"No previous incremental ingestion with the same settings found.")
+                return None,batches
+
+            batch_sha256 = {batch["sha256"] for batch in batches}
+            previous_sha256 = {batch["sha256"] for batch in previous_batches}
+            if not previous_sha256.issubset(batch_sha256):
+                logging.info(f"Raw batches were removed or modified since the last ingestion, ingesting all batches.")
+                return None,batches
+
+            previous_artifact = DataIngestionArtifact(**last_ingestion["artifact"])
+            if not self.is_artifact_available(previous_artifact):
+                logging.info(f"Previous ingestion files are missing, ingesting all batches.")
+                return None,batches
+
+            return previous_artifact,[batch for batch in batches if batch["sha256"] not in previous_sha256]
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def split_batches_as_train_test(self,batches:list,previous_artifact:DataIngestionArtifact,
+                                    new_batches:list) -> DataIngestionArtifact:
+        """
+        Builds the ingested snapshot from the previous one, if any, plus the new batches.
+        The previous store segments and split manifest are linked, not rewritten, so only the new batches
+        are parsed, cleaned and split. Incremental ingestion exports no split csv files, they would have
+        to be rewritten with the whole history on every run, the later stages read the store instead.
+        """
+        try:
+            source_path = get_local_source_path(self.data_ingestion_config.dataset_download_url)
+            if source_path is not None and os.path.isdir(source_path):
+                shipment_file_name = f"{os.path.basename(os.path.normpath(source_path))}{DATA_INGESTION_RAW_BATCH_FILE_EXTENSION}"
+            else:
+                shipment_file_name = os.path.basename(batches[0]["file_path"])
+
+            if self.data_ingestion_config.incremental:
+                if self.data_ingestion_config.export_split_csv:
+                    logging.info(f"Split csv files are not exported by incremental ingestion.")
+                train_file_path,test_file_path = None,None
+            else:
+                train_file_path,test_file_path = self.prepare_split_csv_files(shipment_file_name=shipment_file_name)
+
+            store_writer = self.get_store_writer(store_dir=self.data_ingestion_config.ingested_store_dir)
+            manifest_writer = SplitManifestWriter(manifest_dir=self.data_ingestion_config.split_manifest_dir)
+
+            previous_snapshots = None
+            if previous_artifact is not None:
+                logging.info(f"Extending previous ingestion: [{previous_artifact.store_path}]")
+                previous_rows = self.link_split(store_path=previous_artifact.store_path,
+                                                split_manifest_path=previous_artifact.split_manifest_path,
+                                                store_writer=store_writer,
+                                                manifest_writer=manifest_writer)
+                previous_manifest = read_split_manifest(previous_artifact.split_manifest_path)
+                previous_snapshots = previous_manifest.get(SPLIT_MANIFEST_SNAPSHOTS_KEY) or \
+                    [{SNAPSHOT_SOURCE_SHA256_KEY:previous_manifest.get("source_sha256"),
+                      SNAPSHOT_STORE_ROWS_KEY:previous_rows}]
+
+            self.split_files(file_paths=[batch["file_path"] for batch in new_batches],
+                             train_file_path=train_file_path,
+                             test_file_path=test_file_path,
+                             store_writer=store_writer,
+                             manifest_writer=manifest_writer)
+
+            store_writer.close()
+            manifest_writer.close(**self.get_split_manifest_details(split_method=SPLIT_METHOD_HASH,
+                                                                    store_rows=store_writer.rows,
+                                                                    previous_snapshots=previous_snapshots))
+
+            return self.get_data_ingestion_artifact(train_file_path=train_file_path,
+                                                    test_file_path=test_file_path,
+                                                    message=f"Data ingestion completed successfully: "
+                                                            f"[{len(new_batches)}] new of [{len(batches)}] raw batches ingested.")
+
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
 
+    def initiate_batch_data_ingestion(self) -> DataIngestionArtifact:
+        try:
+            batches = self.download_shipment_batches()
+
+            if self.data_ingestion_config.incremental:
+                previous_artifact,new_batches = self.get_previous_snapshot(batches=batches)
+                if previous_artifact is not None and len(new_batches) == 0 \
+                        and self.data_ingestion_config.skip_unchanged_ingestion:
+                    return previous_artifact._replace(message=f"No new raw batches, reusing previous data ingestion.")
+            else:
+                if self.data_ingestion_config.skip_unchanged_ingestion:
+                    data_ingestion_artifact = self.get_reusable_ingestion_artifact()
+                    if data_ingestion_artifact is not None:
+                        logging.info(f"Data Ingestion artifact:[{data_ingestion_artifact}]")
+                        return data_ingestion_artifact
+                previous_artifact,new_batches = None,batches
+
+            data_ingestion_artifact = self.split_batches_as_train_test(batches=batches,
+                                                                       previous_artifact=previous_artifact,
+                                                                       new_batches=new_batches)
+
+            self.raw_data_cache.record_ingestion(source=self.data_ingestion_config.dataset_download_url,
+                                                 sha256=self.raw_data_sha256,
+                                                 ingestion_fingerprint=self.get_ingestion_fingerprint(),
+                                                 artifact=dict(data_ingestion_artifact._asdict()),
+                                                 batches=[{"source":batch["source"],"sha256":batch["sha256"]}
+                                                          for batch in batches])
+            return data_ingestion_artifact
         except Exception as e:
             raise ShipmentException(e,sys) from e
 
     def initiate_data_ingestion(self)-> DataIngestionArtifact:
         try:
+            if self.data_ingestion_config.incremental or self.is_batch_source():
+                return self.initiate_batch_data_ingestion()
+
             # download the data
             self.download_shipment_data()
 
+            if self.data_ingestion_config.skip_unchanged_ingestion:
+                data_ingestion_artifact = self.get_reusable_ingestion_artifact()
+                if data_ingestion_artifact is not None:
+                    logging.info(f"Data Ingestion artifact:[{data_ingestion_artifact}]")
+                    return data_ingestion_artifact
+
             # data split
-            return self.split_data_as_train_test()
+            if self.data_ingestion_config.streaming:
+                data_ingestion_artifact = self.split_data_as_train_test_streaming()
+            else:
+                data_ingestion_artifact = self.split_data_as_train_test()
+
+            self.raw_data_cache.record_ingestion(source=self.data_ingestion_config.dataset_download_url,
+                                                 sha256=self.raw_data_sha256,
+                                                 ingestion_fingerprint=self.get_ingestion_fingerprint(),
+                                                 artifact=dict(data_ingestion_artifact._asdict()))
+            return data_ingestion_artifact
         except Exception as e:
             raise ShipmentException(e,sys) from e
 
@@ -162,3 +760,11 @@ class DataIngestion:
         logging.info(f"{'>>'*20}Data Ingestion log completed.{'<<'*20} \n\n")
 
 
+
+
+def split_shard(data_ingestion_config:DataIngestionConfig,shard_file_path:str,shard_dir:str) -> dict:
+    """
+    Process pool entry point, splits one raw shard with its own DataIngestion.
+    """
+    return DataIngestion(data_ingestion_config=data_ingestion_config).split_shard(shard_file_path=shard_file_path,
+                                                                                shard_dir=shard_dir)
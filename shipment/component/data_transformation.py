@@ -5,10 +5,18 @@ from shipment.entity.config_entity import DataTransformationConfig
 from shipment.entity.artifact_entity import DataIngestionArtifact,DataValidationArtifact, \
     DataTransformationArtifact
 from shipment.constant import *
-from shipment.util.util import read_yaml_file,save_object,save_numpy_array_data,load_data
+from shipment.config.registry import get_schema
+from shipment.entity.categorical_encoder import HashingEncoder,TargetEncoder
+from shipment.util.util import save_object,load_data
+from shipment.util.split_manifest import load_split_rows,is_split_manifest,SPLIT_TRAIN,SPLIT_TEST, \
+    SPLIT_MANIFEST_FILE_NAME,TRAIN_ROWS_FILE_NAME,TEST_ROWS_FILE_NAME
+from shipment.util.raw_data_cache import get_file_sha256
+from shipment.util.transformation_cache import TransformationCache
+from shipment.util.feature_store import FeatureStoreWriter,get_feature_store_file_paths
+from shipment.util.columnar_store import is_columnar_store
 
 from sklearn import preprocessing
-from sklearn.base import BaseEstimator,TransformerMixin
+from sklearn.base import BaseEstimator,TransformerMixin,clone
 from sklearn.preprocessing import StandardScaler,OneHotEncoder, LabelEncoder, OrdinalEncoder
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
@@ -16,27 +24,48 @@ from sklearn.impute import SimpleImputer
 
 import numpy as np
 import pandas as pd
+import sklearn
+import joblib
+import hashlib
+import json
 import os,sys
 
 
+# generated feature -> (start date column, end date column), days from start to end
+LEAD_TIME_FEATURES = {
+    LATE_DAYS_BETWEEN_SCHEDULED_DELIVERY_COLUMN_KEY:(SCHEDULED_DELIVERY_DATE_KEY,DELIVERED_TO_CLIENT_DATE_KEY),
+    DAYS_BETWEEN_PQ_AND_PO_COLUMN_KEY:(PQ_FIRST_SENT_TO_CLIENT_DATE_KEY,PO_SENT_TO_VENDOR_DATE_KEY),
+    DAYS_BETWEEN_PO_AND_SCHEDULED_DELIVERY_COLUMN_KEY:(PO_SENT_TO_VENDOR_DATE_KEY,SCHEDULED_DELIVERY_DATE_KEY),
+    DAYS_BETWEEN_DELIVERY_AND_RECORDING_COLUMN_KEY:(DELIVERED_TO_CLIENT_DATE_KEY,DELIVERY_RECORDED_DATE_KEY),
+}
+
+
 class FeatureGenerator(BaseEstimator, TransformerMixin):
 
     def __init__(self,
                 scheduled_delivery_date_ix = 0,
                 delivered_to_client_date_ix = 1,   
-                columns = None):
+                columns = None,
+                date_formats = None):
         """
         FeatureGenerator Initialization
         Scheduled Delivery Date: columns of type datetime  in the dataset
         Delivered to Client Date: columns of type datetime  in the dataset
+        date_formats: {column: strftime format} of date columns given as strings,
+                      unparsable values such as "Pre-PQ Process" become missing
 
         Genrated Feature
         late_days_between_delivery_scheduled : subtraction of  Delivered to Client Date and Scheduled Delivery Date
+        days_between_pq_and_po : subtraction of PO Sent to Vendor Date and PQ First Sent to Client Date
+        days_between_po_and_scheduled_delivery : subtraction of Scheduled Delivery Date and PO Sent to Vendor Date
+        days_between_delivery_and_recording : subtraction of Delivery Recorded Date and Delivered to Client Date
+        lead time features are only generated when both of their date columns are in columns
         """
         try:
             #logging.info(type(columns))
             #logging.info(columns)
             self.columns = columns
+            self.date_formats = date_formats
             if columns is not None:
                 scheduled_delivery_date_ix = self.columns.index(SCHEDULED_DELIVERY_DATE_KEY)
                 delivered_to_client_date_ix = self.columns.index(DELIVERED_TO_CLIENT_DATE_KEY)
@@ -48,6 +77,29 @@ class FeatureGenerator(BaseEstimator, TransformerMixin):
         except Exception as e:
             raise ShipmentException(e, sys) from e
 
+    def get_lead_time_features(self) -> list:
+        """
+        return: [(feature name, start date position, end date position)]
+        """
+        if self.columns is None:
+            return [(LATE_DAYS_BETWEEN_SCHEDULED_DELIVERY_COLUMN_KEY,
+                     self.scheduled_delivery_date_ix,self.delivered_to_client_date_ix)]
+        return [(feature,self.columns.index(start_column),self.columns.index(end_column))
+                for feature,(start_column,end_column) in LEAD_TIME_FEATURES.items()
+                if start_column in self.columns and end_column in self.columns]
+
+    @staticmethod
+    def parse_dates(series:pd.Series,date_format:str=None) -> np.ndarray:
+        """
+        return: datetime64[ns] array, dates repeat a lot so every distinct value is parsed once
+        """
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return series.to_numpy(dtype="datetime64[ns]")
+        codes,distinct_values = pd.factorize(series)
+        parsed_dates = pd.to_datetime(pd.Index(distinct_values).astype(str),format=date_format,errors="coerce")
+        # missing values have code -1 and pick the appended NaT
+        return np.append(parsed_dates.to_numpy(dtype="datetime64[ns]"),np.datetime64("NaT"))[codes]
+
     def fit(self, X, y=None):
         return self
 
@@ -55,20 +107,28 @@ class FeatureGenerator(BaseEstimator, TransformerMixin):
         try:
             # train and test file path
             df = pd.DataFrame(X)
-        
-            scheduled = df[self.scheduled_delivery_date_ix].apply(lambda x: pd.to_datetime(x,errors="coerce"))
-            delivered = df[self.delivered_to_client_date_ix].apply(lambda x: pd.to_datetime(x,errors="coerce"))
-
-            df[LATE_DAYS_BETWEEN_SCHEDULED_DELIVERY_COLUMN_KEY] = delivered - scheduled
-            df[LATE_DAYS_BETWEEN_SCHEDULED_DELIVERY_COLUMN_KEY] = df[LATE_DAYS_BETWEEN_SCHEDULED_DELIVERY_COLUMN_KEY].apply(lambda x:str(x).split(" ")[0]).astype('float')
-            
-            generated_feature = np.c_[np.array(df[LATE_DAYS_BETWEEN_SCHEDULED_DELIVERY_COLUMN_KEY])]
+            date_formats = dict(self.date_formats or {})
+            column_names = self.columns if self.columns is not None else [None] * df.shape[1]
+
+            dates = {}
+            generated_features = []
+            for feature,start_ix,end_ix in self.get_lead_time_features():
+                for ix in [start_ix,end_ix]:
+                    if ix not in dates:
+                        # columns are addressed by position whether X is an array or a (typed) dataframe
+                        dates[ix] = FeatureGenerator.parse_dates(df.iloc[:,ix],date_formats.get(column_names[ix]))
+                generated_features.append((dates[end_ix] - dates[start_ix]) / np.timedelta64(1,"D"))
+
+            generated_feature = np.column_stack(generated_features)
             #logging.info("generated featrue array:")
             #logging.info(generated_feature)
             return generated_feature                                                                             
         except Exception as e:
             raise ShipmentException(e, sys) from e
 
+    def get_feature_names_out(self, input_features=None):
+        return np.array([feature for feature,_,_ in self.get_lead_time_features()],dtype=object)
+
 
 class DataTransformation:
 
@@ -81,37 +141,76 @@ class DataTransformation:
             self.data_transformation_config= data_transformation_config
             self.data_ingestion_artifact = data_ingestion_artifact
             self.data_validation_artifact = data_validation_artifact
+            # whole split dataframes, only kept when the data has no columnar store to read rows from
+            self.split_data = {}
+            self.transformation_cache = None
+            if self.data_transformation_config.use_transformation_cache:
+                self.transformation_cache = TransformationCache(
+                    cache_dir=self.data_transformation_config.transformation_cache_dir)
 
         except Exception as e:
             raise ShipmentException(e,sys) from e
 
 
+    @staticmethod
+    def get_categorical_encoder_pipeline(column:str,encoder_info:dict) -> tuple:
+        """
+        column: categorical column
+        encoder_info: categorical_encoders entry of the column in schema.yaml
+        return: (name, pipeline, [column]) ColumnTransformer entry encoding the column
+        """
+        encoder_type = encoder_info[ENCODER_TYPE_KEY]
+        if encoder_type == ENCODER_HASHING:
+            encoder = HashingEncoder(n_features=int(encoder_info.get(ENCODER_N_FEATURES_KEY,16)))
+            steps = [('imputer',SimpleImputer(strategy="most_frequent")),
+                     ('hashing_encoder',encoder)]
+        elif encoder_type == ENCODER_TARGET:
+            encoder = TargetEncoder(n_buckets=int(encoder_info.get(ENCODER_N_BUCKETS_KEY,4096)),
+                                    smoothing=float(encoder_info.get(ENCODER_SMOOTHING_KEY,10.0)),
+                                    n_folds=int(encoder_info.get(ENCODER_N_FOLDS_KEY,5)))
+            steps = [('imputer',SimpleImputer(strategy="most_frequent")),
+                     ('target_encoder',encoder),
+                     ('scaler',StandardScaler())]
+        else:
+            raise Exception(f"Unknown encoder [{encoder_type}] for categorical column [{column}]")
+        return (f"{encoder_type}_pipeline_{column}",Pipeline(steps=steps),[column])
+
     def get_data_transformer_object(self) -> ColumnTransformer:
         try:
             schema_file_path = self.data_validation_artifact.schema_file_path
             
-            dataset_schema = read_yaml_file(file_path=schema_file_path)
+            dataset_schema = get_schema(schema_file_path=schema_file_path)
 
-            numerical_columns = dataset_schema[DATASET_NUMERICAL_COLUMNS_KEY]
-            categorical_columns = dataset_schema[DATASET_CATEGORICAL_COLUMNS_KEY]
-            datetime_columns = dataset_schema[DATASET_DATETIME_COLUMNS_KEYS]
+            numerical_columns = dataset_schema.numerical_columns
+            categorical_columns = dataset_schema.categorical_columns
+            datetime_columns = dataset_schema.datetime_columns + list(dataset_schema.lead_time_date_columns)
+            date_formats = {column:dataset_schema.datetime_format for column in dataset_schema.datetime_columns}
+            date_formats.update(dataset_schema.lead_time_date_columns)
 
             num_pipeline = Pipeline(steps=[
                 ('imputer',SimpleImputer(strategy="median")),
                 ('scaler',StandardScaler())
             ])
 
+            # columns without an encoder in the schema are ordinal encoded, unseen values become -1
+            categorical_encoders = dataset_schema.categorical_encoders
+            ordinal_columns = [column for column in categorical_columns
+                               if dict(categorical_encoders.get(column) or {}).get(ENCODER_TYPE_KEY,ENCODER_ORDINAL)
+                               == ENCODER_ORDINAL]
+
             cat_pipeline = Pipeline(steps=[
                 ('imputer',SimpleImputer(strategy="most_frequent")),
-                ('one_hot_encoder',OrdinalEncoder()),
+                ('one_hot_encoder',OrdinalEncoder(handle_unknown="use_encoded_value",unknown_value=-1)),
                 ('scaler',StandardScaler(with_mean=False))
             ])
 
+            # dates are imputed after feature generation since the ingested store keeps them as datetime64
             datetime_pipeline = Pipeline(steps = [
-                ('imputer',SimpleImputer(strategy="constant",fill_value=0)),
                 ('feature_generator',FeatureGenerator(
-                    columns = datetime_columns
+                    columns = datetime_columns,
+                    date_formats = date_formats
                 )),
+                ('imputer',SimpleImputer(strategy="median")),
                 ('scaler',StandardScaler())
             ])
 
@@ -119,92 +218,237 @@ class DataTransformation:
             logging.info(f"Numerical columns : {numerical_columns}")
             logging.info(f"Datetime_columns  : {datetime_columns}")
 
-            preprocessing = ColumnTransformer([
+            transformers = [
                 ('num_pipeline',num_pipeline,numerical_columns),
-                ('cat_pipeline',cat_pipeline,categorical_columns),
-                ('datetime_pipeline',datetime_pipeline,datetime_columns)
-                ])
+                ('cat_pipeline',cat_pipeline,ordinal_columns)
+                ]
+            for column in categorical_columns:
+                if column not in ordinal_columns:
+                    transformers.append(self.get_categorical_encoder_pipeline(
+                        column=column,encoder_info=categorical_encoders[column]))
+            transformers.append(('datetime_pipeline',datetime_pipeline,datetime_columns))
+
+            preprocessing = ColumnTransformer(transformers,n_jobs=self.data_transformation_config.n_jobs)
                 
             return preprocessing
         except Exception as e:
             raise ShipmentException(e,sys) from e
 
 
-    def initiate_data_transformation(self) -> DataTransformationArtifact:
+    def get_data_fingerprint(self) -> str:
+        """
+        return: sha256 of the rows to be transformed, i.e. the validated split manifest, which records the
+                raw data hash and ingestion fingerprint, together with its train and test row numbers.
+                Without a manifest the train and test csv files are hashed.
+        """
         try:
-            logging.info(f"Obtaining preprocessing_object.")
-            preprocessing_obj = self.get_data_transformer_object()
-
-            logging.info(f"Obtaining training and test file path.")
-            train_file_path = self.data_ingestion_artifact.train_file_path
-            test_file_path = self.data_ingestion_artifact.test_file_path
+            split_manifest_path = self.data_validation_artifact.split_manifest_path
+            if is_split_manifest(split_manifest_path):
+                file_paths = [os.path.join(split_manifest_path,file_name)
+                              for file_name in [SPLIT_MANIFEST_FILE_NAME,TRAIN_ROWS_FILE_NAME,TEST_ROWS_FILE_NAME]]
+            else:
+                file_paths = [self.data_ingestion_artifact.train_file_path,self.data_ingestion_artifact.test_file_path]
+            return hashlib.sha256("".join(get_file_sha256(file_path) for file_path in file_paths).encode()).hexdigest()
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
 
+    @staticmethod
+    def get_transformer_module_hashes(preprocessing_obj:ColumnTransformer) -> dict:
+        """
+        Source hashes of this module and of every shipment module a class or function of the
+        preprocessing object comes from, e.g. the categorical encoders, so editing any of them
+        invalidates the cached transformations. Library code is covered by its version.
+        return: {module name: sha256 of the module file}
+        """
+        module_names = {__name__}
+        for value in [preprocessing_obj,*preprocessing_obj.get_params(deep=True).values()]:
+            for part in (value if isinstance(value,(list,tuple)) else [value]):
+                module_name = getattr(part,"__module__",None) or type(part).__module__
+                if module_name.split(".")[0] == __name__.split(".")[0]:
+                    module_names.add(module_name)
+        return {module_name:get_file_sha256(sys.modules[module_name].__file__) for module_name in sorted(module_names)}
+
+    def get_cache_key(self,preprocessing_obj:ColumnTransformer) -> dict:
+        """
+        Key of the transformation cache entry, changes with the data, the compiled schema and the unfitted
+        transformer including its parameters, the shipment modules of the transformer and the sklearn version.
+        return: {"cache_key": ..., parts the key was computed from}
+        """
+        try:
+            cache_details = {
+                "data_fingerprint":self.get_data_fingerprint(),
+                "schema_hash":get_schema(schema_file_path=self.data_validation_artifact.schema_file_path).schema_hash,
+                # n_jobs does not change the fitted object
+                "transformer_hash":joblib.hash(clone(preprocessing_obj).set_params(n_jobs=None)),
+                "transformer_module_hashes":DataTransformation.get_transformer_module_hashes(preprocessing_obj),
+                "feature_dtype":str(np.dtype(self.data_transformation_config.feature_dtype)),
+                "fit_sample_size":self.data_transformation_config.fit_sample_size,
+                "random_state":self.data_transformation_config.random_state,
+                "sklearn_version":sklearn.__version__
+            }
+            cache_details["cache_key"] = hashlib.sha256(json.dumps(cache_details,sort_keys=True).encode()).hexdigest()
+            return cache_details
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
 
+    def get_data_transformation_artifact(self,is_cache_hit:bool,message:str) -> DataTransformationArtifact:
+        data_transformation_artifact = DataTransformationArtifact(
+            is_transformed=True,
+            message = message,
+            transformed_train_store_path=self.data_transformation_config.transformed_train_dir,
+            transformed_test_store_path=self.data_transformation_config.transformed_test_dir,
+            preprocessed_object_file_path=self.data_transformation_config.preprocessed_object_file_path,
+            split_manifest_path=self.data_validation_artifact.split_manifest_path,
+            is_cache_hit=is_cache_hit
+            )
+        logging.info(f"Data transformation artifact: {data_transformation_artifact}")
+        return data_transformation_artifact
+
+    def get_split_size(self,split:str) -> int:
+        split_manifest_path = self.data_validation_artifact.split_manifest_path
+        if is_split_manifest(split_manifest_path):
+            return len(load_split_rows(split_manifest_path,split))
+        return len(self.load_split_data(split=split))
+
+    def load_split_data(self,split:str,positions:np.ndarray=None) -> pd.DataFrame:
+        """
+        Loads rows of the train or test split, from the columnar store when there is one so that
+        only the requested rows are read.
+        split: str train or test
+        positions: np.array optional positions within the split, all rows when None
+        return: pd.DataFrame typed by the schema
+        """
+        try:
             schema_file_path = self.data_validation_artifact.schema_file_path
+            file_path = {SPLIT_TRAIN:self.data_ingestion_artifact.train_file_path,
+                         SPLIT_TEST:self.data_ingestion_artifact.test_file_path}[split]
+            store_path = self.data_ingestion_artifact.store_path
+            # split of the validation stage, without the quarantined rows
+            split_manifest_path = self.data_validation_artifact.split_manifest_path
+            if is_columnar_store(store_path) and is_split_manifest(split_manifest_path):
+                rows = load_split_rows(split_manifest_path,split)
+                return load_data(file_path=file_path,schema_file_path=schema_file_path,store_path=store_path,
+                                 rows=rows if positions is None else rows[positions])
+
+            if split not in self.split_data:
+                self.split_data[split] = load_data(file_path=file_path,schema_file_path=schema_file_path)
+            split_df = self.split_data[split]
+            return split_df if positions is None else split_df.iloc[positions].reset_index(drop=True)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
 
-            logging.info(f"Loading training and test data as pandas dataframe.")
-            train_df = load_data(file_path=train_file_path,schema_file_path=schema_file_path)
-
-            test_df = load_data(file_path=test_file_path,schema_file_path=schema_file_path)
-
-            schema = read_yaml_file(file_path=schema_file_path)
-
-            target_column_name = schema[DATASET_TARGET_COLUMN_KEY]
-
-            logging.info(f"Splitting input and target feature from training and testing dataframe")
-            input_feature_train_df = train_df.drop(columns=[target_column_name],axis=1)
-            target_feature_train_df = train_df[target_column_name]
-            
-            input_feature_test_df = test_df.drop(columns=[target_column_name],axis = 1)
-            target_feature_test_df = test_df[target_column_name]
-
-            logging.info(f"Applying preprocessing object on training and testing dataframe")
-            input_feature_train_arr = preprocessing_obj.fit_transform(input_feature_train_df)
-            input_feature_test_arr = preprocessing_obj.fit_transform(input_feature_test_df)
-            logging.info("Preprocessing is done")
-
-            #input_train_df = pd.DataFrame(input_feature_train_arr)  
-            #input_train_df.to_csv(r"C:\Users\aniyant\Desktop\train_df.csv") 
-            #target_feature_train_df.to_csv(r"C:\Users\aniyant\Desktop\target_df.csv")
-
-            target_train_arr = np.array(target_feature_train_df)
-            target_test_arr = np.array(target_feature_test_df)
-
-            #logging.info(f"dimension of train arr : {input_feature_train_arr.ndim}")
-            #logging.info(f"dimension of target arr : {np.c_[target_train_arr].ndim}")
+    def get_fit_sample_positions(self,n_rows:int) -> np.ndarray:
+        """
+        return: sorted positions of the train rows the preprocessing object is fitted on
+        """
+        fit_sample_size = self.data_transformation_config.fit_sample_size
+        if fit_sample_size is None or n_rows <= fit_sample_size:
+            return np.arange(n_rows)
+        random_generator = np.random.default_rng(self.data_transformation_config.random_state)
+        return np.sort(random_generator.choice(n_rows,size=fit_sample_size,replace=False))
+
+    def transform_split(self,split:str,preprocessing_obj:ColumnTransformer,
+                        feature_store_writer:FeatureStoreWriter,n_rows:int,skip_positions:np.ndarray=None):
+        """
+        Transforms the split transform_chunk_size rows at a time into the feature store,
+        so that only one chunk and its transformed block are in memory at once.
+        skip_positions: sorted positions already written, they are neither loaded nor transformed again
+        """
+        try:
+            target_column_name = get_schema(schema_file_path=self.data_validation_artifact.schema_file_path).target_column
+            chunk_size = self.data_transformation_config.transform_chunk_size or max(n_rows,1)
+            for start in range(0,n_rows,chunk_size):
+                end = min(start + chunk_size,n_rows)
+                positions = np.arange(start,end)
+                if skip_positions is not None:
+                    positions = positions[~np.isin(positions,skip_positions,assume_unique=True)]
+                if len(positions) == 0:
+                    continue
+                chunk_df = self.load_split_data(split=split,positions=positions)
+                input_feature_arr = preprocessing_obj.transform(chunk_df.drop(columns=[target_column_name],axis=1))
+                # whole chunks are written as a slice, chunks with skipped rows to their positions
+                feature_store_writer.write(positions=slice(start,end) if len(positions) == end - start else positions,
+                                           X=input_feature_arr,
+                                           y=chunk_df[target_column_name].to_numpy(dtype=np.float64))
+                logging.info(f"Transformed [{len(positions)}] {split} rows of [{start}:{end}] of [{n_rows}]")
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
 
-            train_arr = np.c_[input_feature_train_arr,target_train_arr]
-            test_arr = np.c_[input_feature_test_arr,target_test_arr]
+    def initiate_data_transformation(self) -> DataTransformationArtifact:
+        try:
+            logging.info(f"Obtaining preprocessing_object.")
+            preprocessing_obj = self.get_data_transformer_object()
 
             transformed_train_dir = self.data_transformation_config.transformed_train_dir
             transformed_test_dir = self.data_transformation_config.transformed_test_dir
-
-            train_file_name = os.path.basename(train_file_path).replace(".csv",".npz")
-            test_file_name = os.path.basename(test_file_path).replace(".csv",".npz") 
-
-            transformed_train_file_path = os.path.join(transformed_train_dir, train_file_name)
-            transformed_test_file_path = os.path.join(transformed_test_dir, test_file_name)
-
-            logging.info(f"Saving transformed training and testing array.")
-
-            save_numpy_array_data(file_path=transformed_train_file_path,array = train_arr)
-            save_numpy_array_data(file_path=transformed_test_file_path,array=test_arr)
-
             preprocessing_obj_file_path = self.data_transformation_config.preprocessed_object_file_path
+            cached_file_paths = {"preprocessed_object":preprocessing_obj_file_path}
+            for split,store_dir in [(SPLIT_TRAIN,transformed_train_dir),(SPLIT_TEST,transformed_test_dir)]:
+                cached_file_paths.update({f"{split}_{os.path.splitext(file_name)[0]}":file_path
+                                          for file_name,file_path in get_feature_store_file_paths(store_dir).items()})
+
+            cache_details = self.get_cache_key(preprocessing_obj=preprocessing_obj)
+            if self.transformation_cache is not None:
+                logging.info(f"Transformation cache key: [{cache_details['cache_key']}]")
+                if self.transformation_cache.restore(cache_key=cache_details["cache_key"],file_paths=cached_file_paths):
+                    logging.info(f"Transformation cache hit, fitted preprocessing object and transformed arrays reused.")
+                    return self.get_data_transformation_artifact(is_cache_hit=True,
+                                                                 message="Data transformation reused from cache.")
+                logging.info(f"Transformation cache miss.")
+
+            schema_file_path = self.data_validation_artifact.schema_file_path
+            target_column_name = get_schema(schema_file_path=schema_file_path).target_column
+
+            n_train_rows = self.get_split_size(split=SPLIT_TRAIN)
+            n_test_rows = self.get_split_size(split=SPLIT_TEST)
+            fit_positions = self.get_fit_sample_positions(n_rows=n_train_rows)
+
+            logging.info(f"Fitting preprocessing object on [{len(fit_positions)}] of [{n_train_rows}] train rows.")
+            fit_df = self.load_split_data(split=SPLIT_TRAIN,positions=fit_positions)
+            target_fit_arr = fit_df[target_column_name].to_numpy(dtype=np.float64)
+            # the target is passed for the target encoded columns, whose fit_transform output is out of fold
+            input_feature_fit_arr = preprocessing_obj.fit_transform(fit_df.drop(columns=[target_column_name],axis=1),
+                                                                    target_fit_arr)
+            del fit_df
+
+            feature_names = list(preprocessing_obj.get_feature_names_out())
+            store_details = {"data_fingerprint":cache_details["data_fingerprint"],
+                             "schema_hash":cache_details["schema_hash"]}
+            # features are kept contiguous in feature_dtype so model fitting and cross validation folds
+            # work on them without upcasting copies, the target is kept in its own float64 array
+            feature_dtype = np.dtype(self.data_transformation_config.feature_dtype)
+            logging.info(f"Transformed feature dtype: [{feature_dtype}], features: [{len(feature_names)}]")
+
+            logging.info(f"Transforming training data into feature store: [{transformed_train_dir}]")
+            train_store_writer = FeatureStoreWriter(store_dir=transformed_train_dir,rows=n_train_rows,
+                                                    n_features=len(feature_names),feature_dtype=feature_dtype)
+            # the other train rows are transformed with the fitted object, the fitted rows keep
+            # their fit_transform output so no train row is target encoded with its own target
+            self.transform_split(split=SPLIT_TRAIN,preprocessing_obj=preprocessing_obj,
+                                 feature_store_writer=train_store_writer,n_rows=n_train_rows,
+                                 skip_positions=fit_positions)
+            train_store_writer.write(positions=fit_positions,X=input_feature_fit_arr,y=target_fit_arr)
+            train_store_writer.close(feature_names=feature_names,split=SPLIT_TRAIN,**store_details)
+            del input_feature_fit_arr
+
+            logging.info(f"Transforming testing data into feature store: [{transformed_test_dir}]")
+            test_store_writer = FeatureStoreWriter(store_dir=transformed_test_dir,rows=n_test_rows,
+                                                   n_features=len(feature_names),feature_dtype=feature_dtype)
+            self.transform_split(split=SPLIT_TEST,preprocessing_obj=preprocessing_obj,
+                                 feature_store_writer=test_store_writer,n_rows=n_test_rows)
+            test_store_writer.close(feature_names=feature_names,split=SPLIT_TEST,**store_details)
+            self.split_data = {}
+            logging.info("Preprocessing is done")
 
             logging.info(f"Saving preprocessing object.")
             save_object(file_path=preprocessing_obj_file_path,obj=preprocessing_obj)
 
-            data_transformation_artifact = DataTransformationArtifact(
-                is_transformed=True,
-                message = "Data transformation successfull.",
-                transformed_train_file_path=transformed_train_file_path,
-                transformed_test_file_path=transformed_test_file_path,
-                preprocessed_object_file_path=preprocessing_obj_file_path
-                )
+            if self.transformation_cache is not None:
+                self.transformation_cache.store(file_paths=cached_file_paths,**cache_details)
+                logging.info(f"Transformation cached at: [{self.transformation_cache.get_entry_dir(cache_details['cache_key'])}]")
 
-            logging.info(f"Data transformation artifact: {data_transformation_artifact}")
-            return data_transformation_artifact
+            return self.get_data_transformation_artifact(is_cache_hit=False,
+                                                         message="Data transformation successfull.")
 
         except Exception as e:
             raise ShipmentException(e,sys) from e
@@ -1,18 +1,22 @@
 from logging import exception
 from pickletools import read_float8
-from shipment.constant import DATASET_COLUMNS_KEY, DATASET_DETAILS_KEY, DATASET_DOMAIN_VALUE_KEY, DATASET_NUMBER_OF_COLUMNS_KEY
+from shipment.constant import DATASET_COLUMNS_KEY, DATASET_DETAILS_KEY, DATASET_DOMAIN_VALUE_KEY, DATASET_NUMBER_OF_COLUMNS_KEY, \
+    DRIFT_BACKEND_NATIVE, DRIFT_BACKEND_EVIDENTLY, DRIFT_MODE_SKETCH
+from shipment.entity.column_profiler import ColumnProfiler,save_profile
+from shipment.entity.column_sketch import DatasetSketch,save_sketches
+from shipment.entity.drift_engine import DriftEngine,render_drift_report_page
+from shipment.entity.row_validator import RowValidator
 from shipment.logger import logging
 from shipment.exception import ShipmentException
 from shipment.entity.config_entity import DataValidationConfig
 from shipment.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
-from shipment.util.util import read_yaml_file
+from shipment.config.registry import get_schema
+from shipment.util.columnar_store import is_columnar_store,load_columnar_data
+from shipment.util.split_manifest import SplitManifestWriter,is_split_manifest,read_split_manifest,load_split_rows, \
+    load_fold_ids,SPLIT_TRAIN,SPLIT_TEST
 import os,sys
 import pandas as pd
-
-from evidently.model_profile import Profile
-from evidently.model_profile.sections import DataDriftProfileSection
-from evidently.dashboard import Dashboard
-from evidently.dashboard.tabs import DataDriftTab
+import numpy as np
 import json
 
 
@@ -24,6 +28,15 @@ class DataValidation:
         try:
             self.data_validation_config = data_validation_config
             self.data_ingestion_artifact = data_ingestion_artifact
+            self.train_df = None
+            self.test_df = None
+            self.train_profile = None
+            self.test_profile = None
+            self.train_sketch = None
+            self.test_sketch = None
+            self.row_validator = None
+            self.quarantined_rows = None
+            self.rule_counts = None
 
             logging.info(f"{'='*20} Data Validation log Started.{'='*20}\n\n")
         except Exception as e:
@@ -31,19 +44,220 @@ class DataValidation:
 
     def get_train_and_test_df(self):
         try:
-            train_df = pd.read_csv(self.data_ingestion_artifact.train_file_path)
-            test_df = pd.read_csv(self.data_ingestion_artifact.test_file_path)
+            # loaded once and shared by the schema checks and the drift report
+            if self.train_df is not None and self.test_df is not None:
+                return self.train_df,self.test_df
+
+            store_path = self.data_ingestion_artifact.store_path
+            split_manifest_path = self.data_ingestion_artifact.split_manifest_path
+
+            if is_columnar_store(store_path) and is_split_manifest(split_manifest_path):
+                train_df = load_columnar_data(store_dir=store_path,
+                                              rows=load_split_rows(split_manifest_path,SPLIT_TRAIN))
+                test_df = load_columnar_data(store_dir=store_path,
+                                             rows=load_split_rows(split_manifest_path,SPLIT_TEST))
+            else:
+                train_df = pd.read_csv(self.data_ingestion_artifact.train_file_path)
+                test_df = pd.read_csv(self.data_ingestion_artifact.test_file_path)
+            self.train_df,self.test_df = train_df,test_df
             return train_df,test_df
         except Exception as e:
             raise ShipmentException(e,sys) from e
 
-    
+
+    def get_split_chunks(self,split:str):
+        """
+        Yields the rows of the train or test split chunk by chunk, so the split never has to fit in memory.
+        yield: row numbers of the chunk in the store (line numbers for csv files), chunk dataframe
+        """
+        try:
+            chunk_size = self.data_validation_config.sketch_chunk_size
+            store_path = self.data_ingestion_artifact.store_path
+            split_manifest_path = self.data_ingestion_artifact.split_manifest_path
+
+            if is_columnar_store(store_path) and is_split_manifest(split_manifest_path):
+                # sketches do not depend on row order, sorted rows read the store sequentially
+                rows = np.sort(load_split_rows(split_manifest_path,split))
+                for start in range(0,len(rows),chunk_size):
+                    chunk_rows = rows[start:start + chunk_size]
+                    yield chunk_rows,load_columnar_data(store_dir=store_path,rows=chunk_rows)
+            else:
+                file_path = {SPLIT_TRAIN:self.data_ingestion_artifact.train_file_path,
+                             SPLIT_TEST:self.data_ingestion_artifact.test_file_path}[split]
+                start = 0
+                for chunk_df in pd.read_csv(file_path,chunksize=chunk_size):
+                    yield np.arange(start,start + len(chunk_df)),chunk_df
+                    start += len(chunk_df)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def start_row_validation(self):
+        try:
+            dataset_schema = get_schema(schema_file_path=self.data_validation_config.schema_file_path)
+            self.row_validator = RowValidator.from_schema(dataset_schema)
+            self.quarantined_rows = {SPLIT_TRAIN:[],SPLIT_TEST:[]}
+            self.rule_counts = {}
+            quarantine_file_path = self.data_validation_config.quarantine_file_path
+            os.makedirs(os.path.dirname(quarantine_file_path),exist_ok=True)
+            if os.path.exists(quarantine_file_path):
+                os.remove(quarantine_file_path)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def validate_split_rows(self,split:str,rows:np.ndarray,df:pd.DataFrame):
+        """
+        Runs the row rules on df and appends the failing rows with their rule codes to the quarantine file.
+        rows: row numbers of df in the store (line numbers for csv files)
+        """
+        try:
+            failed_mask,rule_codes,report = self.row_validator.validate(df)
+            for code,violations in report.rule_counts.items():
+                self.rule_counts[code] = self.rule_counts.get(code,0) + violations
+            if report.failed_rows == 0:
+                return
+
+            self.quarantined_rows[split].append(np.asarray(rows)[failed_mask])
+            quarantine_df = df[failed_mask].reset_index(drop=True)
+            quarantine_df.insert(0,"rule_codes",rule_codes)
+            quarantine_df.insert(0,"row",np.asarray(rows)[failed_mask])
+            quarantine_df.insert(0,"split",split)
+
+            quarantine_file_path = self.data_validation_config.quarantine_file_path
+            quarantine_df.to_csv(quarantine_file_path,mode="a",index=False,
+                                 header=not os.path.exists(quarantine_file_path))
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def validate_rows(self) -> int:
+        """
+        Row level validation of train and test data against the type, domain, null and range rules of the schema.
+        In sketch mode it runs in the same pass over the chunks as the sketches.
+        return: number of quarantined rows
+        """
+        try:
+            if self.quarantined_rows is None:
+                if self.data_validation_config.drift_mode == DRIFT_MODE_SKETCH:
+                    self.get_train_and_test_sketch()
+                else:
+                    self.start_row_validation()
+                    train_df,test_df = self.get_train_and_test_df()
+                    for split,df in [(SPLIT_TRAIN,train_df),(SPLIT_TEST,test_df)]:
+                        split_manifest_path = self.data_ingestion_artifact.split_manifest_path
+                        if is_columnar_store(self.data_ingestion_artifact.store_path) \
+                                and is_split_manifest(split_manifest_path):
+                            rows = load_split_rows(split_manifest_path,split)
+                        else:
+                            rows = np.arange(len(df))
+                        self.validate_split_rows(split=split,rows=rows,df=df)
+
+            quarantined_rows = sum(len(rows) for split_rows in self.quarantined_rows.values() for rows in split_rows)
+            for code,violations in self.rule_counts.items():
+                logging.info(f"Rule [{code}] violated by [{violations}] rows")
+            logging.info(f"[{quarantined_rows}] rows quarantined at: [{self.data_validation_config.quarantine_file_path}]")
+            return quarantined_rows
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def save_validated_split_manifest(self) -> str:
+        """
+        Split manifest of the ingested store without the quarantined rows, used by the later stages.
+        return: manifest dir, the ingestion manifest itself when no row was quarantined
+        """
+        try:
+            source_manifest_path = self.data_ingestion_artifact.split_manifest_path
+            if not is_split_manifest(source_manifest_path):
+                return source_manifest_path
+            quarantined_rows = {split:np.concatenate(split_rows) if len(split_rows) > 0 else np.empty(0,dtype=int)
+                                for split,split_rows in self.quarantined_rows.items()}
+            if all(len(rows) == 0 for rows in quarantined_rows.values()):
+                return source_manifest_path
+
+            train_rows = load_split_rows(source_manifest_path,SPLIT_TRAIN)
+            test_rows = load_split_rows(source_manifest_path,SPLIT_TEST)
+            is_train_kept = ~np.isin(train_rows,quarantined_rows[SPLIT_TRAIN])
+            is_test_kept = ~np.isin(test_rows,quarantined_rows[SPLIT_TEST])
+
+            manifest_writer = SplitManifestWriter(manifest_dir=self.data_validation_config.split_manifest_dir)
+            manifest_writer.add(train_rows=train_rows[is_train_kept],test_rows=test_rows[is_test_kept],
+                                fold_ids=load_fold_ids(source_manifest_path)[is_train_kept])
+            details = {key:value for key,value in read_split_manifest(source_manifest_path).items() if key != "rows"}
+            details["quarantined_rows"] = {split:int(len(rows)) for split,rows in quarantined_rows.items()}
+            split_manifest_path = manifest_writer.close(**details)
+            logging.info(f"Split manifest without quarantined rows saved at: [{split_manifest_path}]")
+            return split_manifest_path
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_train_and_test_sketch(self):
+        """
+        Sketches train and test data chunk by chunk and saves both sketches as the sketch artifact,
+        they can later be merged with sketches of new data or compared without the raw data.
+        The rows are validated in the same pass.
+        return: train sketch, test sketch
+        """
+        try:
+            if self.train_sketch is not None and self.test_sketch is not None:
+                return self.train_sketch,self.test_sketch
+
+            dataset_schema = get_schema(schema_file_path=self.data_validation_config.schema_file_path)
+            self.start_row_validation()
+            sketches = {}
+            for split in [SPLIT_TRAIN,SPLIT_TEST]:
+                dataset_sketch = DatasetSketch(domain_values=dataset_schema.domain_values)
+                for rows,chunk_df in self.get_split_chunks(split):
+                    dataset_sketch.update(chunk_df)
+                    self.validate_split_rows(split=split,rows=rows,df=chunk_df)
+                sketches[split] = dataset_sketch
+                logging.info(f"{split} data sketched: [{dataset_sketch.rows}] rows")
+
+            self.train_sketch,self.test_sketch = sketches[SPLIT_TRAIN],sketches[SPLIT_TEST]
+
+            sketch_file_path = self.data_validation_config.sketch_file_path
+            save_sketches(file_path=sketch_file_path,sketches=sketches)
+            logging.info(f"Train and test sketch saved at: [{sketch_file_path}]")
+            return self.train_sketch,self.test_sketch
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_train_and_test_profile(self):
+        """
+        Profiles train and test data once and saves both profiles as the profile artifact.
+        return: train profile, test profile
+        """
+        try:
+            if self.train_profile is not None and self.test_profile is not None:
+                return self.train_profile,self.test_profile
+
+            if self.data_validation_config.drift_mode == DRIFT_MODE_SKETCH:
+                train_sketch,test_sketch = self.get_train_and_test_sketch()
+                self.train_profile = train_sketch.to_profile()
+                self.test_profile = test_sketch.to_profile()
+            else:
+                train_df,test_df = self.get_train_and_test_df()
+                dataset_schema = get_schema(schema_file_path=self.data_validation_config.schema_file_path)
+
+                column_profiler = ColumnProfiler(domain_values=dataset_schema.domain_values)
+                self.train_profile = column_profiler.profile(train_df)
+                self.test_profile = column_profiler.profile(test_df)
+
+            profile_file_path = self.data_validation_config.profile_file_path
+            save_profile(file_path=profile_file_path,profile={"train":self.train_profile,"test":self.test_profile})
+            logging.info(f"Train and test profile saved at: [{profile_file_path}]")
+            return self.train_profile,self.test_profile
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
     def is_train_test_file_exists(self)->bool:
         try:
             logging.info("Checking if training and test file is available")
             is_train_file_exist = False
             is_test_file_exist = False
 
+            if is_columnar_store(self.data_ingestion_artifact.store_path) \
+                    and is_split_manifest(self.data_ingestion_artifact.split_manifest_path):
+                logging.info(f"Train and test split available in store: [{self.data_ingestion_artifact.store_path}]")
+                return True
+
             train_file_path = self.data_ingestion_artifact.train_file_path
             test_file_path = self.data_ingestion_artifact.test_file_path
 
@@ -69,73 +283,45 @@ class DataValidation:
     def validate_dataset_schema(self)->bool:
         try:
             validation_status = False
-            train_file_path = self.data_ingestion_artifact.train_file_path
-            test_file_path = self.data_ingestion_artifact.test_file_path
 
-            train_df = pd.read_csv(train_file_path)
-            test_df = pd.read_csv(test_file_path)
+            train_profile,test_profile = self.get_train_and_test_profile()
+            train_columns = list(train_profile["columns"].keys())
+            test_columns = list(test_profile["columns"].keys())
 
             schema_file_path = self.data_validation_config.schema_file_path
-            dataset_schema_info = read_yaml_file(file_path=schema_file_path)
+            dataset_schema = get_schema(schema_file_path=schema_file_path)
 
             #validate training and testing dataset using schema file
             #1. Number of Column
-            valid_number_of_columns = False
-
-            if len(train_df.columns) == len(test_df.columns):
-                number_of_columns = len(train_df.columns)
-
-            if number_of_columns == dataset_schema_info[DATASET_DETAILS_KEY][DATASET_NUMBER_OF_COLUMNS_KEY]:
-                valid_number_of_columns = True
+            # the profiles hold the loaded data, drop_columns removed, so they are compared with the schema columns
+            valid_number_of_columns = len(train_columns) == len(test_columns) \
+                and len(train_columns) == len(dataset_schema.columns)
 
             logging.info(f"validation of number of columns in train and test  data is : {valid_number_of_columns}")    
 
             #3. Check column names
-            valid_columns_names = False
-
-            for col1 in train_df.columns:
-                for col2 in test_df.columns:
-                    if col1 == col2:
-                        if col1 in dataset_schema_info[DATASET_COLUMNS_KEY].keys():
-                            valid_columns_names = True
+            unknown_columns = set(train_columns).symmetric_difference(test_columns) \
+                | set(train_columns).difference(dataset_schema.column_index)
+            valid_columns_names = len(unknown_columns) == 0
+            if not valid_columns_names:
+                logging.info(f"Columns not in both train and test data or not in schema: {sorted(unknown_columns)}")
 
             logging.info(f"validation names of columns in train and test data is :{valid_columns_names}")
 
             #2. Check the domain value of the categorical dataset
-            # train dataset domain check 
-            valid_train_domain_value = 0
-
-            for column in train_df.columns:
-                if column in dataset_schema_info[DATASET_DOMAIN_VALUE_KEY].keys():
-                    category = train_df[column].value_counts().to_dict().keys()
-                    for cat in category:
-                        if cat not in dataset_schema_info[DATASET_DOMAIN_VALUE_KEY][column]:
-                            valid_train_domain_value += 1
-                            logging.info(f"train data :- domain value: {cat} not match with any schema domain {column} value.")
-                            
-            if valid_train_domain_value != 0:
-                valid_train_domain_value = False
-            else:
-                valid_train_domain_value = True
-
-            logging.info(f"Train data :- valid domain value :{valid_train_domain_value}")
-
-            # test dataset domain check
-            valid_test_domain_value = 0
-            for column in test_df.columns:
-                if column in dataset_schema_info[DATASET_DOMAIN_VALUE_KEY].keys():
-                    category = test_df[column].value_counts().to_dict().keys()
-                    for cat in category:
-                        if cat not in dataset_schema_info[DATASET_DOMAIN_VALUE_KEY][column]:
-                            valid_test_domain_value += 1
-                            logging.info(f"test data :- domain value: {cat} not match with any schema domain {column} value.")
-            
-            if valid_test_domain_value != 0:
-                valid_test_domain_value = False
-            else:
-                valid_test_domain_value = True
-
-            logging.info(f"Test data :- valid domain value :{valid_test_domain_value}")
+            valid_domain_value = {}
+            for data_name,profile in [("train",train_profile),("test",test_profile)]:
+                domain_violations = 0
+                for column,column_profile in profile["columns"].items():
+                    if column_profile.get("domain_violations",0) > 0:
+                        domain_violations += column_profile["domain_violations"]
+                        logging.info(f"{data_name} data :- domain values: {column_profile['unknown_values']} "
+                                     f"not match with any schema domain {column} value.")
+                valid_domain_value[data_name] = domain_violations == 0
+                logging.info(f"{data_name} data :- valid domain value :{valid_domain_value[data_name]}")
+
+            valid_train_domain_value = valid_domain_value["train"]
+            valid_test_domain_value = valid_domain_value["test"]
             
             if valid_number_of_columns and valid_columns_names \
                 and valid_train_domain_value and valid_test_domain_value:
@@ -147,13 +333,19 @@ class DataValidation:
     
     def get_and_save_data_drift_report(self):
         try:
-            profile = Profile(sections=[DataDriftProfileSection()])
-
-            train_df,test_df = self.get_train_and_test_df()
-
-            profile.calculate(train_df,test_df)
-
-            report = json.loads(profile.json())
+            if self.data_validation_config.drift_backend == DRIFT_BACKEND_EVIDENTLY:
+                # evidently is optional, only imported when selected
+                from evidently.model_profile import Profile
+                from evidently.model_profile.sections import DataDriftProfileSection
+
+                profile = Profile(sections=[DataDriftProfileSection()])
+                train_df,test_df = self.get_train_and_test_df()
+                profile.calculate(train_df,test_df)
+                report = json.loads(profile.json())
+            else:
+                train_profile,test_profile = self.get_train_and_test_profile()
+                drift_engine = DriftEngine(threshold=self.data_validation_config.drift_threshold)
+                report = drift_engine.calculate(reference_profile=train_profile,current_profile=test_profile)
 
             report_file_path = self.data_validation_config.report_file_path
             report_dir = os.path.dirname(report_file_path)
@@ -166,26 +358,36 @@ class DataValidation:
             raise ShipmentException(e,sys) from e
 
 
-    def save_data_drift_report_page(self):
+    def save_data_drift_report_page(self,report:dict=None):
         try:
-
-            dashboard = Dashboard(tabs=[DataDriftTab()])
-            train_df,test_df = self.get_train_and_test_df()
-            dashboard.calculate(train_df,test_df)
-
             report_page_file_path = self.data_validation_config.report_page_file_path
             report_page_dir = os.path.dirname(report_page_file_path)
             os.makedirs(report_page_dir,exist_ok=True)
 
-            dashboard.save(report_page_file_path)
+            if self.data_validation_config.drift_backend == DRIFT_BACKEND_EVIDENTLY:
+                from evidently.dashboard import Dashboard
+                from evidently.dashboard.tabs import DataDriftTab
+
+                dashboard = Dashboard(tabs=[DataDriftTab()])
+                train_df,test_df = self.get_train_and_test_df()
+                dashboard.calculate(train_df,test_df)
+                dashboard.save(report_page_file_path)
+            else:
+                # the page is rendered from the computed report, drift is not calculated again
+                if report is None:
+                    report = self.get_and_save_data_drift_report()
+                with open(report_page_file_path,"w") as report_page_file:
+                    report_page_file.write(render_drift_report_page(report))
 
         except Exception as e:
             raise ShipmentException(e,sys) from e
 
     def is_data_drift_found(self) -> bool:
         try:
-            self.get_and_save_data_drift_report()
-            self.save_data_drift_report_page()
+            if self.data_validation_config.drift_backend not in [DRIFT_BACKEND_NATIVE,DRIFT_BACKEND_EVIDENTLY]:
+                raise Exception(f"Unknown drift backend [{self.data_validation_config.drift_backend}]")
+            report = self.get_and_save_data_drift_report()
+            self.save_data_drift_report_page(report=report)
             return True
         except Exception as e:
             raise ShipmentException(e,sys) from e
@@ -195,15 +397,28 @@ class DataValidation:
     def initiate_data_validation(self) -> DataValidationArtifact:
         try:
             self.is_train_test_file_exists()
-            self.validate_dataset_schema()
+            is_schema_valid = self.validate_dataset_schema()
+            if not is_schema_valid:
+                logging.info(f"Train and test data do not match the schema [{self.data_validation_config.schema_file_path}]")
             self.is_data_drift_found()
+            quarantined_rows = self.validate_rows()
+            split_manifest_path = self.save_validated_split_manifest()
 
             data_validation_artifact = DataValidationArtifact(
                 schema_file_path=self.data_validation_config.schema_file_path,
                 report_file_path=self.data_validation_config.report_file_path,
                 report_page_file_path=self.data_validation_config.report_page_file_path,
-                is_validated=True,
-                message="Data Validation performed successully."
+                profile_file_path=self.data_validation_config.profile_file_path,
+                sketch_file_path=self.data_validation_config.sketch_file_path
+                if self.data_validation_config.drift_mode == DRIFT_MODE_SKETCH else None,
+                quarantine_file_path=self.data_validation_config.quarantine_file_path,
+                split_manifest_path=split_manifest_path,
+                quarantined_rows=quarantined_rows,
+                rule_counts=dict(self.rule_counts),
+                is_validated=is_schema_valid,
+                message=f"Data Validation performed successully. [{quarantined_rows}] rows quarantined."
+                if is_schema_valid else f"Train and test data do not match the schema, see validation log. "
+                                        f"[{quarantined_rows}] rows quarantined."
             )
             logging.info(f"Data validation artifact: {data_validation_artifact}")
             return data_validation_artifact
@@ -11,6 +11,8 @@ import os
 import sys
 
 from shipment.util.util import write_yaml_file,read_yaml_file,load_data,load_object
+from shipment.config.registry import get_schema
+from shipment.util.split_manifest import load_split_rows,SPLIT_TRAIN,SPLIT_TEST
 from shipment.entity.model_factory import BestModel, evaluate_regression_model
 
 
@@ -100,13 +102,16 @@ class ModelEvaluation:
             
             train_dataframe = load_data(file_path=train_file_path,
                                                            schema_file_path=schema_file_path,
+                                                           store_path=self.data_ingestion_artifact.store_path,
+                                                           rows=load_split_rows(self.data_validation_artifact.split_manifest_path,SPLIT_TRAIN)
                                                            )
             test_dataframe = load_data(file_path=test_file_path,
                                                           schema_file_path=schema_file_path,
+                                                          store_path=self.data_ingestion_artifact.store_path,
+                                                          rows=load_split_rows(self.data_validation_artifact.split_manifest_path,SPLIT_TEST)
                                                           )
 
-            schema_content = read_yaml_file(file_path=schema_file_path)
-            target_column_name = schema_content[DATASET_TARGET_COLUMN_KEY]
+            target_column_name = get_schema(schema_file_path=schema_file_path).target_column
 
             # target_column
             logging.info(f"Converting target column into numpy array.")
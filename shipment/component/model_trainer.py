@@ -1,25 +1,42 @@
 from sklearn import preprocessing
-from shipment.entity.artifact_entity import DataTransformationArtifact,ModelTrainerArtifact
+from shipment.entity.artifact_entity import DataIngestionArtifact,DataValidationArtifact,DataTransformationArtifact, \
+    ModelTrainerArtifact
 from shipment.entity.config_entity import ModelTrainerConfig
-from shipment.util.util import load_numpy_array_data,save_object,load_object
+from shipment.config.registry import get_schema
+from shipment.util.util import save_object,load_object,read_yaml_file,load_data
+from shipment.util.columnar_store import is_columnar_store
+from shipment.util.feature_store import load_feature_store,read_feature_store_header
+from shipment.util.split_manifest import is_split_manifest,load_fold_ids,load_split_rows,get_last_snapshot, \
+    get_snapshot_store_rows,SPLIT_TRAIN,SPLIT_TEST,SNAPSHOT_SOURCE_SHA256_KEY
+from sklearn.model_selection import PredefinedSplit
 from shipment.entity.model_factory import MetricInfoArtifact,ModelFactory,GridSearchedBestModel
-from shipment.entity.model_factory import evaluate_regression_model
+from shipment.entity.model_factory import evaluate_regression_models
 
 from shipment.exception import ShipmentException
-import sys
+from shipment.constant import BEST_MODEL_KEY,MODEL_PATH_KEY
+import numpy as np
+import os,sys
 from shipment.logger import logging
 from typing import List
 
+# raw rows transformed at a time with the preprocessing object of the current best model
+WARM_START_TRANSFORM_CHUNK_ROWS = 100000
+
 
 class ShipmentEstimatorModel:
-    def __init__(self,preprocessing_object,trained_model_object) -> None:
+    def __init__(self,preprocessing_object,trained_model_object,feature_dtype=None,training_snapshot=None) -> None:
         """
         TrainedModel constructor
         preprocessing_object: preprocessing_object
         trained_model_object: trained_model_object
+        feature_dtype: dtype of the transformed features the model was trained on
+        training_snapshot: last raw data snapshot of the split manifest the model was trained on,
+                           a later warm start continues training on the rows added since
         """
         self.preprocessing_object = preprocessing_object
         self.trained_model_object =trained_model_object 
+        self.feature_dtype = feature_dtype
+        self.training_snapshot = training_snapshot
 
     def predict(self,X):
 
@@ -30,6 +47,10 @@ class ShipmentEstimatorModel:
         """
 
         transformed_feature = self.preprocessing_object.transform(X)
+        # models saved before feature_dtype existed predict on the transformer output as is
+        feature_dtype = getattr(self,"feature_dtype",None)
+        if feature_dtype is not None:
+            transformed_feature = np.ascontiguousarray(transformed_feature,dtype=feature_dtype)
         return self.trained_model_object.predict(transformed_feature)
 
     def __repr__(self):
@@ -41,55 +62,241 @@ class ShipmentEstimatorModel:
 
 class ModelTrainer:
 
-    def __init__(self,model_trainer_config:ModelTrainerConfig,data_transformation_artifact: DataTransformationArtifact) -> None:
+    def __init__(self,model_trainer_config:ModelTrainerConfig,data_transformation_artifact: DataTransformationArtifact,
+                 data_ingestion_artifact:DataIngestionArtifact,data_validation_artifact:DataValidationArtifact) -> None:
         try:
             logging.info(f"{'>>' * 30 } Model trainer log started.{'>>' * 30 }")
             self.model_trainer_config = model_trainer_config
             self.data_transformation_artifact = data_transformation_artifact
+            self.data_ingestion_artifact = data_ingestion_artifact
+            self.data_validation_artifact = data_validation_artifact
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_champion_model(self) -> ShipmentEstimatorModel:
+        """
+        return: current best model of the model evaluation report, None when there is none
+        """
+        try:
+            model_evaluation_file_path = self.model_trainer_config.model_evaluation_file_path
+            if not os.path.exists(model_evaluation_file_path):
+                return None
+            model_eval_file_content = read_yaml_file(file_path=model_evaluation_file_path) or dict()
+            if BEST_MODEL_KEY not in model_eval_file_content:
+                return None
+            model_path = model_eval_file_content[BEST_MODEL_KEY][MODEL_PATH_KEY]
+            if not os.path.exists(model_path):
+                logging.info(f"Best model [{model_path}] of the model evaluation report not found")
+                return None
+            return load_object(file_path=model_path)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_training_snapshot(self) -> dict:
+        """
+        return: last raw data snapshot of the split manifest of the training data, None without one
+        """
+        split_manifest_path = self.data_transformation_artifact.split_manifest_path
+        return get_last_snapshot(split_manifest_path) if is_split_manifest(split_manifest_path) else None
+
+    def get_new_train_positions(self,champion_model:ShipmentEstimatorModel) -> np.ndarray:
+        """
+        Incremental ingestion appends the rows of new raw batches to the store of the previous snapshot,
+        so the train rows added since the current best model are the ones past its snapshot's store rows.
+        return: positions of those rows in the train split, None when the training data does not extend
+                the snapshot of the current best model
+        """
+        try:
+            training_snapshot = getattr(champion_model,"training_snapshot",None)
+            split_manifest_path = self.data_transformation_artifact.split_manifest_path
+            if training_snapshot is None or not is_columnar_store(self.data_ingestion_artifact.store_path) \
+                    or not is_split_manifest(split_manifest_path):
+                logging.info(f"Training snapshot of the current best model is unknown")
+                return None
+            store_rows = get_snapshot_store_rows(split_manifest_path,training_snapshot[SNAPSHOT_SOURCE_SHA256_KEY])
+            if store_rows is None:
+                logging.info(f"Training data was not ingested incrementally from the snapshot of the current best "
+                             f"model: [{training_snapshot}]")
+                return None
+            return np.flatnonzero(load_split_rows(split_manifest_path,SPLIT_TRAIN) >= store_rows)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def transform_split_rows(self,preprocessing_obj,split:str,positions:np.ndarray,feature_dtype):
+        """
+        Loads raw rows of the validated train or test split and transforms them chunk by chunk.
+        positions: positions within the split
+        return: input feature array of feature_dtype, target array
+        """
+        try:
+            schema_file_path = self.data_validation_artifact.schema_file_path
+            target_column_name = get_schema(schema_file_path=schema_file_path).target_column
+            rows = load_split_rows(self.data_transformation_artifact.split_manifest_path,split)[positions]
+            input_feature_arr,target_arr = None,np.empty(len(rows),dtype=np.float64)
+            for start in range(0,len(rows),WARM_START_TRANSFORM_CHUNK_ROWS):
+                end = min(start + WARM_START_TRANSFORM_CHUNK_ROWS,len(rows))
+                chunk_df = load_data(file_path=None,schema_file_path=schema_file_path,
+                                     store_path=self.data_ingestion_artifact.store_path,rows=rows[start:end])
+                chunk_arr = preprocessing_obj.transform(chunk_df.drop(columns=[target_column_name],axis=1))
+                if input_feature_arr is None:
+                    input_feature_arr = np.empty((len(rows),chunk_arr.shape[1]),dtype=feature_dtype)
+                input_feature_arr[start:end] = chunk_arr
+                target_arr[start:end] = chunk_df[target_column_name].to_numpy(dtype=np.float64)
+            logging.info(f"Transformed [{len(rows)}] {split} rows with the preprocessing object of the current best model")
+            return input_feature_arr,target_arr
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_warm_start_data(self,champion_model:ShipmentEstimatorModel):
+        """
+        The current best model keeps its fitted preprocessing object, so its estimator sees the feature
+        values it was trained on: the train rows added since its snapshot and the test rows are transformed
+        with that preprocessing object. It can not be warm started when the transformed features no longer
+        have the same names, e.g. after a schema change.
+        return: new train input features, new train target, test input features, test target,
+                None to train from scratch
+        """
+        try:
+            feature_names = read_feature_store_header(
+                self.data_transformation_artifact.transformed_train_store_path)["feature_names"]
+            champion_feature_names = list(champion_model.preprocessing_object.get_feature_names_out())
+            if champion_feature_names != list(feature_names):
+                logging.info(f"Features of the current best model differ from the ones of the training data, "
+                             f"training from scratch")
+                return None
+
+            new_train_positions = self.get_new_train_positions(champion_model=champion_model)
+            if new_train_positions is None:
+                logging.info(f"Training from scratch")
+                return None
+            if len(new_train_positions) == 0:
+                logging.info(f"No train rows added since the snapshot of the current best model, training from scratch")
+                return None
+            logging.info(f"[{len(new_train_positions)}] train rows added since the snapshot of the current best model")
+
+            feature_dtype = getattr(champion_model,"feature_dtype",None)
+            if feature_dtype is None:
+                feature_dtype = np.float64
+            x_train,y_train = self.transform_split_rows(preprocessing_obj=champion_model.preprocessing_object,
+                                                        split=SPLIT_TRAIN,positions=new_train_positions,
+                                                        feature_dtype=feature_dtype)
+            test_positions = np.arange(len(load_split_rows(self.data_transformation_artifact.split_manifest_path,
+                                                           SPLIT_TEST)))
+            x_test,y_test = self.transform_split_rows(preprocessing_obj=champion_model.preprocessing_object,
+                                                      split=SPLIT_TEST,positions=test_positions,
+                                                      feature_dtype=feature_dtype)
+            return x_train,y_train,x_test,y_test
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_warm_started_model_list(self,model_factory:ModelFactory,champion_model:ShipmentEstimatorModel,
+                                    x_train,y_train) -> List[GridSearchedBestModel]:
+        """
+        Continues training the estimator of the current best model on the train rows added since its snapshot.
+        return: [GridSearchedBestModel] of the warm started model, None to train from scratch
+        """
+        try:
+            grid_searched_best_model = model_factory.get_warm_started_model(
+                champion_model=champion_model.trained_model_object,input_feature=x_train,output_feature=y_train)
+            if grid_searched_best_model is None:
+                return None
+            model_factory.grid_searched_best_model_list = [grid_searched_best_model]
+            return model_factory.grid_searched_best_model_list
         except Exception as e:
             raise ShipmentException(e,sys) from e
 
     def initiate_model_trainer(self) -> ModelTrainerArtifact:
         try:
+            # the feature store is memory mapped read only, cross validation workers share its pages
             logging.info(f"Loading transformed training dataset")
-            transformed_train_file_path = self.data_transformation_artifact.transformed_train_file_path
-            train_arr = load_numpy_array_data(file_path=transformed_train_file_path)
+            transformed_train_store_path = self.data_transformation_artifact.transformed_train_store_path
+            x_train,y_train = load_feature_store(store_dir=transformed_train_store_path,mmap_mode="r")
 
             logging.info(f"Loading transformed testing dataset")
-            transformed_test_file_path = self.data_transformation_artifact.transformed_test_file_path
-            test_array = load_numpy_array_data(file_path=transformed_test_file_path)
+            transformed_test_store_path = self.data_transformation_artifact.transformed_test_store_path
+            x_test,y_test = load_feature_store(store_dir=transformed_test_store_path,mmap_mode="r")
 
-            logging.info(f"Splitting training and testing input and target feature")
-            x_train,y_train,x_test,y_test = train_arr[:,:-1],train_arr[:,-1],train_arr[:,:-1],train_arr[:,-1]
+            logging.info(f"Training input feature dtype: [{x_train.dtype}], shape: {x_train.shape}")
 
             logging.info(f"Extracting model config file path")
             model_config_file_path = self.model_trainer_config.model_config_file_path
 
             logging.info(f"Initializing model factory class using above model config file: {model_config_file_path}")
-            model_factory = ModelFactory(model_config_path=model_config_file_path)
+            model_factory = ModelFactory(model_config_path=model_config_file_path,
+                                         cv_cache_dir=self.model_trainer_config.cv_cache_dir)
 
             base_accuracy = self.model_trainer_config.base_accuracy
             logging.info(f"Expected accuracy: {base_accuracy}")
 
-            logging.info(f"Initiating operation model selection")
-            best_model = model_factory.get_best_model(X=x_train,y=y_train,base_accuracy=base_accuracy)
+            # folds of the split manifest keep the grid search reproducible for the same ingested data
+            cv = None
+            split_manifest_path = self.data_transformation_artifact.split_manifest_path
+            if is_split_manifest(split_manifest_path):
+                fold_ids = load_fold_ids(split_manifest_path)
+                if len(fold_ids) == len(y_train):
+                    logging.info(f"Using cross validation folds of split manifest: [{split_manifest_path}]")
+                    cv = PredefinedSplit(test_fold=fold_ids)
+
+            metric_info,metric_table = None,None
+            is_warm_started = False
+            champion_model = self.get_champion_model() if self.model_trainer_config.warm_start else None
+            warm_start_data = None
+            if champion_model is not None:
+                logging.info(f"Warm starting from the current best model")
+                warm_start_data = self.get_warm_start_data(champion_model=champion_model)
+            elif self.model_trainer_config.warm_start:
+                logging.info(f"No current best model, training from scratch")
+            if warm_start_data is not None:
+                x_new_train,y_new_train,x_champion_test,y_champion_test = warm_start_data
+                grid_searched_best_model_list = self.get_warm_started_model_list(model_factory=model_factory,
+                                                                                 champion_model=champion_model,
+                                                                                 x_train=x_new_train,
+                                                                                 y_train=y_new_train)
+                if grid_searched_best_model_list is not None:
+                    model_list = [model.best_model for model in grid_searched_best_model_list]
+                    logging.info(f"Evaluation warm started model on new training rows and testing dataset")
+                    metric_info,metric_table = evaluate_regression_models(model_list=model_list,
+                                                                          X_train=x_new_train,y_train=y_new_train,
+                                                                          X_test=x_champion_test,
+                                                                          y_test=y_champion_test,
+                                                                          base_accuracy=base_accuracy)
+                    is_warm_started = metric_info is not None
+                    if not is_warm_started:
+                        logging.info(f"Warm started model is not acceptable, training from scratch")
+
+            if not is_warm_started:
+                logging.info(f"Initiating operation model selection")
+                best_model = model_factory.get_best_model(X=x_train,y=y_train,base_accuracy=base_accuracy,cv=cv)
 
-            logging.info(f"Best model found on training dataset: {best_model}")
+                logging.info(f"Best model found on training dataset: {best_model}")
 
-            logging.info(f"Extracting trained model list.")
-            grid_searched_best_model_list:List[GridSearchedBestModel]=model_factory.grid_searched_best_model_list
+                logging.info(f"Extracting trained model list.")
+                grid_searched_best_model_list:List[GridSearchedBestModel]=model_factory.grid_searched_best_model_list
 
-            model_list = [model.best_model for model in grid_searched_best_model_list ]
-            logging.info(f"Evaluation all trained model on training and testing dataset both")
-            metric_info:MetricInfoArtifact = evaluate_regression_model(model_list=model_list,X_train=x_train,y_train=y_train,X_test=x_test,y_test=y_test,base_accuracy=base_accuracy)
+                model_list = [model.best_model for model in grid_searched_best_model_list ]
+                logging.info(f"Evaluation all trained model on training and testing dataset both")
+                metric_info,metric_table = evaluate_regression_models(model_list=model_list,X_train=x_train,
+                                                                      y_train=y_train,X_test=x_test,y_test=y_test,
+                                                                      base_accuracy=base_accuracy)
+            if metric_info is None:
+                raise Exception(f"None of the trained models is acceptable on training and testing dataset:\n"
+                                f"{metric_table.to_string()}")
 
             logging.info(f"Best found model on both training and testing dataset.")
 
-            preprocessing_obj = load_object(file_path=self.data_transformation_artifact.preprocessed_object_file_path)
+            # a warm started estimator keeps predicting on the features of the current best model
+            if is_warm_started:
+                preprocessing_obj = champion_model.preprocessing_object
+                feature_dtype = x_new_train.dtype
+            else:
+                preprocessing_obj = load_object(file_path=self.data_transformation_artifact.preprocessed_object_file_path)
+                feature_dtype = x_train.dtype
             model_object = metric_info.model_object
 
             trained_model_file_path = self.model_trainer_config.trained_model_file_path
-            housing_model = ShipmentEstimatorModel(preprocessing_object=preprocessing_obj,trained_model_object=model_object)
+            housing_model = ShipmentEstimatorModel(preprocessing_object=preprocessing_obj,trained_model_object=model_object,
+                                                   feature_dtype=feature_dtype,
+                                                   training_snapshot=self.get_training_snapshot())
 
             logging.info(f"Saving model at path: {trained_model_file_path}")
             save_object(file_path=trained_model_file_path,obj=housing_model)
@@ -101,8 +308,9 @@ class ModelTrainer:
                 train_rmse=metric_info.train_rmse,
                 test_rmse=metric_info.test_rmse,
                 train_accuracy=metric_info.train_accuracy,
-                test_accuracy=metric_info.test_rmse,
-                model_accuracy=metric_info.model_accuracy
+                test_accuracy=metric_info.test_accuracy,
+                model_accuracy=metric_info.model_accuracy,
+                is_warm_started=is_warm_started
             )
 
             logging.info(f"Model Trainer Artifact: {model_trainer_artifact}")
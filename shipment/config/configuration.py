@@ -3,7 +3,7 @@ from shipment.exception import ShipmentException
 from shipment.entity.config_entity import DataIngestionConfig, DataValidationConfig, DataTransformationConfig,\
     ModelTrainerConfig,ModelEvaluationConfig,ModelPusherConfig, TrainingPipelineConfig
 from shipment.constant import * 
-from shipment.util.util import read_yaml_file
+from shipment.config.registry import get_config
 import datetime
 import os,sys
 
@@ -16,7 +16,7 @@ class Configuration:
 
         try:
             self.time_stamp = time_stamp
-            self.config_info = read_yaml_file(file_path=config_file_path)
+            self.config_info = get_config(config_file_path=config_file_path)
             self.training_pipeline_config = self.get_training_pipeline_config()
 
         except Exception as e:
@@ -46,11 +46,34 @@ class Configuration:
             ingested_test_dir = os.path.join(ingested_data_dir,
                                             data_ingestion_info[DATA_INGESTION_TEST_DIR_KEY])
 
+            ingested_store_dir = os.path.join(ingested_data_dir,
+                                            data_ingestion_info[DATA_INGESTION_STORE_DIR_KEY])
+
+            split_manifest_dir = os.path.join(ingested_data_dir,
+                                            data_ingestion_info[DATA_INGESTION_SPLIT_MANIFEST_DIR_KEY])
+
+            # the raw data cache is shared by all runs, so it lives outside the timestamped directory
+            raw_data_cache_dir = os.path.join(artifact_dir,
+                                            data_ingestion_info[DATA_INGESTION_RAW_DATA_CACHE_DIR_KEY])
+
             data_ingestion_config = DataIngestionConfig(dataset_download_url=dataset_download_url,
                                                         raw_data_dir=raw_data_dir,
                                                         ingested_dir=ingested_data_dir,
                                                         ingested_train_dir=ingested_train_dir,
-                                                        ingested_test_dir=ingested_test_dir)
+                                                        ingested_test_dir=ingested_test_dir,
+                                                        ingested_store_dir=ingested_store_dir,
+                                                        split_manifest_dir=split_manifest_dir,
+                                                        raw_data_cache_dir=raw_data_cache_dir,
+                                                        skip_unchanged_ingestion=data_ingestion_info[DATA_INGESTION_SKIP_UNCHANGED_KEY],
+                                                        test_size=data_ingestion_info[DATA_INGESTION_TEST_SIZE_KEY],
+                                                        random_state=data_ingestion_info[DATA_INGESTION_RANDOM_STATE_KEY],
+                                                        streaming=data_ingestion_info[DATA_INGESTION_STREAMING_KEY],
+                                                        chunk_size=data_ingestion_info[DATA_INGESTION_CHUNK_SIZE_KEY],
+                                                        split_key_column=data_ingestion_info[DATA_INGESTION_SPLIT_KEY_COLUMN_KEY],
+                                                        incremental=data_ingestion_info[DATA_INGESTION_INCREMENTAL_KEY],
+                                                        n_jobs=data_ingestion_info[DATA_INGESTION_N_JOBS_KEY],
+                                                        n_folds=data_ingestion_info[DATA_INGESTION_N_FOLDS_KEY],
+                                                        export_split_csv=data_ingestion_info[DATA_INGESTION_EXPORT_SPLIT_CSV_KEY])
 
             logging.info(f"data Ingestion Config:{data_ingestion_config}")
             return data_ingestion_config
@@ -85,10 +108,34 @@ class Configuration:
 
             )
 
+            profile_file_path = os.path.join(data_validation_artifact_dir,
+            data_validation_config[DATA_VALIDATION_PROFILE_FILE_NAME_KEY]
+            )
+
+            sketch_file_path = os.path.join(data_validation_artifact_dir,
+            data_validation_config[DATA_VALIDATION_SKETCH_FILE_NAME_KEY]
+            )
+
+            quarantine_file_path = os.path.join(data_validation_artifact_dir,
+            data_validation_config[DATA_VALIDATION_QUARANTINE_FILE_NAME_KEY]
+            )
+
+            split_manifest_dir = os.path.join(data_validation_artifact_dir,
+            data_validation_config[DATA_VALIDATION_SPLIT_MANIFEST_DIR_KEY]
+            )
+
             data_validation_config = DataValidationConfig(
                 schema_file_path=schema_file_path,
                 report_file_path=report_file_path,
                 report_page_file_path=report_page_file_path,
+                profile_file_path=profile_file_path,
+                drift_backend=data_validation_config[DATA_VALIDATION_DRIFT_BACKEND_KEY],
+                drift_threshold=data_validation_config[DATA_VALIDATION_DRIFT_THRESHOLD_KEY],
+                drift_mode=data_validation_config[DATA_VALIDATION_DRIFT_MODE_KEY],
+                sketch_file_path=sketch_file_path,
+                sketch_chunk_size=data_validation_config[DATA_VALIDATION_SKETCH_CHUNK_SIZE_KEY],
+                quarantine_file_path=quarantine_file_path,
+                split_manifest_dir=split_manifest_dir,
             )
             return data_validation_config
         
@@ -130,12 +177,28 @@ class Configuration:
             data_transformation_config_info[DATA_TRANSFORMATION_TEST_DIR_NAME_KEY]
 
             )
-            
+
+            # shared by every run, the entries are keyed by data, schema and transformer
+            transformation_cache_dir = os.path.join(artifact_dir,
+                                                    data_transformation_config_info[DATA_TRANSFORMATION_CACHE_DIR_KEY])
+            use_transformation_cache = data_transformation_config_info[DATA_TRANSFORMATION_USE_CACHE_KEY]
+            feature_dtype = data_transformation_config_info[DATA_TRANSFORMATION_FEATURE_DTYPE_KEY]
+            transform_chunk_size = data_transformation_config_info[DATA_TRANSFORMATION_CHUNK_SIZE_KEY]
+            fit_sample_size = data_transformation_config_info[DATA_TRANSFORMATION_FIT_SAMPLE_SIZE_KEY]
+            random_state = data_transformation_config_info[DATA_TRANSFORMATION_RANDOM_STATE_KEY]
+            n_jobs = data_transformation_config_info[DATA_TRANSFORMATION_N_JOBS_KEY]
 
             data_transformation_config=DataTransformationConfig(
                 preprocessed_object_file_path=preprocessed_object_file_path,
                 transformed_train_dir=transformed_train_dir,
-                transformed_test_dir=transformed_test_dir
+                transformed_test_dir=transformed_test_dir,
+                transformation_cache_dir=transformation_cache_dir,
+                use_transformation_cache=use_transformation_cache,
+                feature_dtype=feature_dtype,
+                transform_chunk_size=transform_chunk_size,
+                fit_sample_size=fit_sample_size,
+                random_state=random_state,
+                n_jobs=n_jobs
             )
 
             logging.info(f"Data transformation config: {data_transformation_config}")
@@ -165,10 +228,22 @@ class Configuration:
 
             base_accuracy = model_trainer_config_info[MODEL_TRAINER_BASE_ACCURACY_KEY]
 
+            # shared by every run, the entries are keyed by estimator, parameters, transformed data and folds
+            cv_cache_dir = None
+            if model_trainer_config_info[MODEL_TRAINER_USE_CV_CACHE_KEY]:
+                cv_cache_dir = os.path.join(artifact_dir,model_trainer_config_info[MODEL_TRAINER_CV_CACHE_DIR_KEY])
+
+            # the current best model is read from the model evaluation report to warm start from it
+            warm_start = model_trainer_config_info[MODEL_TRAINER_WARM_START_KEY]
+            model_evaluation_file_path = self.get_model_evaluation_config().model_evaluation_file_path
+
             model_trainer_config = ModelTrainerConfig(
                 trained_model_file_path=trained_model_file_path,
                 base_accuracy=base_accuracy,
-                model_config_file_path=model_config_file_path
+                model_config_file_path=model_config_file_path,
+                cv_cache_dir=cv_cache_dir,
+                warm_start=warm_start,
+                model_evaluation_file_path=model_evaluation_file_path
             )
             logging.info(f"Model trainer config: {model_trainer_config}")
             return model_trainer_config
@@ -0,0 +1,128 @@
+from shipment.exception import ShipmentException
+from shipment.constant import DATASET_DETAILS_KEY, DATASET_NUMBER_OF_COLUMNS_KEY, DATASET_COLUMNS_KEY, \
+    DATASET_NUMERICAL_COLUMNS_KEY, DATASET_CATEGORICAL_COLUMNS_KEY, DATASET_DATETIME_COLUMNS_KEYS, \
+    DATASET_DATETIME_FORMAT_KEY, DATASET_DOMAIN_VALUE_KEY, DATASET_TARGET_COLUMN_KEY, DATASET_DROP_COLUMNS_KEY, \
+    DATASET_CLEANING_RULES_KEY, DATASET_FLOAT_DTYPE_KEY, DATASET_VALIDATION_RULES_KEY, \
+    DATASET_LEAD_TIME_DATE_COLUMNS_KEY, DATASET_CATEGORICAL_ENCODERS_KEY
+from collections import namedtuple
+import threading
+import hashlib
+import yaml
+import os,sys
+
+# schema.yaml column types -> pandas dtypes
+SCHEMA_PANDAS_DTYPES = {"category":"category","float":"float64","int":"int64","object":"object","str":"object"}
+DEFAULT_FLOAT_DTYPE = "float64"
+DATETIME_DTYPE = "datetime64[ns]"
+
+RegistryEntry = namedtuple("RegistryEntry",["stat_key","sha256","value"])
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class CompiledSchema:
+
+    def __init__(self,file_path:str,schema_hash:str,schema_info:dict) -> None:
+        """
+        schema.yaml resolved once into the structures the components look things up in.
+        file_path: schema file the schema was read from
+        schema_hash: sha256 of the schema file content
+        schema_info: parsed schema.yaml content, shared by every user of the schema and not to be modified
+        """
+        try:
+            self.file_path = file_path
+            self.schema_hash = schema_hash
+            self.info = schema_info
+
+            self.number_of_columns = schema_info[DATASET_DETAILS_KEY][DATASET_NUMBER_OF_COLUMNS_KEY]
+            self.columns = dict(schema_info[DATASET_COLUMNS_KEY])
+            self.column_index = {column:index for index,column in enumerate(self.columns)}
+            self.numerical_columns = list(schema_info[DATASET_NUMERICAL_COLUMNS_KEY])
+            self.categorical_columns = list(schema_info[DATASET_CATEGORICAL_COLUMNS_KEY])
+            self.datetime_columns = list(schema_info[DATASET_DATETIME_COLUMNS_KEYS])
+            self.datetime_format = schema_info.get(DATASET_DATETIME_FORMAT_KEY)
+            self.lead_time_date_columns = dict(schema_info.get(DATASET_LEAD_TIME_DATE_COLUMNS_KEY) or {})
+            self.float_dtype = schema_info.get(DATASET_FLOAT_DTYPE_KEY) or DEFAULT_FLOAT_DTYPE
+            self.target_column = schema_info[DATASET_TARGET_COLUMN_KEY]
+            self.drop_columns = list(schema_info.get(DATASET_DROP_COLUMNS_KEY) or [])
+            self.cleaning_rules = dict(schema_info.get(DATASET_CLEANING_RULES_KEY) or {})
+            self.validation_rules = dict(schema_info.get(DATASET_VALIDATION_RULES_KEY) or {})
+            self.categorical_encoders = dict(schema_info.get(DATASET_CATEGORICAL_ENCODERS_KEY) or {})
+            self.domain_values = {column:frozenset(values)
+                                  for column,values in dict(schema_info.get(DATASET_DOMAIN_VALUE_KEY) or {}).items()}
+
+            self.pandas_dtypes = {column:SCHEMA_PANDAS_DTYPES.get(str(dtype),str(dtype))
+                                  for column,dtype in self.columns.items()}
+            self.pandas_dtypes.update({column:self.float_dtype for column in self.numerical_columns})
+            self.pandas_dtypes.update({column:DATETIME_DTYPE for column in self.datetime_columns})
+            # datetime columns are parsed with datetime_format after reading, columns with cleaning
+            # rules hold sentinel text in the raw csv and are coerced after reading
+            self.read_csv_dtypes = {column:dtype for column,dtype in self.pandas_dtypes.items()
+                                    if column not in self.cleaning_rules and column != self.target_column
+                                    and column not in self.datetime_columns}
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def __repr__(self) -> str:
+        return f"CompiledSchema(file_path={self.file_path!r}, schema_hash={self.schema_hash!r})"
+
+
+def get_file_stat_key(file_path:str) -> tuple:
+    file_stat = os.stat(file_path)
+    return file_stat.st_mtime_ns,file_stat.st_size
+
+
+def load_registered_file(kind:str,file_path:str,compile_fn):
+    """
+    Parses a yaml file once per process. The file is only read again when its mtime or size
+    changed and only parsed again when its content hash changed as well.
+    kind: name of the registry, e.g. schema or config
+    compile_fn: compile_fn(file_path, sha256, parsed content) -> registered value
+    """
+    try:
+        file_path = os.path.abspath(file_path)
+        stat_key = get_file_stat_key(file_path)
+        with _registry_lock:
+            entry = _registry.get((kind,file_path))
+        if entry is not None and entry.stat_key == stat_key:
+            return entry.value
+
+        with open(file_path,"rb") as yaml_file:
+            content = yaml_file.read()
+        sha256 = hashlib.sha256(content).hexdigest()
+        if entry is not None and entry.sha256 == sha256:
+            value = entry.value
+        else:
+            value = compile_fn(file_path,sha256,yaml.safe_load(content))
+
+        with _registry_lock:
+            _registry[(kind,file_path)] = RegistryEntry(stat_key=stat_key,sha256=sha256,value=value)
+        return value
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
+
+
+def get_schema(schema_file_path:str) -> CompiledSchema:
+    """
+    schema_file_path: str schema.yaml location
+    return: CompiledSchema shared within the process
+    """
+    return load_registered_file(kind="schema",file_path=schema_file_path,
+                                compile_fn=lambda file_path,sha256,content: CompiledSchema(file_path=file_path,
+                                                                                           schema_hash=sha256,
+                                                                                           schema_info=content))
+
+
+def get_config(config_file_path:str) -> dict:
+    """
+    config_file_path: str config.yaml location
+    return: parsed config shared within the process, not to be modified
+    """
+    return load_registered_file(kind="config",file_path=config_file_path,
+                                compile_fn=lambda file_path,sha256,content: content)
+
+
+def clear_registry():
+    with _registry_lock:
+        _registry.clear()
@@ -29,6 +29,26 @@ DATA_INGESTION_RAW_DATA_DIR_KEY = "raw_data_dir"
 DATA_INGESTION_INGESTED_DIR_NAME_KEY = "ingested_dir"
 DATA_INGESTION_TRAIN_DIR_KEY = "ingested_train_dir"
 DATA_INGESTION_TEST_DIR_KEY = "ingested_test_dir"
+DATA_INGESTION_STORE_DIR_KEY = "ingested_store_dir"
+DATA_INGESTION_RAW_DATA_CACHE_DIR_KEY = "raw_data_cache_dir"
+DATA_INGESTION_SKIP_UNCHANGED_KEY = "skip_unchanged_ingestion"
+DATA_INGESTION_SPLIT_MANIFEST_DIR_KEY = "split_manifest_dir"
+DATA_INGESTION_N_FOLDS_KEY = "n_folds"
+DATA_INGESTION_EXPORT_SPLIT_CSV_KEY = "export_split_csv"
+DATA_INGESTION_TRAIN_SPLIT_NAME = "train"
+DATA_INGESTION_TEST_SPLIT_NAME = "test"
+DATA_INGESTION_TEST_SIZE_KEY = "test_size"
+DATA_INGESTION_RANDOM_STATE_KEY = "random_state"
+DATA_INGESTION_STREAMING_KEY = "streaming"
+DATA_INGESTION_CHUNK_SIZE_KEY = "chunk_size"
+DATA_INGESTION_SPLIT_KEY_COLUMN_KEY = "split_key_column"
+DATA_INGESTION_INCREMENTAL_KEY = "incremental"
+DATA_INGESTION_RAW_BATCH_FILE_EXTENSION = ".csv"
+DATA_INGESTION_N_JOBS_KEY = "n_jobs"
+DATA_INGESTION_SHARDS_DIR_NAME = "shards"
+HASH_SPLIT_BUCKETS = 10000
+SPLIT_METHOD_HASH = "hash"
+SPLIT_METHOD_TRAIN_TEST_SPLIT = "train_test_split"
 
 
 # Data Validation related variables
@@ -39,6 +59,18 @@ DATA_VALIDATION_SCHEMA_DIR_KEY = "schema_dir"
 DATA_VALIDATION_ARTIFACT_DIR_NAME="data_validation"
 DATA_VALIDATION_REPORT_FILE_NAME_KEY = "report_file_name"
 DATA_VALIDATION_REPORT_PAGE_FILE_NAME_KEY = "report_page_file_name"
+DATA_VALIDATION_PROFILE_FILE_NAME_KEY = "profile_file_name"
+DATA_VALIDATION_DRIFT_BACKEND_KEY = "drift_backend"
+DATA_VALIDATION_DRIFT_THRESHOLD_KEY = "drift_threshold"
+DRIFT_BACKEND_NATIVE = "native"
+DRIFT_BACKEND_EVIDENTLY = "evidently"
+DATA_VALIDATION_DRIFT_MODE_KEY = "drift_mode"
+DATA_VALIDATION_SKETCH_FILE_NAME_KEY = "sketch_file_name"
+DATA_VALIDATION_SKETCH_CHUNK_SIZE_KEY = "sketch_chunk_size"
+DATA_VALIDATION_QUARANTINE_FILE_NAME_KEY = "quarantine_file_name"
+DATA_VALIDATION_SPLIT_MANIFEST_DIR_KEY = "split_manifest_dir"
+DRIFT_MODE_PROFILE = "profile"
+DRIFT_MODE_SKETCH = "sketch"
 
 # Schema related variables
 DATASET_DETAILS_KEY = "dataset_details"
@@ -47,13 +79,40 @@ DATASET_COLUMNS_KEY = "columns"
 DATASET_NUMERICAL_COLUMNS_KEY = "numerical_columns"
 DATASET_CATEGORICAL_COLUMNS_KEY = "categorical_columns"
 DATASET_DATETIME_COLUMNS_KEYS = "datetime_columns"
+DATASET_DATETIME_FORMAT_KEY = "datetime_format"
 DATASET_DOMAIN_VALUE_KEY = "domain_value"
 DATASET_TARGET_COLUMN_KEY ="target_column"
+DATASET_DROP_COLUMNS_KEY = "drop_columns"
+DATASET_CLEANING_RULES_KEY = "cleaning_rules"
+DATASET_FLOAT_DTYPE_KEY = "float_dtype"
+DATASET_LEAD_TIME_DATE_COLUMNS_KEY = "lead_time_date_columns"
+DATASET_VALIDATION_RULES_KEY = "validation_rules"
+VALIDATION_RULE_NULLABLE_KEY = "nullable"
+VALIDATION_RULE_MIN_KEY = "min"
+VALIDATION_RULE_MAX_KEY = "max"
+CLEANING_RULE_COERCE_KEY = "coerce"
+CLEANING_RULE_SENTINEL_VALUES_KEY = "sentinel_values"
+CLEANING_RULE_SENTINEL_PATTERNS_KEY = "sentinel_patterns"
+DATASET_CATEGORICAL_ENCODERS_KEY = "categorical_encoders"
+ENCODER_TYPE_KEY = "encoder"
+ENCODER_N_FEATURES_KEY = "n_features"
+ENCODER_N_BUCKETS_KEY = "n_buckets"
+ENCODER_SMOOTHING_KEY = "smoothing"
+ENCODER_N_FOLDS_KEY = "n_folds"
+ENCODER_ORDINAL = "ordinal"
+ENCODER_HASHING = "hashing"
+ENCODER_TARGET = "target"
 
 # schema transformed or added columes after eda variables
 SCHEDULED_DELIVERY_DATE_KEY ="Scheduled Delivery Date"
 DELIVERED_TO_CLIENT_DATE_KEY = "Delivered to Client Date"
 LATE_DAYS_BETWEEN_SCHEDULED_DELIVERY_COLUMN_KEY = "late_days_between_delivery_scheduled"
+PQ_FIRST_SENT_TO_CLIENT_DATE_KEY = "PQ First Sent to Client Date"
+PO_SENT_TO_VENDOR_DATE_KEY = "PO Sent to Vendor Date"
+DELIVERY_RECORDED_DATE_KEY = "Delivery Recorded Date"
+DAYS_BETWEEN_PQ_AND_PO_COLUMN_KEY = "days_between_pq_and_po"
+DAYS_BETWEEN_PO_AND_SCHEDULED_DELIVERY_COLUMN_KEY = "days_between_po_and_scheduled_delivery"
+DAYS_BETWEEN_DELIVERY_AND_RECORDING_COLUMN_KEY = "days_between_delivery_and_recording"
 
 # Data Transformation related variables
 DATA_TRANSFORMATION_ARTIFACT_DIR = "data_transformation"
@@ -63,6 +122,13 @@ DATA_TRANSFORMATION_TRAIN_DIR_NAME_KEY = "transformed_train_dir"
 DATA_TRANSFORMATION_TEST_DIR_NAME_KEY = "transformed_test_dir"
 DATA_TRANSFORMATION_PREPROCESSING_DIR_KEY = "preprocessing_dir"
 DATA_TRANSFORMATION_PREPROCESSED_FILE_NAME_KEY = "preprocessed_object_file_name"
+DATA_TRANSFORMATION_CACHE_DIR_KEY = "transformation_cache_dir"
+DATA_TRANSFORMATION_USE_CACHE_KEY = "use_transformation_cache"
+DATA_TRANSFORMATION_FEATURE_DTYPE_KEY = "feature_dtype"
+DATA_TRANSFORMATION_CHUNK_SIZE_KEY = "transform_chunk_size"
+DATA_TRANSFORMATION_FIT_SAMPLE_SIZE_KEY = "fit_sample_size"
+DATA_TRANSFORMATION_RANDOM_STATE_KEY = "random_state"
+DATA_TRANSFORMATION_N_JOBS_KEY = "n_jobs"
 
 # Model Training related variables
 
@@ -73,6 +139,9 @@ MODEL_TRAINER_TRAINED_MODEL_FILE_NAME_KEY = "model_file_name"
 MODEL_TRAINER_BASE_ACCURACY_KEY = "base_accuracy"
 MODEL_TRAINER_MODEL_CONFIG_DIR_KEY = "model_config_dir"
 MODEL_TRAINER_MODEL_CONFIG_FILE_NAME_KEY = "model_config_file_name"
+MODEL_TRAINER_CV_CACHE_DIR_KEY = "cv_cache_dir"
+MODEL_TRAINER_USE_CV_CACHE_KEY = "use_cv_cache"
+MODEL_TRAINER_WARM_START_KEY = "warm_start"
 
 
 # Model Evaluation related variables
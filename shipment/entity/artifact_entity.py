@@ -1,18 +1,20 @@
 from collections import namedtuple
 
-DataIngestionArtifact = namedtuple("DataIngestionArtifact",["is_ingested","train_file_path","test_file_path","message"])
+DataIngestionArtifact = namedtuple("DataIngestionArtifact",["is_ingested","train_file_path","test_file_path",
+                                                            "store_path","split_manifest_path","message"])
 
 DataValidationArtifact = namedtuple("DataValidationArtifact",
-["schema_file_path","report_file_path","report_page_file_path","is_validated","message"])
+["schema_file_path","report_file_path","report_page_file_path","profile_file_path","sketch_file_path",
+ "quarantine_file_path","split_manifest_path","quarantined_rows","rule_counts","is_validated","message"])
 
 DataTransformationArtifact = namedtuple("DataTransformationArtifact",
- ["is_transformed", "message", "transformed_train_file_path","transformed_test_file_path",
-     "preprocessed_object_file_path"])
+ ["is_transformed", "message", "transformed_train_store_path","transformed_test_store_path",
+     "preprocessed_object_file_path","split_manifest_path","is_cache_hit"])
 
 
 ModelTrainerArtifact = namedtuple("ModelTrainerArtifact", ["is_trained", "message", "trained_model_file_path",
                                                            "train_rmse", "test_rmse", "train_accuracy", "test_accuracy",
-                                                           "model_accuracy"])
+                                                           "model_accuracy", "is_warm_started"])
 
 ModelEvaluationArtifact = namedtuple("ModelEvaluationArtifact", ["is_model_accepted", "evaluated_model_path"])
 
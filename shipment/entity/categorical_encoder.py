@@ -0,0 +1,156 @@
+import sys
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator,TransformerMixin
+from sklearn.model_selection import KFold
+
+from shipment.exception import ShipmentException
+
+# fixed key so that a value hashes to the same bucket in every process and python version
+HASH_KEY = "shipment-encoder"
+
+
+def get_value_hashes(values:np.ndarray) -> np.ndarray:
+    """
+    return: uint64 hash of every value, distinct values are hashed once and missing values hash alike
+    """
+    codes,distinct_values = pd.factorize(np.asarray(values,dtype=object).ravel())
+    distinct_hashes = pd.util.hash_array(np.asarray(distinct_values,dtype=str).astype(object),hash_key=HASH_KEY)
+    missing_hash = pd.util.hash_array(np.array([""],dtype=object),hash_key=HASH_KEY)
+    return np.append(distinct_hashes,missing_hash)[codes]
+
+
+def get_input_features(estimator,input_features) -> list:
+    if input_features is not None:
+        return [str(feature) for feature in input_features]
+    return [f"x{index}" for index in range(estimator.n_features_in_)]
+
+
+class HashingEncoder(BaseEstimator,TransformerMixin):
+
+    def __init__(self,n_features:int=16):
+        """
+        Signed hashing trick, every input column is mapped to its own block of n_features columns
+        holding +1 or -1 in the bucket of the value. Nothing is learned, so the fitted encoder has
+        the same size for any number of categories and unseen values are hashed like any other value.
+        n_features: output columns per input column
+        """
+        self.n_features = n_features
+
+    def fit(self,X,y=None):
+        self.n_features_in_ = np.asarray(X).reshape(len(X),-1).shape[1]
+        return self
+
+    def transform(self,X):
+        try:
+            X = np.asarray(X,dtype=object).reshape(len(X),-1)
+            encoded = np.zeros((len(X),X.shape[1] * self.n_features),dtype=np.float64)
+            rows = np.arange(len(X))
+            for column_ix in range(X.shape[1]):
+                value_hashes = get_value_hashes(X[:,column_ix])
+                buckets = (value_hashes % np.uint64(self.n_features)).astype(np.int64)
+                # the top bit of the hash gives the sign, so colliding values tend to cancel out
+                signs = 1.0 - 2.0 * (value_hashes >> np.uint64(63)).astype(np.float64)
+                encoded[rows,column_ix * self.n_features + buckets] = signs
+            return encoded
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_feature_names_out(self,input_features=None):
+        return np.array([f"{feature}_hash_{bucket}" for feature in get_input_features(self,input_features)
+                         for bucket in range(self.n_features)],dtype=object)
+
+
+class TargetEncoder(BaseEstimator,TransformerMixin):
+
+    def __init__(self,n_buckets:int=4096,smoothing:float=10.0,n_folds:int=5,random_state:int=42):
+        """
+        Smoothed mean target per category: (target sum + smoothing * prior) / (count + smoothing).
+        Categories are hashed into n_buckets, so the fitted encoder holds two fixed size arrays per
+        column whatever the number of categories. Unseen values get the prior unless their bucket collides.
+        fit_transform encodes every training row with statistics of the other folds only, so the
+        model does not see the target of a row through its own encoding.
+        n_buckets: hash buckets per column
+        smoothing: weight of the prior in number of rows
+        n_folds: folds of the out of fold encoding
+        random_state: seed of the fold assignment
+        """
+        self.n_buckets = n_buckets
+        self.smoothing = smoothing
+        self.n_folds = n_folds
+        self.random_state = random_state
+
+    def get_buckets(self,X) -> np.ndarray:
+        X = np.asarray(X,dtype=object).reshape(len(X),-1)
+        return np.column_stack([(get_value_hashes(X[:,column_ix]) % np.uint64(self.n_buckets)).astype(np.int64)
+                                for column_ix in range(X.shape[1])])
+
+    def get_statistics(self,buckets:np.ndarray,y:np.ndarray):
+        """
+        return: target sums and counts per bucket, shape (n_buckets, n_columns)
+        """
+        sums = np.column_stack([np.bincount(buckets[:,column_ix],weights=y,minlength=self.n_buckets)
+                                for column_ix in range(buckets.shape[1])])
+        counts = np.column_stack([np.bincount(buckets[:,column_ix],minlength=self.n_buckets)
+                                  for column_ix in range(buckets.shape[1])]).astype(np.float64)
+        return sums,counts
+
+    def encode(self,buckets:np.ndarray,sums:np.ndarray,counts:np.ndarray,prior:float) -> np.ndarray:
+        encoding = (sums + self.smoothing * prior) / (counts + self.smoothing)
+        return np.take_along_axis(encoding,buckets,axis=0)
+
+    def fit(self,X,y=None):
+        try:
+            if y is None:
+                raise Exception(f"{type(self).__name__} needs the target to fit.")
+            y = np.asarray(y,dtype=np.float64)
+            buckets = self.get_buckets(X)
+            # rows without target do not count for any category
+            has_target = ~np.isnan(y)
+            buckets,y = buckets[has_target],y[has_target]
+
+            self.n_features_in_ = buckets.shape[1]
+            self.prior_ = float(y.mean()) if len(y) > 0 else 0.0
+            self.sums_,self.counts_ = self.get_statistics(buckets=buckets,y=y)
+            return self
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def transform(self,X):
+        try:
+            return self.encode(buckets=self.get_buckets(X),sums=self.sums_,counts=self.counts_,prior=self.prior_)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def fit_transform(self,X,y=None,**fit_params):
+        """
+        Fits on all rows and returns the out of fold encoding of X.
+        """
+        try:
+            self.fit(X,y)
+            y = np.asarray(y,dtype=np.float64)
+            buckets = self.get_buckets(X)
+            encoded = np.empty(buckets.shape,dtype=np.float64)
+            if len(y) < self.n_folds:
+                return self.transform(X)
+
+            has_target = ~np.isnan(y)
+            target_sum,target_count = y[has_target].sum(),has_target.sum()
+            folds = KFold(n_splits=self.n_folds,shuffle=True,random_state=self.random_state)
+            for _,fold_rows in folds.split(buckets):
+                fold_rows = fold_rows[has_target[fold_rows]]
+                fold_sums,fold_counts = self.get_statistics(buckets=buckets[fold_rows],y=y[fold_rows])
+                other_count = target_count - len(fold_rows)
+                prior = (target_sum - y[fold_rows].sum()) / other_count if other_count > 0 else self.prior_
+                encoded[fold_rows] = self.encode(buckets=buckets[fold_rows],sums=self.sums_ - fold_sums,
+                                                 counts=self.counts_ - fold_counts,prior=prior)
+            # rows without target are encoded with the statistics of all rows
+            encoded[~has_target] = self.encode(buckets=buckets[~has_target],sums=self.sums_,counts=self.counts_,
+                                               prior=self.prior_)
+            return encoded
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_feature_names_out(self,input_features=None):
+        return np.array([f"{feature}_target" for feature in get_input_features(self,input_features)],dtype=object)
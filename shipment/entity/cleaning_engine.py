@@ -0,0 +1,210 @@
+import re
+import sys
+from collections import namedtuple
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from shipment.constant import *
+from shipment.exception import ShipmentException
+from shipment.config.registry import get_schema
+
+COERCE_NUMERIC = "numeric"
+
+ColumnCleaningRule = namedtuple("ColumnCleaningRule",["column","coerce","sentinel_values","sentinel_patterns"])
+
+CleaningReport = namedtuple("CleaningReport",["input_rows","output_rows","dropped_columns","column_report"])
+
+DomainFilterReport = namedtuple("DomainFilterReport",["input_rows","output_rows","column_report"])
+
+MAX_UNKNOWN_VALUE_SAMPLES = 10
+
+
+def get_domain_keep_mask(df:pd.DataFrame,domain_values:dict,max_unknown_samples:int=MAX_UNKNOWN_VALUE_SAMPLES):
+    """
+    Single pass over the domain columns of df.
+    A row is kept when every domain column is either missing or one of the allowed values.
+    domain_values: {column: allowed values} as in the domain_value section of schema.yaml
+    return: boolean keep mask aligned to df.index,
+            {column: {"dropped": rows with an unknown value in the column, "unknown_values": sample}}
+    """
+    try:
+        keep_mask = np.ones(len(df),dtype=bool)
+        column_report = {}
+        for column,allowed_values in domain_values.items():
+            if column not in df.columns:
+                continue
+            # domain check runs on the distinct values only, missing values (code -1) are kept
+            codes,distinct_values = pd.factorize(df[column])
+            is_unknown_value = ~pd.Index(distinct_values).isin(allowed_values)
+            if not is_unknown_value.any():
+                continue
+            is_unknown = np.append(is_unknown_value,False)[codes]
+            keep_mask &= ~is_unknown
+            unknown_values = np.asarray(distinct_values)[is_unknown_value][:max_unknown_samples]
+            column_report[column] = {"dropped":int(is_unknown.sum()),
+                                     "unknown_values":[str(value) for value in unknown_values]}
+        return pd.Series(keep_mask,index=df.index),column_report
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
+
+
+def filter_domain_values(df:pd.DataFrame,domain_values:dict):
+    """
+    Drops the rows of df holding a category that is not part of the schema domain.
+    Usable both on ingested test data and on incoming rows before prediction.
+    return: filtered dataframe, DomainFilterReport
+    """
+    try:
+        keep_mask,column_report = get_domain_keep_mask(df=df,domain_values=domain_values)
+        filtered_df = df if keep_mask.all() else df[keep_mask]
+        domain_filter_report = DomainFilterReport(input_rows=len(df),
+                                                  output_rows=len(filtered_df),
+                                                  column_report=column_report)
+        return filtered_df,domain_filter_report
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
+
+
+class CleaningEngine:
+
+    def __init__(self,target_column:str,column_rules:List[ColumnCleaningRule],drop_columns:List[str],
+                 domain_values:dict=None):
+        """
+        CleaningEngine compiled from the dataset schema.
+        target_column: rows where the target cannot be coerced are dropped
+        column_rules: one compiled rule per column to coerce
+        drop_columns: columns removed from the cleaned dataset
+        domain_values: allowed values per categorical column, used by filter_domain
+        """
+        self.target_column = target_column
+        self.column_rules = column_rules
+        self.drop_columns = drop_columns
+        self.domain_values = {column:frozenset(values) for column,values in dict(domain_values or {}).items()}
+
+    @staticmethod
+    def compile_rule(column:str,rule:dict) -> ColumnCleaningRule:
+        """
+        Compiles one cleaning_rules entry of schema.yaml.
+        sentinel values and patterns map to a replacement value, null meaning NaN.
+        """
+        try:
+            coerce = rule.get(CLEANING_RULE_COERCE_KEY,COERCE_NUMERIC)
+            if coerce != COERCE_NUMERIC:
+                raise Exception(f"Unsupported coercion [{coerce}] for column [{column}]")
+
+            sentinel_values = {value:np.nan if replacement is None else float(replacement)
+                               for value,replacement in dict(rule.get(CLEANING_RULE_SENTINEL_VALUES_KEY) or {}).items()}
+            sentinel_patterns = [(re.compile(pattern),np.nan if replacement is None else float(replacement))
+                                 for pattern,replacement in dict(rule.get(CLEANING_RULE_SENTINEL_PATTERNS_KEY) or {}).items()]
+
+            return ColumnCleaningRule(column=column,
+                                      coerce=coerce,
+                                      sentinel_values=sentinel_values,
+                                      sentinel_patterns=sentinel_patterns)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    @classmethod
+    def from_schema(cls,dataset_schema:dict) -> "CleaningEngine":
+        """
+        Builds the engine once from the parsed schema.yaml content.
+        Target and numerical columns get a plain numeric rule unless cleaning_rules overrides it.
+        """
+        try:
+            target_column = dataset_schema[DATASET_TARGET_COLUMN_KEY]
+            cleaning_rules = dict(dataset_schema.get(DATASET_CLEANING_RULES_KEY) or {})
+
+            rule_columns = [target_column] + list(dataset_schema[DATASET_NUMERICAL_COLUMNS_KEY])
+            rule_columns += [column for column in cleaning_rules if column not in rule_columns]
+
+            column_rules = [cls.compile_rule(column=column,rule=cleaning_rules.get(column,{}))
+                            for column in rule_columns]
+
+            return cls(target_column=target_column,
+                       column_rules=column_rules,
+                       drop_columns=list(dataset_schema.get(DATASET_DROP_COLUMNS_KEY) or []),
+                       domain_values=dataset_schema.get(DATASET_DOMAIN_VALUE_KEY))
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    @classmethod
+    def from_schema_file(cls,schema_file_path:str) -> "CleaningEngine":
+        return cls.from_schema(get_schema(schema_file_path=schema_file_path).info)
+
+    @staticmethod
+    def apply_rule(series:pd.Series,rule:ColumnCleaningRule):
+        """
+        Coerces a whole column at once.
+        Known sentinels are mapped to their configured value, every other value
+        that is not numeric becomes NaN.
+        return: coerced series, {"sentinel": count, "coerced": count}
+        """
+        try:
+            if pd.api.types.is_numeric_dtype(series.dtype):
+                return series,{"sentinel":0,"coerced":0}
+
+            numeric = pd.to_numeric(series,errors="coerce")
+            unparsed = numeric.isna() & series.notna()
+            sentinel_count = 0
+
+            if unparsed.any() and len(rule.sentinel_values) > 0:
+                is_sentinel = unparsed & series.isin(list(rule.sentinel_values.keys()))
+                if is_sentinel.any():
+                    numeric[is_sentinel] = series[is_sentinel].map(rule.sentinel_values).astype(float)
+                    sentinel_count += int(is_sentinel.sum())
+                    unparsed &= ~is_sentinel
+
+            if unparsed.any() and len(rule.sentinel_patterns) > 0:
+                # free-text sentinels repeat a lot, so the regexes only run on distinct values
+                distinct_values = pd.Series(series[unparsed].unique()).astype(str)
+                replacements = {}
+                for pattern,replacement in rule.sentinel_patterns:
+                    matched = distinct_values[distinct_values.str.match(pattern)]
+                    replacements.update({value:replacement for value in matched if value not in replacements})
+                if len(replacements) > 0:
+                    is_sentinel = unparsed & series.isin(list(replacements.keys()))
+                    numeric[is_sentinel] = series[is_sentinel].map(replacements).astype(float)
+                    sentinel_count += int(is_sentinel.sum())
+                    unparsed &= ~is_sentinel
+
+            return numeric,{"sentinel":sentinel_count,"coerced":int(unparsed.sum())}
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def clean(self,df:pd.DataFrame):
+        """
+        Applies the compiled rules on df.
+        return: cleaned dataframe, CleaningReport
+        """
+        try:
+            input_rows = len(df)
+            if self.target_column not in df.columns:
+                raise Exception(f"{self.target_column} NOT FOUND IN DATASET.")
+
+            column_report = {}
+            for rule in self.column_rules:
+                if rule.column in df.columns:
+                    df[rule.column],column_report[rule.column] = CleaningEngine.apply_rule(series=df[rule.column],
+                                                                                           rule=rule)
+
+            df = df[df[self.target_column].notna()]
+
+            dropped_columns = [column for column in self.drop_columns if column in df.columns]
+            df = df.drop(columns=dropped_columns)
+
+            cleaning_report = CleaningReport(input_rows=input_rows,
+                                             output_rows=len(df),
+                                             dropped_columns=dropped_columns,
+                                             column_report=column_report)
+            return df,cleaning_report
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def filter_domain(self,df:pd.DataFrame):
+        """
+        Drops rows with categories outside the schema domain, see filter_domain_values.
+        return: filtered dataframe, DomainFilterReport
+        """
+        return filter_domain_values(df=df,domain_values=self.domain_values)
@@ -0,0 +1,146 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from shipment.exception import ShipmentException
+
+PROFILE_KIND_CATEGORY = "category"
+PROFILE_KIND_NUMERIC = "numeric"
+PROFILE_KIND_DATETIME = "datetime"
+
+# percentiles 0..100, the quantile function drift detection works on
+PROFILE_QUANTILES = np.linspace(0,1,101)
+
+MAX_FREQUENCY_VALUES = 1000
+MAX_UNKNOWN_VALUE_SAMPLES = 10
+
+
+def get_column_kind(series:pd.Series) -> str:
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return PROFILE_KIND_DATETIME
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        return PROFILE_KIND_NUMERIC
+    return PROFILE_KIND_CATEGORY
+
+
+def get_numeric_values(series:pd.Series,kind:str) -> np.ndarray:
+    """
+    return: float array of a numeric or datetime column, NaN for missing, datetimes as epoch seconds
+    """
+    if kind == PROFILE_KIND_DATETIME:
+        values = series.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(float)
+        values[series.isna().to_numpy()] = np.nan
+        return values / 1e9
+    return series.to_numpy(dtype=float,na_value=np.nan)
+
+
+class ColumnProfiler:
+
+    def __init__(self,domain_values:dict=None,quantiles:np.ndarray=PROFILE_QUANTILES,
+                 max_frequency_values:int=MAX_FREQUENCY_VALUES):
+        """
+        Profiles every column of a dataset in a single pass per column.
+        domain_values: allowed values per categorical column, from the domain_value section of schema.yaml
+        quantiles: probabilities of the quantiles kept for numeric and datetime columns
+        max_frequency_values: most frequent values kept in the frequency table of a category column
+        """
+        self.domain_values = {column:set(values) for column,values in dict(domain_values or {}).items()}
+        self.quantiles = np.asarray(quantiles,dtype=float)
+        self.max_frequency_values = max_frequency_values
+
+    def get_sorted_quantiles(self,sorted_values:np.ndarray) -> list:
+        """
+        Linear interpolation quantiles (numpy's default method) read off already sorted values.
+        """
+        positions = self.quantiles * (len(sorted_values) - 1)
+        lower = np.floor(positions).astype(int)
+        upper = np.ceil(positions).astype(int)
+        fraction = positions - lower
+        return (sorted_values[lower] * (1 - fraction) + sorted_values[upper] * fraction).tolist()
+
+    def profile_numeric(self,values:np.ndarray) -> dict:
+        """
+        values: float array, NaN for missing
+        """
+        is_null = np.isnan(values)
+        sorted_values = np.sort(values[~is_null])
+        column_profile = {"null_count":int(is_null.sum()),
+                          "count":int(len(sorted_values))}
+        if len(sorted_values) == 0:
+            column_profile.update({"distinct_count":0,"min":None,"max":None,
+                                   "mean":None,"std":None,"quantiles":[]})
+            return column_profile
+
+        column_profile.update({"distinct_count":int(np.count_nonzero(np.diff(sorted_values)) + 1),
+                               "min":float(sorted_values[0]),
+                               "max":float(sorted_values[-1]),
+                               "mean":float(sorted_values.mean()),
+                               "std":float(sorted_values.std()),
+                               "quantiles":self.get_sorted_quantiles(sorted_values)})
+        return column_profile
+
+    def profile_category(self,column:str,series:pd.Series) -> dict:
+        frequencies = series.value_counts(dropna=True,sort=True)
+        frequencies = frequencies[frequencies > 0]
+
+        column_profile = {"null_count":int(len(series) - frequencies.sum()),
+                          "count":int(frequencies.sum()),
+                          "distinct_count":int(len(frequencies))}
+
+        if column in self.domain_values:
+            # domain check runs on the distinct values only
+            is_unknown = ~frequencies.index.isin(self.domain_values[column])
+            column_profile["domain_violations"] = int(frequencies[is_unknown].sum())
+            column_profile["unknown_values"] = [str(value) for value in
+                                                frequencies.index[is_unknown][:MAX_UNKNOWN_VALUE_SAMPLES]]
+
+        kept_frequencies = frequencies.iloc[:self.max_frequency_values]
+        column_profile["frequencies"] = {str(value):int(count) for value,count in kept_frequencies.items()}
+        column_profile["other_count"] = int(frequencies.iloc[self.max_frequency_values:].sum())
+        return column_profile
+
+    def profile_column(self,column:str,series:pd.Series) -> dict:
+        try:
+            kind = get_column_kind(series)
+            if kind in [PROFILE_KIND_NUMERIC,PROFILE_KIND_DATETIME]:
+                # datetimes are profiled as epoch seconds
+                column_profile = self.profile_numeric(get_numeric_values(series,kind))
+            else:
+                column_profile = self.profile_category(column=column,series=series)
+            return dict(kind=kind,dtype=str(series.dtype),**column_profile)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def profile(self,df:pd.DataFrame) -> dict:
+        """
+        return: {"rows": n, "columns": {column: profile}} where a column profile holds
+                kind, dtype, null_count, count, distinct_count and
+                category columns -> frequencies, other_count, domain_violations, unknown_values
+                numeric / datetime columns -> min, max, mean, std, quantiles
+        """
+        try:
+            return {"rows":int(len(df)),
+                    "quantiles":self.quantiles.tolist(),
+                    "columns":{column:self.profile_column(column=column,series=df[column]) for column in df.columns}}
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+
+def save_profile(file_path:str,profile:dict):
+    try:
+        os.makedirs(os.path.dirname(file_path),exist_ok=True)
+        with open(file_path,"w") as profile_file:
+            json.dump(profile,profile_file,indent=2)
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
+
+
+def load_profile(file_path:str) -> dict:
+    try:
+        with open(file_path) as profile_file:
+            return json.load(profile_file)
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
@@ -0,0 +1,354 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from shipment.entity.column_profiler import PROFILE_KIND_CATEGORY,PROFILE_QUANTILES,MAX_FREQUENCY_VALUES, \
+    MAX_UNKNOWN_VALUE_SAMPLES,get_column_kind,get_numeric_values
+from shipment.exception import ShipmentException
+
+# size of the top compactor of a quantile sketch, rank error is roughly 1.7 / k
+QUANTILE_SKETCH_K = 200
+# each compactor below the top one holds 2/3 of the items of the one above it
+COMPACTOR_DECAY = 2 / 3
+MIN_COMPACTOR_CAPACITY = 2
+
+
+class QuantileSketch:
+
+    def __init__(self,k:int=QUANTILE_SKETCH_K):
+        """
+        KLL style quantile sketch of a numeric column.
+        Items are kept in compactors where an item of level h stands for 2^h rows; a full compactor
+        sorts its items and promotes every other one to the next level, so the memory stays
+        O(k log(n / k)) however many rows are added. Count, min, max, mean and variance are exact.
+        Sketches of disjoint data can be merged in any order.
+        """
+        self.k = k
+        self.levels = []
+        self.count = 0
+        self.null_count = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self.m2 = 0.0
+        # alternates the items promoted by a compaction, keeps the sketch deterministic
+        self.compactions = 0
+
+    def get_capacity(self,level:int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * COMPACTOR_DECAY ** depth)),MIN_COMPACTOR_CAPACITY)
+
+    def compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.get_capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # with an odd number of items the largest one stays at this level
+                paired_items = items[:len(items) - len(items) % 2]
+                self.levels[level] = items[len(paired_items):]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1],
+                                                         paired_items[self.compactions % 2::2]])
+                self.compactions += 1
+            level += 1
+
+    def add_moments(self,count:int,mean:float,m2:float):
+        """
+        Combines mean and sum of squared deviations of another part of the data (Chan et al.).
+        """
+        total_count = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total_count
+        self.m2 += m2 + delta ** 2 * self.count * count / total_count
+
+    def update(self,values:np.ndarray):
+        """
+        values: float array, NaN for missing
+        """
+        is_null = np.isnan(values)
+        values = values[~is_null]
+        self.null_count += int(is_null.sum())
+        if len(values) == 0:
+            return
+
+        chunk_mean = float(values.mean())
+        self.add_moments(count=len(values),mean=chunk_mean,m2=float(np.sum((values - chunk_mean) ** 2)))
+        self.count += int(len(values))
+        self.min = float(values.min()) if self.min is None else min(self.min,float(values.min()))
+        self.max = float(values.max()) if self.max is None else max(self.max,float(values.max()))
+
+        if len(self.levels) == 0:
+            self.levels.append(np.empty(0))
+        self.levels[0] = np.concatenate([self.levels[0],values])
+        self.compress()
+
+    def merge(self,other:"QuantileSketch"):
+        self.null_count += other.null_count
+        if other.count == 0:
+            return
+        self.add_moments(count=other.count,mean=other.mean,m2=other.m2)
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min,other.min)
+        self.max = other.max if self.max is None else max(self.max,other.max)
+
+        for level,items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level],items])
+        self.compactions += other.compactions
+        self.compress()
+
+    def get_quantiles(self,probabilities:np.ndarray) -> list:
+        """
+        Quantiles with the linear interpolation of numpy, every retained item placed at the
+        middle rank of the rows it stands for. Exact while nothing has been compacted.
+        """
+        if self.count == 0:
+            return []
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items),2.0 ** level) for level,items in enumerate(self.levels)])
+        order = np.argsort(values,kind="stable")
+        values,weights = values[order],weights[order]
+
+        cumulative_weights = np.cumsum(weights)
+        ranks = cumulative_weights - weights + (weights - 1) / 2
+        quantiles = np.interp(probabilities * (self.count - 1),ranks,values)
+        quantiles[probabilities <= 0] = self.min
+        quantiles[probabilities >= 1] = self.max
+        return quantiles.tolist()
+
+    def to_profile(self,probabilities:np.ndarray) -> dict:
+        if self.count == 0:
+            return {"null_count":self.null_count,"count":0,"distinct_count":0,"min":None,"max":None,
+                    "mean":None,"std":None,"quantiles":[]}
+        # distinct values are not tracked by the sketch
+        return {"null_count":self.null_count,
+                "count":self.count,
+                "distinct_count":None,
+                "min":self.min,
+                "max":self.max,
+                "mean":self.mean,
+                "std":float(np.sqrt(self.m2 / self.count)),
+                "quantiles":self.get_quantiles(probabilities)}
+
+    def to_dict(self) -> dict:
+        return {"k":self.k,"levels":[items.tolist() for items in self.levels],"count":self.count,
+                "null_count":self.null_count,"min":self.min,"max":self.max,"mean":self.mean,
+                "m2":self.m2,"compactions":self.compactions}
+
+    @staticmethod
+    def from_dict(sketch:dict) -> "QuantileSketch":
+        quantile_sketch = QuantileSketch(k=sketch["k"])
+        quantile_sketch.levels = [np.asarray(items,dtype=float) for items in sketch["levels"]]
+        for key in ["count","null_count","min","max","mean","m2","compactions"]:
+            setattr(quantile_sketch,key,sketch[key])
+        return quantile_sketch
+
+
+class FrequencySketch:
+
+    def __init__(self,capacity:int=MAX_FREQUENCY_VALUES,domain_values:list=None):
+        """
+        Misra-Gries heavy hitter sketch of a category column holding at most capacity counters.
+        When more values are seen, the (capacity + 1)-th largest count is subtracted from every counter
+        and counters that drop to zero are removed, so a count is underestimated by at most
+        rows / (capacity + 1). Exact as long as the column has no more than capacity distinct values.
+        domain_values: allowed values, values outside the domain are counted exactly
+        """
+        self.capacity = capacity
+        self.domain_values = set(domain_values) if domain_values is not None else None
+        self.counters = pd.Series(dtype=np.int64)
+        self.count = 0
+        self.null_count = 0
+        self.is_exact = True
+        self.domain_violations = 0
+        self.unknown_values = []
+
+    def add_counters(self,counters:pd.Series):
+        counters = self.counters.add(counters,fill_value=0)
+        if len(counters) > self.capacity:
+            counters = counters.sort_values(ascending=False,kind="stable")
+            counters = counters - counters.iloc[self.capacity]
+            counters = counters[counters > 0]
+            self.is_exact = False
+        self.counters = counters.astype(np.int64)
+
+    def add_unknown_values(self,unknown_values:list):
+        for value in unknown_values:
+            if len(self.unknown_values) >= MAX_UNKNOWN_VALUE_SAMPLES:
+                break
+            if value not in self.unknown_values:
+                self.unknown_values.append(value)
+
+    def update(self,series:pd.Series):
+        frequencies = series.value_counts(dropna=True,sort=False)
+        frequencies = frequencies[frequencies > 0]
+        self.null_count += int(len(series) - frequencies.sum())
+        self.count += int(frequencies.sum())
+
+        if self.domain_values is not None:
+            # domain check runs on the distinct values of the chunk only
+            is_unknown = ~frequencies.index.isin(self.domain_values)
+            self.domain_violations += int(frequencies[is_unknown].sum())
+            self.add_unknown_values([str(value) for value in frequencies.index[is_unknown]])
+
+        frequencies.index = frequencies.index.astype(str)
+        self.add_counters(frequencies.groupby(level=0).sum())
+
+    def merge(self,other:"FrequencySketch"):
+        self.null_count += other.null_count
+        self.count += other.count
+        self.domain_violations += other.domain_violations
+        self.add_unknown_values(other.unknown_values)
+        self.is_exact = self.is_exact and other.is_exact
+        self.add_counters(other.counters)
+
+    def to_profile(self) -> dict:
+        counters = self.counters.sort_values(ascending=False,kind="stable")
+        column_profile = {"null_count":self.null_count,
+                          "count":self.count,
+                          "distinct_count":int(len(counters)) if self.is_exact else None}
+        if self.domain_values is not None:
+            column_profile["domain_violations"] = self.domain_violations
+            column_profile["unknown_values"] = list(self.unknown_values)
+        column_profile["frequencies"] = {str(value):int(count) for value,count in counters.items()}
+        column_profile["other_count"] = int(self.count - counters.sum())
+        return column_profile
+
+    def to_dict(self) -> dict:
+        return {"capacity":self.capacity,"counters":{str(value):int(count) for value,count in self.counters.items()},
+                "count":self.count,"null_count":self.null_count,"is_exact":self.is_exact,
+                "domain_violations":self.domain_violations,"unknown_values":list(self.unknown_values)}
+
+    @staticmethod
+    def from_dict(sketch:dict,domain_values:list=None) -> "FrequencySketch":
+        frequency_sketch = FrequencySketch(capacity=sketch["capacity"],domain_values=domain_values)
+        frequency_sketch.counters = pd.Series(sketch["counters"],dtype=np.int64)
+        for key in ["count","null_count","is_exact","domain_violations","unknown_values"]:
+            setattr(frequency_sketch,key,sketch[key])
+        return frequency_sketch
+
+
+class DatasetSketch:
+
+    def __init__(self,domain_values:dict=None,k:int=QUANTILE_SKETCH_K,
+                 max_frequency_values:int=MAX_FREQUENCY_VALUES):
+        """
+        Constant memory summary of a dataset built chunk by chunk, one sketch per column:
+        numeric and datetime columns -> QuantileSketch (datetimes as epoch seconds)
+        category columns -> FrequencySketch
+        Sketches of shards or of earlier runs are combined with merge() and turned into a
+        ColumnProfiler shaped profile with to_profile(), so drift is tested on the sketches.
+        domain_values: allowed values per categorical column, from the domain_value section of schema.yaml
+        """
+        self.domain_values = dict(domain_values or {})
+        self.k = k
+        self.max_frequency_values = max_frequency_values
+        self.rows = 0
+        self.columns = {}
+
+    def create_column_sketch(self,column:str,kind:str):
+        if kind == PROFILE_KIND_CATEGORY:
+            return FrequencySketch(capacity=self.max_frequency_values,domain_values=self.domain_values.get(column))
+        return QuantileSketch(k=self.k)
+
+    def update(self,df:pd.DataFrame):
+        try:
+            for column in df.columns:
+                series = df[column]
+                if column not in self.columns:
+                    kind = get_column_kind(series)
+                    self.columns[column] = {"kind":kind,"dtype":str(series.dtype),
+                                            "sketch":self.create_column_sketch(column,kind)}
+                kind = self.columns[column]["kind"]
+                if kind == PROFILE_KIND_CATEGORY:
+                    self.columns[column]["sketch"].update(series)
+                else:
+                    self.columns[column]["sketch"].update(get_numeric_values(series,kind))
+            self.rows += len(df)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def merge(self,other:"DatasetSketch"):
+        try:
+            for column,other_column in other.columns.items():
+                if column not in self.columns:
+                    self.columns[column] = {"kind":other_column["kind"],"dtype":other_column["dtype"],
+                                            "sketch":self.create_column_sketch(column,other_column["kind"])}
+                elif self.columns[column]["kind"] != other_column["kind"]:
+                    raise Exception(f"Column [{column}] is {self.columns[column]['kind']} in one sketch "
+                                    f"and {other_column['kind']} in the other.")
+                self.columns[column]["sketch"].merge(other_column["sketch"])
+            self.rows += other.rows
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def to_profile(self,quantiles:np.ndarray=PROFILE_QUANTILES) -> dict:
+        """
+        return: profile in the layout of ColumnProfiler.profile
+        """
+        try:
+            quantiles = np.asarray(quantiles,dtype=float)
+            columns = {}
+            for column,column_sketch in self.columns.items():
+                if column_sketch["kind"] == PROFILE_KIND_CATEGORY:
+                    column_profile = column_sketch["sketch"].to_profile()
+                else:
+                    column_profile = column_sketch["sketch"].to_profile(quantiles)
+                columns[column] = dict(kind=column_sketch["kind"],dtype=column_sketch["dtype"],**column_profile)
+            return {"rows":self.rows,"quantiles":quantiles.tolist(),"columns":columns}
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def to_dict(self) -> dict:
+        return {"rows":self.rows,"k":self.k,"max_frequency_values":self.max_frequency_values,
+                "columns":{column:{"kind":column_sketch["kind"],"dtype":column_sketch["dtype"],
+                                   "sketch":column_sketch["sketch"].to_dict()}
+                           for column,column_sketch in self.columns.items()}}
+
+    @staticmethod
+    def from_dict(sketch:dict,domain_values:dict=None) -> "DatasetSketch":
+        try:
+            dataset_sketch = DatasetSketch(domain_values=domain_values,k=sketch["k"],
+                                           max_frequency_values=sketch["max_frequency_values"])
+            dataset_sketch.rows = sketch["rows"]
+            for column,column_sketch in sketch["columns"].items():
+                if column_sketch["kind"] == PROFILE_KIND_CATEGORY:
+                    sketch_obj = FrequencySketch.from_dict(column_sketch["sketch"],
+                                                           domain_values=dataset_sketch.domain_values.get(column))
+                else:
+                    sketch_obj = QuantileSketch.from_dict(column_sketch["sketch"])
+                dataset_sketch.columns[column] = {"kind":column_sketch["kind"],"dtype":column_sketch["dtype"],
+                                                  "sketch":sketch_obj}
+            return dataset_sketch
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+
+def save_sketches(file_path:str,sketches:dict):
+    """
+    sketches: {name: DatasetSketch}, e.g. the train and test sketches of a run
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path),exist_ok=True)
+        with open(file_path,"w") as sketch_file:
+            json.dump({name:sketch.to_dict() for name,sketch in sketches.items()},sketch_file)
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
+
+
+def load_sketches(file_path:str,domain_values:dict=None) -> dict:
+    """
+    return: {name: DatasetSketch} saved by save_sketches, mergeable with the sketches of new data
+    """
+    try:
+        with open(file_path) as sketch_file:
+            return {name:DatasetSketch.from_dict(sketch,domain_values=domain_values)
+                    for name,sketch in json.load(sketch_file).items()}
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
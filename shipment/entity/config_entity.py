@@ -7,18 +7,42 @@ DataIngestionConfig = namedtuple("DataIngestionConfig",["dataset_download_url",
                                                         "raw_data_dir",
                                                         "ingested_dir",
                                                         "ingested_train_dir",
-                                                        "ingested_test_dir"
+                                                        "ingested_test_dir",
+                                                        "ingested_store_dir",
+                                                        "split_manifest_dir",
+                                                        "raw_data_cache_dir",
+                                                        "skip_unchanged_ingestion",
+                                                        "test_size",
+                                                        "random_state",
+                                                        "streaming",
+                                                        "chunk_size",
+                                                        "split_key_column",
+                                                        "incremental",
+                                                        "n_jobs",
+                                                        "n_folds",
+                                                        "export_split_csv"
                                                         ])
 
 
-DataValidationConfig = namedtuple("DataValidationConfig", ["schema_file_path","report_file_path","report_page_file_path"])
+DataValidationConfig = namedtuple("DataValidationConfig", ["schema_file_path","report_file_path","report_page_file_path",
+                                                           "profile_file_path","drift_backend","drift_threshold",
+                                                           "drift_mode","sketch_file_path","sketch_chunk_size",
+                                                           "quarantine_file_path","split_manifest_dir"])
 
 DataTransformationConfig = namedtuple("DataTransformationConfig", ["transformed_train_dir",
                                                                    "transformed_test_dir",
-                                                                   "preprocessed_object_file_path"])
-
-
-ModelTrainerConfig = namedtuple("ModelTrainerConfig", ["trained_model_file_path","base_accuracy","model_config_file_path"])
+                                                                   "preprocessed_object_file_path",
+                                                                   "transformation_cache_dir",
+                                                                   "use_transformation_cache",
+                                                                   "feature_dtype",
+                                                                   "transform_chunk_size",
+                                                                   "fit_sample_size",
+                                                                   "random_state",
+                                                                   "n_jobs"])
+
+
+ModelTrainerConfig = namedtuple("ModelTrainerConfig", ["trained_model_file_path","base_accuracy","model_config_file_path",
+                                                       "cv_cache_dir","warm_start","model_evaluation_file_path"])
 
 ModelEvaluationConfig = namedtuple("ModelEvaluationConfig", ["model_evaluation_file_path","time_stamp"])
 
@@ -0,0 +1,179 @@
+import html
+import sys
+from datetime import datetime
+
+import numpy as np
+from scipy import stats
+
+from shipment.entity.column_profiler import PROFILE_KIND_CATEGORY
+from shipment.exception import ShipmentException
+
+DRIFT_FEATURE_TYPE_NUMERIC = "num"
+DRIFT_FEATURE_TYPE_CATEGORY = "cat"
+
+KS_STATTEST_NAME = "K-S p_value"
+CHI_SQUARE_STATTEST_NAME = "chi-square p_value"
+
+# proportions are clipped before taking logs in PSI
+PSI_EPSILON = 1e-4
+
+
+class DriftEngine:
+
+    def __init__(self,threshold:float=0.05,drift_share:float=0.5):
+        """
+        Data drift between a reference (train) and a current (test) dataset, computed from
+        their column profiles so no row is read again.
+        numeric and datetime columns -> two sample K-S test, Wasserstein distance
+        category columns -> chi-square test, population stability index
+        threshold: p value below which a column is drifted
+        drift_share: share of drifted columns above which the dataset is drifted
+        """
+        self.threshold = threshold
+        self.drift_share = drift_share
+
+    @staticmethod
+    def get_cdf(quantile_values:np.ndarray,probabilities:np.ndarray,points:np.ndarray) -> np.ndarray:
+        """
+        Evaluates the CDF given by a quantile function at points, right-continuous at repeated values.
+        """
+        quantile_values,index = np.unique(quantile_values,return_index=True)
+        # for repeated quantile values the CDF jumps to the last probability holding that value
+        last_index = np.append(index[1:] - 1,len(probabilities) - 1)
+        return np.interp(points,quantile_values,probabilities[last_index],left=0.0,right=1.0)
+
+    def compare_numeric(self,reference:dict,current:dict,probabilities:np.ndarray) -> dict:
+        """
+        K-S statistic is the largest CDF gap over the union of both quantile grids,
+        its p value uses the asymptotic two sample distribution like scipy.stats.ks_2samp.
+        Wasserstein distance is the area between the two quantile functions, normed by the reference std.
+        """
+        reference_quantiles = np.asarray(reference["quantiles"],dtype=float)
+        current_quantiles = np.asarray(current["quantiles"],dtype=float)
+        if len(reference_quantiles) == 0 or len(current_quantiles) == 0:
+            return {"stattest_name":KS_STATTEST_NAME,"drift_score":1.0,"ks_statistic":0.0,
+                    "wasserstein_distance_norm":0.0}
+
+        points = np.union1d(reference_quantiles,current_quantiles)
+        ks_statistic = float(np.max(np.abs(DriftEngine.get_cdf(reference_quantiles,probabilities,points)
+                                           - DriftEngine.get_cdf(current_quantiles,probabilities,points))))
+        effective_size = np.round(reference["count"] * current["count"] / (reference["count"] + current["count"]))
+        p_value = float(stats.kstwo.sf(ks_statistic,max(int(effective_size),1)))
+
+        wasserstein_distance = float(np.trapz(np.abs(reference_quantiles - current_quantiles),probabilities))
+        reference_std = reference.get("std") or 0.0
+        wasserstein_distance_norm = wasserstein_distance / reference_std if reference_std > 0 else wasserstein_distance
+
+        return {"stattest_name":KS_STATTEST_NAME,
+                "drift_score":p_value,
+                "ks_statistic":ks_statistic,
+                "wasserstein_distance_norm":wasserstein_distance_norm}
+
+    def compare_category(self,reference:dict,current:dict) -> dict:
+        """
+        Chi-square test of homogeneity on the 2 x categories frequency table, values beyond the
+        kept frequency tables are pooled into one category.
+        """
+        categories = list(dict.fromkeys(list(reference["frequencies"]) + list(current["frequencies"])))
+        reference_counts = np.array([reference["frequencies"].get(category,0) for category in categories]
+                                    + [reference.get("other_count",0)],dtype=float)
+        current_counts = np.array([current["frequencies"].get(category,0) for category in categories]
+                                  + [current.get("other_count",0)],dtype=float)
+
+        observed = np.vstack([reference_counts,current_counts])
+        observed = observed[:,observed.sum(axis=0) > 0]
+        if observed.shape[1] < 2 or observed.sum(axis=1).min() == 0:
+            p_value = 1.0
+        else:
+            p_value = float(stats.chi2_contingency(observed,correction=False)[1])
+
+        reference_share = np.clip(observed[0] / max(observed[0].sum(),1),PSI_EPSILON,None)
+        current_share = np.clip(observed[1] / max(observed[1].sum(),1),PSI_EPSILON,None)
+        psi = float(np.sum((current_share - reference_share) * np.log(current_share / reference_share)))
+
+        return {"stattest_name":CHI_SQUARE_STATTEST_NAME,
+                "drift_score":p_value,
+                "psi":psi}
+
+    def calculate(self,reference_profile:dict,current_profile:dict) -> dict:
+        """
+        reference_profile, current_profile: ColumnProfiler profiles of train and test data
+        return: report with the layout of the evidently data drift profile section
+        """
+        try:
+            probabilities = np.asarray(reference_profile["quantiles"],dtype=float)
+            metrics = {}
+            num_feature_names,cat_feature_names = [],[]
+
+            for column,reference in reference_profile["columns"].items():
+                current = current_profile["columns"].get(column)
+                if current is None:
+                    continue
+                if reference["kind"] == PROFILE_KIND_CATEGORY:
+                    column_metrics = self.compare_category(reference=reference,current=current)
+                    column_metrics["feature_type"] = DRIFT_FEATURE_TYPE_CATEGORY
+                    cat_feature_names.append(column)
+                else:
+                    column_metrics = self.compare_numeric(reference=reference,current=current,
+                                                          probabilities=probabilities)
+                    column_metrics["feature_type"] = DRIFT_FEATURE_TYPE_NUMERIC
+                    num_feature_names.append(column)
+                column_metrics["drift_detected"] = bool(column_metrics["drift_score"] < self.threshold)
+                metrics[column] = column_metrics
+
+            n_features = len(metrics)
+            n_drifted_features = sum(column_metrics["drift_detected"] for column_metrics in metrics.values())
+            share_drifted_features = n_drifted_features / n_features if n_features > 0 else 0.0
+            metrics.update({"n_features":n_features,
+                            "n_drifted_features":n_drifted_features,
+                            "share_drifted_features":share_drifted_features,
+                            "dataset_drift":bool(share_drifted_features >= self.drift_share)})
+
+            timestamp = datetime.now().isoformat()
+            return {"data_drift":{"name":"data_drift",
+                                  "datetime":timestamp,
+                                  "data":{"utility_columns":{},
+                                          "cat_feature_names":cat_feature_names,
+                                          "num_feature_names":num_feature_names,
+                                          "options":{"threshold":self.threshold,
+                                                     "drift_share":self.drift_share},
+                                          "metrics":metrics}},
+                    "timestamp":timestamp}
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+
+def render_drift_report_page(report:dict) -> str:
+    """
+    Renders a report of DriftEngine.calculate as a standalone html page.
+    """
+    try:
+        data = report["data_drift"]["data"]
+        metrics = data["metrics"]
+        rows = []
+        for column in data["num_feature_names"] + data["cat_feature_names"]:
+            column_metrics = metrics[column]
+            distance = column_metrics.get("wasserstein_distance_norm",column_metrics.get("psi"))
+            distance_name = "Wasserstein (normed)" if "wasserstein_distance_norm" in column_metrics else "PSI"
+            rows.append(f"<tr class=\"{'drift' if column_metrics['drift_detected'] else ''}\">"
+                        f"<td>{html.escape(column)}</td>"
+                        f"<td>{column_metrics['feature_type']}</td>"
+                        f"<td>{html.escape(column_metrics['stattest_name'])}</td>"
+                        f"<td>{column_metrics['drift_score']:.4g}</td>"
+                        f"<td>{distance_name}: {distance:.4g}</td>"
+                        f"<td>{'Detected' if column_metrics['drift_detected'] else 'Not detected'}</td></tr>")
+
+        return ("<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Data Drift Report</title>"
+                "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse}"
+                "td,th{border:1px solid #ccc;padding:4px 8px;text-align:left}tr.drift{background:#fdd}</style>"
+                "</head><body><h1>Data Drift Report</h1>"
+                f"<p>{report['timestamp']}</p>"
+                f"<p>Drifted features: {metrics['n_drifted_features']} of {metrics['n_features']} "
+                f"({metrics['share_drifted_features']:.1%}). Dataset drift: "
+                f"{'Detected' if metrics['dataset_drift'] else 'Not detected'}.</p>"
+                "<table><tr><th>Feature</th><th>Type</th><th>Test</th><th>Score</th><th>Distance</th>"
+                "<th>Drift</th></tr>"
+                + "".join(rows) +
+                "</table></body></html>")
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
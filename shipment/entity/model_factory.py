@@ -1,7 +1,7 @@
 import importlib
-from pyexpat import model
-from tkinter import E
+import copy
 import numpy as np
+import pandas as pd
 import yaml
 from shipment.exception import ShipmentException
 import os
@@ -10,22 +10,38 @@ import sys
 from collections import namedtuple
 from typing import List
 from shipment.logger import logging
-from sklearn.metrics import r2_score,mean_squared_error
+from joblib import Parallel,delayed,effective_n_jobs
+from shipment.entity.search_executor import SearchExecutor,SEARCH_STRATEGY_GRID
 GRID_SEARCH_KEY = 'grid_search'
 MODULE_KEY = 'module'
 CLASS_KEY = 'class'
 PARAM_KEY = 'params'
 MODEL_SELECTION_KEY = 'model_selection'
 SEARCH_PARAM_GRID_KEY = "search_param_grid"
+SEARCH_EXECUTOR_KEY = "search_executor"
+SEARCH_EXECUTOR_N_JOBS_KEY = "n_jobs"
+SEARCH_EXECUTOR_THREADS_PER_WORKER_KEY = "threads_per_worker"
+SEARCH_EXECUTOR_BACKEND_KEY = "backend"
+SEARCH_EXECUTOR_TIME_BUDGET_KEY = "time_budget"
+SEARCH_STRATEGY_KEY = "search_strategy"
+SEARCH_STRATEGY_PARAMS_KEY = "search_strategy_params"
+WARM_START_KEY = "warm_start"
+WARM_START_N_ESTIMATORS_KEY = "n_estimators"
+WARM_START_MAX_ESTIMATORS_KEY = "max_estimators"
+WARM_START_N_EPOCHS_KEY = "n_epochs"
+GRID_SEARCH_CV_KEY = "cv"
+GRID_SEARCH_SCORING_KEY = "scoring"
 
 InitializedModelDetail = namedtuple("InitializedModelDetail",
-                                    ["model_serial_number", "model", "param_grid_search", "model_name"])
+                                    ["model_serial_number", "model", "param_grid_search", "model_name",
+                                     "search_strategy", "search_strategy_params"])
 
 GridSearchedBestModel = namedtuple("GridSearchedBestModel", ["model_serial_number",
                                                              "model",
                                                              "best_model",
                                                              "best_parameters",
                                                              "best_score",
+                                                             "n_fits",
                                                              ])
 
 BestModel = namedtuple("BestModel", ["model_serial_number",
@@ -44,76 +60,143 @@ def evaluate_classification_model(model_list: list, X_train:np.ndarray, y_train:
     pass
 
 
-def evaluate_regression_model(model_list: list, X_train:np.ndarray, y_train:np.ndarray, X_test:np.ndarray, y_test:np.ndarray, base_accuracy:float=0.6) -> MetricInfoArtifact:
+def predict_rows(model, indexer, rows: slice) -> np.ndarray:
+    return np.asarray(model.predict(indexer[rows]), dtype=np.float64).ravel()
+
+
+def predict_models(model_list: list, X, n_jobs: int = -1, chunk_size: int = None) -> np.ndarray:
+    """
+    Predicts X with every model in one pass, the (model, row chunk) tasks run on a thread pool
+    so the models share X instead of each getting a copy.
+    X: numpy array or dataframe
+    chunk_size: rows per prediction task, None splits every model's rows into one task per worker
+    return: predictions of shape (n_models, n_rows)
+    """
+    try:
+        n_rows = len(X)
+        if chunk_size is None:
+            chunk_size = max(int(np.ceil(n_rows / effective_n_jobs(n_jobs))), 1)
+        row_chunks = [slice(chunk_start, chunk_start + chunk_size) for chunk_start in range(0, n_rows, chunk_size)]
+        # dataframes are sliced by position
+        indexer = X.iloc if hasattr(X, "iloc") else X
+        chunk_predictions = Parallel(n_jobs=n_jobs, prefer="threads")(
+            delayed(predict_rows)(model, indexer, row_chunk) for model in model_list for row_chunk in row_chunks)
+
+        predictions = np.empty((len(model_list), n_rows), dtype=np.float64)
+        for task_index, chunk_prediction in enumerate(chunk_predictions):
+            model_index, chunk_index = divmod(task_index, len(row_chunks))
+            predictions[model_index, row_chunks[chunk_index]] = chunk_prediction
+        return predictions
+    except Exception as e:
+        raise ShipmentException(e, sys) from e
+
+
+def get_regression_metrics(y: np.ndarray, predictions: np.ndarray):
+    """
+    y: target of shape (n_rows,)
+    predictions: predictions of every model, shape (n_models, n_rows)
+    return: r squared score and root mean squared error of every model, as r2_score and mean_squared_error
+    """
+    y = np.asarray(y, dtype=np.float64)
+    squared_errors = np.square(predictions - y).sum(axis=1)
+    total_squared_error = np.square(y - y.mean()).sum()
+    # a constant target scores 1.0 for perfect predictions and 0.0 otherwise, like r2_score
+    if total_squared_error > 0:
+        r2_scores = 1.0 - squared_errors / total_squared_error
+    else:
+        r2_scores = np.where(squared_errors == 0, 1.0, 0.0)
+    return r2_scores, np.sqrt(squared_errors / len(y))
+
+
+def evaluate_regression_models(model_list: list, X_train, y_train: np.ndarray, X_test, y_test: np.ndarray,
+                               base_accuracy: float = 0.6, n_jobs: int = -1):
     """
     Description:
-    This function compare multiple regression model return best model
+    This function compare multiple regression model return best model and the metrics of every model.
+    Every model predicts each split once, all models in parallel, and the metrics are computed
+    for all models at once.
     Params:
     model_list: List of model
     X_train: Training dataset input feature
     y_train: Training dataset target feature
     X_test: Testing dataset input feature
     y_test: Testing dataset input feature
+    n_jobs: prediction threads, -1 uses all cores
     return
-    It retured a named tuple
-    
-    MetricInfoArtifact = namedtuple("MetricInfo",
-                                ["model_name", "model_object", "train_rmse", "test_rmse", "train_accuracy",
-                                 "test_accuracy", "model_accuracy", "index_number"])
+    MetricInfoArtifact of the accepted model (None when no model is accepted) and the metric table,
+    a dataframe with one row per model:
+    model_name, train_rmse, test_rmse, train_accuracy, test_accuracy, model_accuracy,
+    diff_test_train_accuracy, is_accepted
     """
     try:
-        
-    
-        index_number = 0
-        metric_info_artifact = None
-        for model in model_list:
-            model_name = str(model)  #getting model name based on model object
-            logging.info(f"{'>>'*30}Started evaluating model: [{type(model).__name__}] {'<<'*30}")
-            
-            #Getting prediction for training and testing dataset
-            y_train_pred = model.predict(X_train)
-            y_test_pred = model.predict(X_test)
+        logging.info(f"{'>>'*30}Started evaluating [{len(model_list)}] models {'<<'*30}")
+        train_predictions = predict_models(model_list=model_list, X=X_train, n_jobs=n_jobs)
+        test_predictions = predict_models(model_list=model_list, X=X_test, n_jobs=n_jobs)
 
-            #Calculating r squared score on training and testing dataset
-            train_acc = r2_score(y_train, y_train_pred)
-            test_acc = r2_score(y_test, y_test_pred)
-            
-            #Calculating mean squared error on training and testing dataset
-            train_rmse = np.sqrt(mean_squared_error(y_train, y_train_pred))
-            test_rmse = np.sqrt(mean_squared_error(y_test, y_test_pred))    
+        #Calculating r squared score and root mean squared error on training and testing dataset
+        train_acc, train_rmse = get_regression_metrics(y=y_train, predictions=train_predictions)
+        test_acc, test_rmse = get_regression_metrics(y=y_test, predictions=test_predictions)
 
-            # Calculating harmonic mean of train_accuracy and test_accuracy
+        # Calculating harmonic mean of train_accuracy and test_accuracy
+        with np.errstate(divide="ignore", invalid="ignore"):
             model_accuracy = (2 * (train_acc * test_acc)) / (train_acc + test_acc)
-            diff_test_train_acc = abs(test_acc - train_acc)
-            
-            #logging all important metric
-            logging.info(f"{'>>'*30} Score {'<<'*30}")
-            logging.info(f"Train Score\t\t Test Score\t\t Average Score")
-            logging.info(f"{train_acc}\t\t {test_acc}\t\t{model_accuracy}")
-
-            logging.info(f"{'>>'*30} Loss {'<<'*30}")
-            logging.info(f"Diff test train accuracy: [{diff_test_train_acc}].") 
-            logging.info(f"Train root mean squared error: [{train_rmse}].")
-            logging.info(f"Test root mean squared error: [{test_rmse}].")
-
+        diff_test_train_acc = np.abs(test_acc - train_acc)
 
+        metric_info_artifact = None
+        is_accepted = np.zeros(len(model_list), dtype=bool)
+        for index_number, model in enumerate(model_list):
             #if model accuracy is greater than base accuracy and train and test score is within certain thershold
             #we will accept that model as accepted model
-            if model_accuracy >= base_accuracy and diff_test_train_acc < 0.05:
-                base_accuracy = model_accuracy
-                metric_info_artifact = MetricInfoArtifact(model_name=model_name,
+            if model_accuracy[index_number] >= base_accuracy and diff_test_train_acc[index_number] < 0.05:
+                base_accuracy = model_accuracy[index_number]
+                is_accepted[index_number] = True
+                metric_info_artifact = MetricInfoArtifact(model_name=str(model),
                                                         model_object=model,
-                                                        train_rmse=train_rmse,
-                                                        test_rmse=test_rmse,
-                                                        train_accuracy=train_acc,
-                                                        test_accuracy=test_acc,
-                                                        model_accuracy=model_accuracy,
+                                                        train_rmse=float(train_rmse[index_number]),
+                                                        test_rmse=float(test_rmse[index_number]),
+                                                        train_accuracy=float(train_acc[index_number]),
+                                                        test_accuracy=float(test_acc[index_number]),
+                                                        model_accuracy=float(model_accuracy[index_number]),
                                                         index_number=index_number)
-
                 logging.info(f"Acceptable model found {metric_info_artifact}.")
-            index_number += 1
+
+        metric_table = pd.DataFrame({"model_name": [str(model) for model in model_list],
+                                     "train_rmse": train_rmse,
+                                     "test_rmse": test_rmse,
+                                     "train_accuracy": train_acc,
+                                     "test_accuracy": test_acc,
+                                     "model_accuracy": model_accuracy,
+                                     "diff_test_train_accuracy": diff_test_train_acc,
+                                     "is_accepted": is_accepted})
+        logging.info(f"{'>>'*30} Metrics {'<<'*30}\n{metric_table.to_string()}")
         if metric_info_artifact is None:
             logging.info(f"No model found with higher accuracy than base accuracy")
+        return metric_info_artifact, metric_table
+    except Exception as e:
+        raise ShipmentException(e, sys) from e
+
+
+def evaluate_regression_model(model_list: list, X_train:np.ndarray, y_train:np.ndarray, X_test:np.ndarray, y_test:np.ndarray, base_accuracy:float=0.6) -> MetricInfoArtifact:
+    """
+    Description:
+    This function compare multiple regression model return best model
+    Params:
+    model_list: List of model
+    X_train: Training dataset input feature
+    y_train: Training dataset target feature
+    X_test: Testing dataset input feature
+    y_test: Testing dataset input feature
+    return
+    It retured a named tuple
+    
+    MetricInfoArtifact = namedtuple("MetricInfo",
+                                ["model_name", "model_object", "train_rmse", "test_rmse", "train_accuracy",
+                                 "test_accuracy", "model_accuracy", "index_number"])
+    """
+    try:
+        metric_info_artifact, _ = evaluate_regression_models(model_list=model_list, X_train=X_train, y_train=y_train,
+                                                             X_test=X_test, y_test=y_test,
+                                                             base_accuracy=base_accuracy)
         return metric_info_artifact
     except Exception as e:
         raise ShipmentException(e, sys) from e
@@ -131,6 +214,11 @@ def get_sample_model_config_yaml_file(export_dir: str):
                 }
 
             },
+            SEARCH_EXECUTOR_KEY: {
+                SEARCH_EXECUTOR_N_JOBS_KEY: -1,
+                SEARCH_EXECUTOR_THREADS_PER_WORKER_KEY: 1,
+                SEARCH_EXECUTOR_BACKEND_KEY: "loky"
+            },
             MODEL_SELECTION_KEY: {
                 "module_0": {
                     MODULE_KEY: "module_of_model",
@@ -139,6 +227,7 @@ def get_sample_model_config_yaml_file(export_dir: str):
                         {"param_name1": "value1",
                          "param_name2": "value2",
                          },
+                    SEARCH_STRATEGY_KEY: SEARCH_STRATEGY_GRID,
                     SEARCH_PARAM_GRID_KEY: {
                         "param_name": ['param_value_1', 'param_value_2']
                     }
@@ -156,7 +245,11 @@ def get_sample_model_config_yaml_file(export_dir: str):
 
 
 class ModelFactory:
-    def __init__(self, model_config_path: str = None,):
+    def __init__(self, model_config_path: str = None, cv_cache_dir: str = None):
+        """
+        model_config_path: model.yaml location
+        cv_cache_dir: cross validation result cache directory of the search executor, None disables the cache
+        """
         try:
             self.config: dict = ModelFactory.read_params(model_config_path)
 
@@ -166,6 +259,20 @@ class ModelFactory:
 
             self.models_initialization_config: dict = dict(self.config[MODEL_SELECTION_KEY])
 
+            # without a search_executor section or a model search_strategy every model is searched
+            # by its own grid search object
+            self.search_executor = None
+            has_search_strategy = any(SEARCH_STRATEGY_KEY in dict(model_config)
+                                      for model_config in self.models_initialization_config.values())
+            if self.config.get(SEARCH_EXECUTOR_KEY) is not None or has_search_strategy:
+                search_executor_config = dict(self.config.get(SEARCH_EXECUTOR_KEY) or {})
+                self.search_executor = SearchExecutor(
+                    n_jobs=search_executor_config.get(SEARCH_EXECUTOR_N_JOBS_KEY,1),
+                    threads_per_worker=search_executor_config.get(SEARCH_EXECUTOR_THREADS_PER_WORKER_KEY,1),
+                    backend=search_executor_config.get(SEARCH_EXECUTOR_BACKEND_KEY,"loky"),
+                    time_budget=search_executor_config.get(SEARCH_EXECUTOR_TIME_BUDGET_KEY),
+                    cv_cache_dir=cv_cache_dir)
+
             self.initialized_model_list = None
             self.grid_searched_best_model_list = None
 
@@ -177,7 +284,6 @@ class ModelFactory:
         try:
             if not isinstance(property_data, dict):
                 raise Exception("property_data parameter required to dictionary")
-            print(property_data)
             for key, value in property_data.items():
                 logging.info(f"Executing:$ {str(instance_ref)}.{key}={value}")
                 setattr(instance_ref, key, value)
@@ -207,7 +313,7 @@ class ModelFactory:
             raise ShipmentException(e, sys) from e
 
     def execute_grid_search_operation(self, initialized_model: InitializedModelDetail, input_feature,
-                                      output_feature) -> GridSearchedBestModel:
+                                      output_feature, cv=None) -> GridSearchedBestModel:
         """
         excute_grid_search_operation(): function will perform paramter search operation and
         it will return you the best optimistic  model with best paramter:
@@ -215,6 +321,7 @@ class ModelFactory:
         param_grid: dictionary of paramter to perform search operation
         input_feature: your all input features
         output_feature: Target/Dependent features
+        cv: optional cross validation splitter overriding the cv of the grid search config
         ================================================================================
         return: Function will return GridSearchOperation object
         """
@@ -230,6 +337,8 @@ class ModelFactory:
                                                 param_grid=initialized_model.param_grid_search)
             grid_search_cv = ModelFactory.update_property_of_class(grid_search_cv,
                                                                    self.grid_search_property_data)
+            if cv is not None:
+                grid_search_cv.cv = cv
 
             
             message = f'{">>"* 30} f"Training {type(initialized_model.model).__name__} Started." {"<<"*30}'
@@ -240,13 +349,125 @@ class ModelFactory:
                                                              model=initialized_model.model,
                                                              best_model=grid_search_cv.best_estimator_,
                                                              best_parameters=grid_search_cv.best_params_,
-                                                             best_score=grid_search_cv.best_score_
+                                                             best_score=grid_search_cv.best_score_,
+                                                             n_fits=len(grid_search_cv.cv_results_["params"])
+                                                             * grid_search_cv.n_splits_ + 1
                                                              )
             
             return grid_searched_best_model
         except Exception as e:
             raise ShipmentException(e, sys) from e
 
+    def execute_parallel_search_operation(self, initialized_model_list: List[InitializedModelDetail], input_feature,
+                                          output_feature, cv=None) -> List[GridSearchedBestModel]:
+        """
+        execute_parallel_search_operation(): performs the parameter search of all initialized models
+        as one set of (model, parameter combination, fold) tasks on the search executor worker pool.
+        The result is the one of execute_grid_search_operation for every model.
+        cv: optional cross validation splitter overriding the cv of the grid search config
+        ================================================================================
+        return: GridSearchedBestModel of every initialized model
+        """
+        try:
+            if cv is None:
+                cv = self.grid_search_property_data.get(GRID_SEARCH_CV_KEY,5)
+            search_results = self.search_executor.search(
+                estimators=[initialized_model.model for initialized_model in initialized_model_list],
+                param_grids=[initialized_model.param_grid_search for initialized_model in initialized_model_list],
+                X=input_feature,y=output_feature,cv=cv,
+                scoring=self.grid_search_property_data.get(GRID_SEARCH_SCORING_KEY),
+                search_strategies=[initialized_model.search_strategy for initialized_model in initialized_model_list],
+                search_strategy_params=[initialized_model.search_strategy_params
+                                        for initialized_model in initialized_model_list])
+
+            self.grid_searched_best_model_list = []
+            for initialized_model,search_result in zip(initialized_model_list,search_results):
+                grid_searched_best_model = GridSearchedBestModel(model_serial_number=initialized_model.model_serial_number,
+                                                                 model=initialized_model.model,
+                                                                 best_model=search_result.best_estimator,
+                                                                 best_parameters=search_result.best_parameters,
+                                                                 best_score=search_result.best_score,
+                                                                 n_fits=search_result.n_fits
+                                                                 )
+                if not search_result.is_complete:
+                    logging.info(f"Search of {type(initialized_model.model).__name__} stopped by the time budget, "
+                                 f"best so far is used.")
+                logging.info(f"Search of {type(initialized_model.model).__name__} completed: {grid_searched_best_model}")
+                self.grid_searched_best_model_list.append(grid_searched_best_model)
+            return self.grid_searched_best_model_list
+        except Exception as e:
+            raise ShipmentException(e, sys) from e
+
+    def get_warm_started_model(self, champion_model, input_feature, output_feature) -> GridSearchedBestModel:
+        """
+        get_warm_started_model(): continues training a copy of the fitted estimator of the current best model
+        on the train rows added since it was trained instead of searching its parameters again:
+        tree ensembles with warm_start -> n_estimators more trees are grown, up to max_estimators
+        estimators with partial_fit     -> n_epochs partial_fit passes over the data
+        other estimators with warm_start -> fit starting from the fitted coefficients
+        champion_model: fitted estimator of the current best model
+        input_feature: input features of the new rows, transformed by the preprocessing object of the champion
+        output_feature: Target/Dependent features of the new rows
+        ================================================================================
+        return: GridSearchedBestModel of the warm started estimator, None when it has to be trained from scratch:
+        its class is not in model_selection, it was fitted on a different number of features,
+        it can not continue training or it would grow beyond max_estimators
+        """
+        try:
+            warm_start_config = dict(self.config.get(WARM_START_KEY) or {})
+            model_name = f"{type(champion_model).__module__}.{type(champion_model).__name__}"
+            model_serial_number = None
+            for serial_number, model_initialization_config in self.models_initialization_config.items():
+                if type(champion_model).__name__ == model_initialization_config[CLASS_KEY] and \
+                        type(champion_model).__module__.startswith(model_initialization_config[MODULE_KEY]):
+                    model_serial_number = serial_number
+            if model_serial_number is None:
+                logging.info(f"{model_name} is not in model selection, no warm start")
+                return None
+            if getattr(champion_model, "n_features_in_", input_feature.shape[1]) != input_feature.shape[1]:
+                logging.info(f"{model_name} was fitted on {champion_model.n_features_in_} features, "
+                             f"got {input_feature.shape[1]}, no warm start")
+                return None
+
+            model = copy.deepcopy(champion_model)
+            model_params = model.get_params()
+            best_parameters = {}
+            message = f'{">>"* 30} Warm start training {type(model).__name__} started. {"<<"*30}'
+            logging.info(message)
+            if "warm_start" in model_params and "n_estimators" in model_params:
+                n_estimators = model_params["n_estimators"] + warm_start_config.get(WARM_START_N_ESTIMATORS_KEY, 50)
+                max_estimators = warm_start_config.get(WARM_START_MAX_ESTIMATORS_KEY)
+                if max_estimators is not None and n_estimators > max_estimators:
+                    logging.info(f"{model_name} would grow to {n_estimators} estimators, "
+                                 f"more than {max_estimators}, no warm start")
+                    return None
+                model.set_params(warm_start=True, n_estimators=n_estimators)
+                model.fit(input_feature, output_feature)
+                best_parameters = {"n_estimators": n_estimators}
+            elif hasattr(model, "partial_fit"):
+                for _ in range(warm_start_config.get(WARM_START_N_EPOCHS_KEY, 5)):
+                    model.partial_fit(input_feature, output_feature)
+            elif "warm_start" in model_params:
+                model.set_params(warm_start=True)
+                model.fit(input_feature, output_feature)
+            else:
+                logging.info(f"{model_name} can not continue training, no warm start")
+                return None
+            # a later refit of the estimator starts from scratch again
+            if "warm_start" in model_params:
+                model.set_params(warm_start=model_params["warm_start"])
+            logging.info(f'{">>"* 30} Warm start training {type(model).__name__} completed. {"<<"*30}')
+
+            return GridSearchedBestModel(model_serial_number=model_serial_number,
+                                         model=champion_model,
+                                         best_model=model,
+                                         best_parameters=best_parameters,
+                                         best_score=float("nan"),
+                                         n_fits=1
+                                         )
+        except Exception as e:
+            raise ShipmentException(e, sys) from e
+
     def get_initialized_model_list(self) -> List[InitializedModelDetail]:
         """
         This function will return a list of model details.
@@ -270,10 +491,15 @@ class ModelFactory:
                 param_grid_search = model_initialization_config[SEARCH_PARAM_GRID_KEY]
                 model_name = f"{model_initialization_config[MODULE_KEY]}.{model_initialization_config[CLASS_KEY]}"
 
+                search_strategy = model_initialization_config.get(SEARCH_STRATEGY_KEY,SEARCH_STRATEGY_GRID)
+                search_strategy_params = dict(model_initialization_config.get(SEARCH_STRATEGY_PARAMS_KEY) or {})
+
                 model_initialization_config = InitializedModelDetail(model_serial_number=model_serial_number,
                                                                      model=model,
                                                                      param_grid_search=param_grid_search,
-                                                                     model_name=model_name
+                                                                     model_name=model_name,
+                                                                     search_strategy=search_strategy,
+                                                                     search_strategy_params=search_strategy_params
                                                                      )
 
                 initialized_model_list.append(model_initialization_config)
@@ -285,7 +511,8 @@ class ModelFactory:
 
     def initiate_best_parameter_search_for_initialized_model(self, initialized_model: InitializedModelDetail,
                                                              input_feature,
-                                                             output_feature) -> GridSearchedBestModel:
+                                                             output_feature,
+                                                             cv=None) -> GridSearchedBestModel:
         """
         initiate_best_model_parameter_search(): function will perform paramter search operation and
         it will return you the best optimistic  model with best paramter:
@@ -299,22 +526,30 @@ class ModelFactory:
         try:
             return self.execute_grid_search_operation(initialized_model=initialized_model,
                                                       input_feature=input_feature,
-                                                      output_feature=output_feature)
+                                                      output_feature=output_feature,
+                                                      cv=cv)
         except Exception as e:
             raise ShipmentException(e, sys) from e
 
     def initiate_best_parameter_search_for_initialized_models(self,
                                                               initialized_model_list: List[InitializedModelDetail],
                                                               input_feature,
-                                                              output_feature) -> List[GridSearchedBestModel]:
+                                                              output_feature,
+                                                              cv=None) -> List[GridSearchedBestModel]:
 
         try:
+            if self.search_executor is not None:
+                return self.execute_parallel_search_operation(initialized_model_list=initialized_model_list,
+                                                              input_feature=input_feature,
+                                                              output_feature=output_feature,
+                                                              cv=cv)
             self.grid_searched_best_model_list = []
             for initialized_model_list in initialized_model_list:
                 grid_searched_best_model = self.initiate_best_parameter_search_for_initialized_model(
                     initialized_model=initialized_model_list,
                     input_feature=input_feature,
-                    output_feature=output_feature
+                    output_feature=output_feature,
+                    cv=cv
                 )
                 self.grid_searched_best_model_list.append(grid_searched_best_model)
             return self.grid_searched_best_model_list
@@ -353,7 +588,7 @@ class ModelFactory:
         except Exception as e:
             raise ShipmentException(e, sys) from e
 
-    def get_best_model(self, X, y,base_accuracy=0.6) -> BestModel:
+    def get_best_model(self, X, y,base_accuracy=0.6,cv=None) -> BestModel:
         try:
             logging.info("Started Initializing model from config file")
             initialized_model_list = self.get_initialized_model_list()
@@ -361,7 +596,8 @@ class ModelFactory:
             grid_searched_best_model_list = self.initiate_best_parameter_search_for_initialized_models(
                 initialized_model_list=initialized_model_list,
                 input_feature=X,
-                output_feature=y
+                output_feature=y,
+                cv=cv
             )
             return ModelFactory.get_best_model_from_grid_searched_best_model_list(grid_searched_best_model_list,
                                                                                   base_accuracy=base_accuracy)
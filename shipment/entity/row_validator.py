@@ -0,0 +1,148 @@
+import sys
+from collections import namedtuple
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from shipment.constant import VALIDATION_RULE_NULLABLE_KEY,VALIDATION_RULE_MIN_KEY,VALIDATION_RULE_MAX_KEY
+from shipment.exception import ShipmentException
+
+RULE_NUMERIC = "numeric"
+RULE_DATETIME = "datetime"
+RULE_DOMAIN = "domain"
+RULE_NOT_NULL = "not_null"
+RULE_MIN = "min"
+RULE_MAX = "max"
+
+RULE_CODE_SEPARATOR = ";"
+
+ValidationRule = namedtuple("ValidationRule",["code","column","kind","value"])
+
+RowValidationReport = namedtuple("RowValidationReport",["rows","failed_rows","rule_counts"])
+
+
+def get_distinct_value_mask(series:pd.Series,is_invalid) -> np.ndarray:
+    """
+    Evaluates is_invalid on the distinct non missing values of series only and maps the result back to the rows.
+    is_invalid: function of an array of distinct values returning a boolean array
+    return: boolean array aligned with series, missing values are never invalid
+    """
+    codes,distinct_values = pd.factorize(series)
+    if len(distinct_values) == 0:
+        return np.zeros(len(series),dtype=bool)
+    is_invalid_value = np.asarray(is_invalid(np.asarray(distinct_values)),dtype=bool)
+    return np.append(is_invalid_value,False)[codes]
+
+
+class RowValidator:
+
+    def __init__(self,rules:List[ValidationRule],datetime_format:str=None):
+        """
+        Row level validation of a dataset with one boolean mask per rule over whole columns.
+        rules: compiled ValidationRule list, see from_schema
+        datetime_format: strftime format datetime columns given as strings are parsed with
+        """
+        self.rules = rules
+        self.datetime_format = datetime_format
+
+    @classmethod
+    def from_schema(cls,dataset_schema) -> "RowValidator":
+        """
+        Compiles the rules from a CompiledSchema:
+        numerical and target columns -> numeric:<column>, value must be coercible to a number
+        datetime columns -> datetime:<column>, value must parse with datetime_format
+        domain_value section -> domain:<column>, value must be one of the domain values
+        validation_rules section -> not_null:<column> (nullable: false), min:<column>, max:<column>
+        """
+        try:
+            rules = []
+            numeric_columns = list(dict.fromkeys(dataset_schema.numerical_columns + [dataset_schema.target_column]))
+            for column in numeric_columns:
+                rules.append(ValidationRule(f"{RULE_NUMERIC}:{column}",column,RULE_NUMERIC,None))
+            for column in dataset_schema.datetime_columns:
+                rules.append(ValidationRule(f"{RULE_DATETIME}:{column}",column,RULE_DATETIME,None))
+            for column,domain_values in dataset_schema.domain_values.items():
+                rules.append(ValidationRule(f"{RULE_DOMAIN}:{column}",column,RULE_DOMAIN,domain_values))
+
+            for column,column_rules in dataset_schema.validation_rules.items():
+                column_rules = dict(column_rules or {})
+                if column_rules.get(VALIDATION_RULE_NULLABLE_KEY,True) is False:
+                    rules.append(ValidationRule(f"{RULE_NOT_NULL}:{column}",column,RULE_NOT_NULL,None))
+                if column_rules.get(VALIDATION_RULE_MIN_KEY) is not None:
+                    rules.append(ValidationRule(f"{RULE_MIN}:{column}",column,RULE_MIN,
+                                                float(column_rules[VALIDATION_RULE_MIN_KEY])))
+                if column_rules.get(VALIDATION_RULE_MAX_KEY) is not None:
+                    rules.append(ValidationRule(f"{RULE_MAX}:{column}",column,RULE_MAX,
+                                                float(column_rules[VALIDATION_RULE_MAX_KEY])))
+            return cls(rules=rules,datetime_format=dataset_schema.datetime_format)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    @staticmethod
+    def get_numeric_values(series:pd.Series) -> np.ndarray:
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            return series.to_numpy(dtype=float,na_value=np.nan)
+        return pd.to_numeric(series.astype(object),errors="coerce").to_numpy(dtype=float,na_value=np.nan)
+
+    def get_rule_mask(self,series:pd.Series,rule:ValidationRule) -> np.ndarray:
+        """
+        return: boolean array, True where the row violates the rule
+        """
+        if rule.kind == RULE_NUMERIC:
+            if pd.api.types.is_numeric_dtype(series.dtype):
+                return np.zeros(len(series),dtype=bool)
+            return get_distinct_value_mask(series,lambda values: pd.isna(pd.to_numeric(values,errors="coerce")))
+        if rule.kind == RULE_DATETIME:
+            if pd.api.types.is_datetime64_any_dtype(series.dtype):
+                return np.zeros(len(series),dtype=bool)
+            return get_distinct_value_mask(series,lambda values: pd.isna(
+                pd.to_datetime(values.astype(str),format=self.datetime_format,errors="coerce")))
+        if rule.kind == RULE_DOMAIN:
+            return get_distinct_value_mask(series,lambda values: ~pd.Index(values).isin(rule.value))
+        if rule.kind == RULE_NOT_NULL:
+            return series.isna().to_numpy()
+        if rule.kind == RULE_MIN:
+            # comparisons with NaN are False, missing values are left to the not_null rule
+            return RowValidator.get_numeric_values(series) < rule.value
+        if rule.kind == RULE_MAX:
+            return RowValidator.get_numeric_values(series) > rule.value
+        raise Exception(f"Unknown validation rule [{rule.kind}]")
+
+    def get_rule_masks(self,df:pd.DataFrame) -> dict:
+        """
+        return: {rule code: violation mask} for the rules whose column is in df
+        """
+        try:
+            return {rule.code:self.get_rule_mask(series=df[rule.column],rule=rule)
+                    for rule in self.rules if rule.column in df.columns}
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def validate(self,df:pd.DataFrame):
+        """
+        return: boolean array True for failed rows,
+                np.array of the ";" joined rule codes of every failed row,
+                RowValidationReport
+        """
+        try:
+            rule_masks = self.get_rule_masks(df)
+            failed_mask = np.zeros(len(df),dtype=bool)
+            for rule_mask in rule_masks.values():
+                failed_mask |= rule_mask
+
+            rule_codes = np.full(int(failed_mask.sum()),"",dtype=object)
+            rule_counts = {}
+            for code,rule_mask in rule_masks.items():
+                violations = int(rule_mask.sum())
+                if violations == 0:
+                    continue
+                rule_counts[code] = violations
+                is_violated = rule_mask[failed_mask]
+                rule_codes[is_violated] = rule_codes[is_violated] + RULE_CODE_SEPARATOR + code
+            rule_codes = pd.Series(rule_codes,dtype=object).str.slice(len(RULE_CODE_SEPARATOR)).to_numpy()
+
+            report = RowValidationReport(rows=len(df),failed_rows=int(failed_mask.sum()),rule_counts=rule_counts)
+            return failed_mask,rule_codes,report
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
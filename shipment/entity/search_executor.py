@@ -0,0 +1,399 @@
+from shipment.exception import ShipmentException
+from shipment.logger import logging
+from shipment.util.cv_cache import CVResultCache,get_array_fingerprint,get_fold_key
+from collections import namedtuple
+from typing import List
+from joblib import Parallel,delayed,effective_n_jobs
+from threadpoolctl import threadpool_limits
+from sklearn.base import clone
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import ParameterGrid,ParameterSampler,check_cv
+import numpy as np
+import math
+import time
+import sys
+
+SEARCH_STRATEGY_GRID = "grid"
+SEARCH_STRATEGY_RANDOM = "random"
+SEARCH_STRATEGY_HALVING = "halving"
+
+# search strategy params
+N_ITER_KEY = "n_iter"
+RANDOM_STATE_KEY = "random_state"
+RESOURCE_KEY = "resource"
+FACTOR_KEY = "factor"
+MIN_RESOURCES_KEY = "min_resources"
+MAX_RESOURCES_KEY = "max_resources"
+
+# halving resource meaning the number of train rows of every fold, any other resource is an estimator parameter
+RESOURCE_N_SAMPLES = "n_samples"
+
+SearchTask = namedtuple("SearchTask",["model_index","round_index","candidate_index","fold_index","parameters",
+                                      "n_samples"])
+
+SearchRound = namedtuple("SearchRound",["resource","candidate_indexes","mean_test_scores"])
+
+FoldResult = namedtuple("FoldResult",["score","fit_time"])
+
+SearchResult = namedtuple("SearchResult",["model_index","best_estimator","best_parameters","best_score",
+                                          "best_index","search_rounds","n_fits","is_complete"])
+
+
+def fit_and_score(estimator,X,y,train:np.ndarray,test:np.ndarray,parameters:dict,scoring=None,
+                  threads_per_worker:int=None) -> FoldResult:
+    """
+    Fits a clone of estimator with parameters on the train rows and scores it on the test rows,
+    like one fold of one candidate of GridSearchCV.
+    return: test score and fit time in seconds
+    """
+    with threadpool_limits(limits=threads_per_worker):
+        candidate = clone(estimator).set_params(**parameters)
+        fit_start_time = time.time()
+        candidate.fit(X[train],y[train])
+        fit_time = time.time() - fit_start_time
+        return FoldResult(score=float(check_scoring(candidate,scoring=scoring)(candidate,X[test],y[test])),
+                          fit_time=fit_time)
+
+
+def refit(estimator,X,y,parameters:dict,threads_per_worker:int=None):
+    """
+    return: clone of estimator with parameters fitted on all rows
+    """
+    with threadpool_limits(limits=threads_per_worker):
+        return clone(estimator).set_params(**parameters).fit(X,y)
+
+
+def get_best_index(mean_test_scores:np.ndarray) -> int:
+    """
+    return: candidate GridSearchCV picks, the first one with the highest mean score, nan scores rank last
+    """
+    return int(np.argmax(np.where(np.isnan(mean_test_scores),-np.inf,mean_test_scores)))
+
+
+class ModelSearch:
+
+    def __init__(self,model_index:int,param_grid,search_strategy:str=None,search_strategy_params:dict=None,
+                 n_train_samples:int=None) -> None:
+        """
+        Candidates and rounds of the search of one model.
+        grid    -> every ParameterGrid candidate, one round
+        random  -> n_iter candidates of ParameterSampler, one round
+        halving -> every candidate (n_iter sampled ones when given) in the first round with min_resources,
+                   each following round keeps the best 1/factor candidates and gives them factor times
+                   the resource, up to max_resources
+        n_train_samples: rows of the smallest train fold, max_resources of the n_samples resource
+        """
+        try:
+            self.model_index = model_index
+            self.search_strategy = search_strategy or SEARCH_STRATEGY_GRID
+            self.search_strategy_params = dict(search_strategy_params or {})
+            params = self.search_strategy_params
+
+            if self.search_strategy not in [SEARCH_STRATEGY_GRID,SEARCH_STRATEGY_RANDOM,SEARCH_STRATEGY_HALVING]:
+                raise Exception(f"Unknown search strategy [{self.search_strategy}]")
+            if self.search_strategy == SEARCH_STRATEGY_RANDOM or \
+                    (self.search_strategy == SEARCH_STRATEGY_HALVING and params.get(N_ITER_KEY) is not None):
+                self.candidates = list(ParameterSampler(param_grid,n_iter=int(params.get(N_ITER_KEY,10)),
+                                                        random_state=params.get(RANDOM_STATE_KEY)))
+            else:
+                self.candidates = list(ParameterGrid(param_grid))
+
+            self.resource = None
+            self.resources = [None]
+            if self.search_strategy == SEARCH_STRATEGY_HALVING:
+                self.resource = params.get(RESOURCE_KEY,RESOURCE_N_SAMPLES)
+                self.factor = params.get(FACTOR_KEY,3)
+                max_resources = params.get(MAX_RESOURCES_KEY)
+                # without max_resources the last round of the n_samples resource fits on the whole train folds
+                self.is_last_round_full = max_resources is None
+                if max_resources is None:
+                    if self.resource != RESOURCE_N_SAMPLES:
+                        raise Exception(f"max_resources is needed to halve over [{self.resource}]")
+                    max_resources = n_train_samples
+                # as many rounds as it takes to get down to one candidate, the last one with max_resources
+                n_rounds = 1 + int(math.floor(math.log(max(len(self.candidates),1)) / math.log(self.factor)))
+                min_resources = params.get(MIN_RESOURCES_KEY) or max(int(max_resources // self.factor ** (n_rounds - 1)),1)
+                self.resources = []
+                resource = min_resources
+                while len(self.resources) < n_rounds - 1 and resource < max_resources:
+                    self.resources.append(int(resource))
+                    resource = resource * self.factor
+                self.resources.append(int(max_resources))
+
+            self.candidate_indexes = list(range(len(self.candidates)))
+            self.round_index = 0
+            self.is_stopped = False
+            self.search_rounds: List[SearchRound] = []
+            self.n_fits = 0
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def is_done(self) -> bool:
+        return self.is_stopped or self.round_index >= len(self.resources) or len(self.candidate_indexes) == 0
+
+    def get_parameters(self,candidate_index:int) -> dict:
+        parameters = dict(self.candidates[candidate_index])
+        resource = self.resources[self.round_index] if not self.is_done() else self.resources[-1]
+        if self.resource is not None and self.resource != RESOURCE_N_SAMPLES:
+            parameters[self.resource] = resource
+        return parameters
+
+    def get_tasks(self,n_folds:int) -> List[SearchTask]:
+        n_samples = None
+        is_last_round = self.round_index == len(self.resources) - 1
+        if self.resource == RESOURCE_N_SAMPLES and not (is_last_round and self.is_last_round_full):
+            n_samples = self.resources[self.round_index]
+        return [SearchTask(model_index=self.model_index,round_index=self.round_index,candidate_index=candidate_index,
+                           fold_index=fold_index,parameters=self.get_parameters(candidate_index),n_samples=n_samples)
+                for candidate_index in self.candidate_indexes for fold_index in range(n_folds)]
+
+    def complete_round(self,fold_scores:dict,n_folds:int,n_fits:int,is_stopped:bool=False):
+        """
+        fold_scores: {(candidate index, fold index): score} of the tasks of the round that ran
+        n_fits: fits run in the round
+        is_stopped: the round was cut short by the time budget, the search ends with it
+        """
+        candidate_fold_scores = [[fold_scores[(candidate_index,fold_index)] for fold_index in range(n_folds)
+                                  if (candidate_index,fold_index) in fold_scores]
+                                 for candidate_index in self.candidate_indexes]
+        mean_test_scores = np.array([np.average(scores) if len(scores) == n_folds else np.nan
+                                     for scores in candidate_fold_scores])
+        if is_stopped and np.all(np.isnan(mean_test_scores)):
+            # no candidate got all its folds within the time budget, the folds that ran are the best so far
+            mean_test_scores = np.array([np.average(scores) if len(scores) > 0 else np.nan
+                                         for scores in candidate_fold_scores])
+        self.search_rounds.append(SearchRound(resource=self.resources[self.round_index],
+                                              candidate_indexes=list(self.candidate_indexes),
+                                              mean_test_scores=mean_test_scores))
+        self.n_fits += n_fits
+        self.is_stopped = is_stopped
+
+        if self.round_index + 1 < len(self.resources):
+            n_kept = max(int(math.ceil(len(self.candidate_indexes) / self.factor)),1)
+            ranking = np.argsort(-np.where(np.isnan(mean_test_scores),-np.inf,mean_test_scores),kind="stable")
+            self.candidate_indexes = [self.candidate_indexes[index] for index in ranking[:n_kept]]
+        self.round_index += 1
+
+    def get_best(self):
+        """
+        return: best candidate index, its parameters and mean score, from the last round with a scored candidate
+        """
+        for search_round in reversed(self.search_rounds):
+            if not np.all(np.isnan(search_round.mean_test_scores)):
+                best_index = get_best_index(search_round.mean_test_scores)
+                candidate_index = search_round.candidate_indexes[best_index]
+                parameters = dict(self.candidates[candidate_index])
+                if self.resource is not None and self.resource != RESOURCE_N_SAMPLES:
+                    parameters[self.resource] = search_round.resource
+                return candidate_index,parameters,float(search_round.mean_test_scores[best_index])
+        # nothing was scored within the time budget
+        return 0,dict(self.candidates[0]) if len(self.candidates) > 0 else {},float("nan")
+
+
+class SearchExecutor:
+
+    def __init__(self,n_jobs:int=1,threads_per_worker:int=1,backend:str="loky",verbose:int=0,
+                 time_budget:float=None,cv_cache_dir:str=None) -> None:
+        """
+        Runs the parameter search of several models as one set of (model, candidate, fold) tasks
+        on a joblib worker pool, so the workers stay busy across models instead of one model at a time.
+        n_jobs: worker processes, -1 uses all cores
+        threads_per_worker: BLAS/OpenMP threads of every worker, keeps n_jobs workers from oversubscribing cores
+        backend: joblib backend
+        verbose: joblib verbosity
+        time_budget: seconds after which no more search tasks are started and the best so far is refitted,
+                     None runs every task
+        cv_cache_dir: directory of the cross validation result cache shared by every run, fold scores
+                      of a candidate already fitted on the same data and folds are read from it, None disables it
+        """
+        self.n_jobs = n_jobs
+        self.threads_per_worker = threads_per_worker
+        self.backend = backend
+        self.verbose = verbose
+        self.time_budget = time_budget
+        self.cv_cache = CVResultCache(cache_dir=cv_cache_dir) if cv_cache_dir is not None else None
+
+    def get_parallel(self) -> Parallel:
+        # memory mapped inputs are passed to the workers by reference
+        return Parallel(n_jobs=self.n_jobs,backend=self.backend,verbose=self.verbose)
+
+    @staticmethod
+    def get_fold_train_rows(train:np.ndarray,n_samples:int,random_state:int=0) -> np.ndarray:
+        """
+        return: sorted random subset of n_samples train rows, the same for every candidate of a round
+        """
+        if n_samples is None or n_samples >= len(train):
+            return train
+        return np.sort(np.random.default_rng(random_state).choice(train,size=n_samples,replace=False))
+
+    def read_cached_fold_results(self,estimators:list,tasks:List[SearchTask],folds:list,data_fingerprint:str,
+                                 scoring=None) -> list:
+        """
+        return: (entry key, entry details, fold key, cached FoldResult or None) of every task
+        """
+        try:
+            entries = {}
+            cached_fold_results = []
+            for task in tasks:
+                entry_id = (task.model_index,task.round_index,task.candidate_index)
+                if entry_id not in entries:
+                    entry_details = CVResultCache.get_entry_details(estimator=estimators[task.model_index],
+                                                                    parameters=task.parameters,
+                                                                    data_fingerprint=data_fingerprint,scoring=scoring)
+                    entry_key = CVResultCache.get_entry_key(entry_details)
+                    entries[entry_id] = entry_key,entry_details,self.cv_cache.get_fold_results(entry_key)
+                entry_key,entry_details,fold_results = entries[entry_id]
+
+                train,test = folds[task.fold_index]
+                fold_key = get_fold_key(train=SearchExecutor.get_fold_train_rows(train,n_samples=task.n_samples,
+                                                                                 random_state=task.fold_index),
+                                        test=test)
+                fold_result = fold_results.get(fold_key)
+                cached_fold_results.append((entry_key,entry_details,fold_key,
+                                            FoldResult(**fold_result) if fold_result is not None else None))
+            return cached_fold_results
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def store_fold_results(self,cache_entries:list,fold_results:List[FoldResult]):
+        """
+        cache_entries: (entry key, entry details, fold key) of the tasks that ran
+        fold_results: FoldResult of the tasks that ran, in the same order
+        """
+        try:
+            entries = {}
+            for (entry_key,entry_details,fold_key),fold_result in zip(cache_entries,fold_results):
+                entries.setdefault(entry_key,(entry_details,{}))[1][fold_key] = fold_result._asdict()
+            for entry_key,(entry_details,entry_fold_results) in entries.items():
+                self.cv_cache.store(entry_key=entry_key,entry_details=entry_details,fold_results=entry_fold_results)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def run_tasks(self,estimators:list,tasks:List[SearchTask],X,y,folds:list,scoring=None,
+                  start_time:float=None) -> List[FoldResult]:
+        """
+        Runs the tasks, in batches of a few tasks per worker when there is a time budget
+        so that no batch is started once the budget is spent.
+        return: fold results of the tasks that ran, in task order
+        """
+        try:
+            batch_size = len(tasks)
+            if self.time_budget is not None:
+                batch_size = max(2 * effective_n_jobs(self.n_jobs),1)
+
+            fold_results = []
+            for batch_start in range(0,len(tasks),max(batch_size,1)):
+                if self.time_budget is not None and time.time() - start_time > self.time_budget:
+                    logging.info(f"Search time budget of [{self.time_budget}] seconds spent, "
+                                 f"[{len(tasks) - batch_start}] search tasks not run")
+                    break
+                batch = tasks[batch_start:batch_start + batch_size]
+                batch_fold_results = self.get_parallel()(
+                    delayed(fit_and_score)(estimators[task.model_index],X,y,
+                                           train=SearchExecutor.get_fold_train_rows(folds[task.fold_index][0],
+                                                                                   n_samples=task.n_samples,
+                                                                                   random_state=task.fold_index),
+                                           test=folds[task.fold_index][1],
+                                           parameters=task.parameters,scoring=scoring,
+                                           threads_per_worker=self.threads_per_worker)
+                    for task in batch)
+                fold_results.extend(batch_fold_results)
+            return fold_results
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def search(self,estimators:list,param_grids:list,X,y,cv=5,scoring=None,search_strategies:list=None,
+               search_strategy_params:list=None) -> List[SearchResult]:
+        """
+        Parameter search of every estimator with its search strategy, by default the exhaustive grid search
+        with the results of GridSearchCV: same candidate order, same folds, mean test score over the folds
+        and refit of the best candidate. The rounds of all models run together, a halving model
+        going on with its next round while the others are done. With the cross validation result cache
+        only the (candidate, fold) pairs not fitted before on the same data are fitted.
+        estimators: unfitted estimators
+        param_grids: GridSearchCV param_grid of every estimator
+        cv: int, cross validation splitter or iterable of (train, test)
+        scoring: GridSearchCV scoring, None uses the estimator score method
+        search_strategies: grid, random or halving of every estimator, None for grid search of all
+        search_strategy_params: params of the search strategy of every estimator, see ModelSearch
+        return: SearchResult of every estimator, in estimator order
+        """
+        try:
+            start_time = time.time()
+            folds = list(check_cv(cv,y,classifier=False).split(X,y))
+            data_fingerprint = get_array_fingerprint(X,y) if self.cv_cache is not None else None
+            n_train_samples = min(len(train) for train,_ in folds)
+            search_strategies = search_strategies or [None] * len(estimators)
+            search_strategy_params = search_strategy_params or [None] * len(estimators)
+            model_searches = [ModelSearch(model_index=model_index,param_grid=param_grid,
+                                          search_strategy=search_strategies[model_index],
+                                          search_strategy_params=search_strategy_params[model_index],
+                                          n_train_samples=n_train_samples)
+                              for model_index,param_grid in enumerate(param_grids)]
+
+            is_budget_spent = False
+            while not is_budget_spent and not all(model_search.is_done() for model_search in model_searches):
+                active_searches = [model_search for model_search in model_searches if not model_search.is_done()]
+                # candidates of the models take turns, so that a time budget does not starve the last models
+                tasks = [task for _,task in sorted(
+                    [((position // len(folds),model_order,position % len(folds)),task)
+                     for model_order,model_search in enumerate(active_searches)
+                     for position,task in enumerate(model_search.get_tasks(n_folds=len(folds)))],
+                    key=lambda ordered_task: ordered_task[0])]
+                logging.info(f"Running [{len(tasks)}] search tasks of [{len(active_searches)}] models "
+                             f"with n_jobs: [{self.n_jobs}], threads per worker: [{self.threads_per_worker}]")
+
+                # tasks answered by the cross validation result cache are not fitted again
+                cached_fold_results = [None] * len(tasks)
+                if self.cv_cache is not None:
+                    cached_fold_results = self.read_cached_fold_results(estimators=estimators,tasks=tasks,folds=folds,
+                                                                        data_fingerprint=data_fingerprint,
+                                                                        scoring=scoring)
+                uncached_positions = [position for position,cached_fold_result in enumerate(cached_fold_results)
+                                      if cached_fold_result is None or cached_fold_result[3] is None]
+                if len(uncached_positions) < len(tasks):
+                    logging.info(f"[{len(tasks) - len(uncached_positions)}] search tasks read from the "
+                                 f"cross validation result cache")
+
+                uncached_tasks = [tasks[position] for position in uncached_positions]
+                fold_results = self.run_tasks(estimators=estimators,tasks=uncached_tasks,X=X,y=y,folds=folds,
+                                              scoring=scoring,start_time=start_time)
+                is_budget_spent = len(fold_results) < len(uncached_tasks)
+                if self.cv_cache is not None:
+                    self.store_fold_results(cache_entries=[cached_fold_results[position][:3]
+                                                           for position in uncached_positions[:len(fold_results)]],
+                                            fold_results=fold_results)
+
+                task_fold_results = {position:cached_fold_result[3] for position,cached_fold_result
+                                     in enumerate(cached_fold_results)
+                                     if cached_fold_result is not None and cached_fold_result[3] is not None}
+                fitted_positions = set(uncached_positions[:len(fold_results)])
+                task_fold_results.update(zip(uncached_positions,fold_results))
+
+                for model_search in active_searches:
+                    model_positions = [position for position in task_fold_results
+                                       if tasks[position].model_index == model_search.model_index]
+                    fold_scores = {(tasks[position].candidate_index,tasks[position].fold_index):
+                                   task_fold_results[position].score for position in model_positions}
+                    model_search.complete_round(fold_scores=fold_scores,n_folds=len(folds),
+                                                n_fits=len(fitted_positions.intersection(model_positions)),
+                                                is_stopped=is_budget_spent)
+            logging.info(f"Search tasks completed in [{time.time() - start_time:.1f}] seconds")
+
+            best_candidates = [model_search.get_best() for model_search in model_searches]
+            best_estimators = self.get_parallel()(
+                delayed(refit)(estimator,X,y,parameters=best_candidates[model_index][1],
+                               threads_per_worker=self.threads_per_worker)
+                for model_index,estimator in enumerate(estimators))
+
+            return [SearchResult(model_index=model_index,
+                                 best_estimator=best_estimators[model_index],
+                                 best_parameters=best_candidates[model_index][1],
+                                 best_score=best_candidates[model_index][2],
+                                 best_index=best_candidates[model_index][0],
+                                 search_rounds=model_search.search_rounds,
+                                 n_fits=model_search.n_fits + 1,
+                                 is_complete=not model_search.is_stopped)
+                    for model_index,model_search in enumerate(model_searches)]
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
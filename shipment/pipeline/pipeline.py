@@ -51,10 +51,14 @@ class Pipeline:
         except Exception as e:
             raise ShipmentException(e,sys) from e
 
-    def start_model_trainer(self,data_transformation_artifact:DataTransformationArtifact) -> ModelTrainerArtifact:
+    def start_model_trainer(self,data_ingestion_artifact:DataIngestionArtifact,
+                                 data_validation_artifact:DataValidationArtifact,
+                                 data_transformation_artifact:DataTransformationArtifact) -> ModelTrainerArtifact:
         try:
             model_trainer = ModelTrainer(model_trainer_config=self.config.get_model_training_config(),
-                                                data_transformation_artifact=data_transformation_artifact)
+                                                data_transformation_artifact=data_transformation_artifact,
+                                                data_ingestion_artifact=data_ingestion_artifact,
+                                                data_validation_artifact=data_validation_artifact)
             
             return model_trainer.initiate_model_trainer()
         except Exception as e:
@@ -86,7 +90,9 @@ class Pipeline:
             data_transformation_artifact = self.start_data_transformation(data_ingestion_artifact=data_ingestion_artifact,
                                                                         data_validation_artifact=data_validation_artifact)
             # model_trainer
-            model_trainer_artifact = self.start_model_trainer(data_transformation_artifact=data_transformation_artifact)                                                         
+            model_trainer_artifact = self.start_model_trainer(data_ingestion_artifact=data_ingestion_artifact,
+                                                              data_validation_artifact=data_validation_artifact,
+                                                              data_transformation_artifact=data_transformation_artifact)                                                         
 
             #model evaluation
             model_evaluation_artifact = self.start_model_evaluation(data_ingestion_artifact=data_ingestion_artifact,
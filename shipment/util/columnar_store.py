@@ -0,0 +1,249 @@
+from shipment.exception import ShipmentException
+from typing import List
+import pandas as pd
+import numpy as np
+import shutil
+import json
+import os,sys
+
+STORE_METADATA_FILE_NAME = "_store.json"
+SEGMENT_METADATA_FILE_NAME = "_segment.json"
+SEGMENT_DIR_PREFIX = "segment-"
+
+COLUMN_KIND_CATEGORY = "category"
+COLUMN_KIND_NUMERIC = "numeric"
+COLUMN_KIND_DATETIME = "datetime"
+
+CATEGORY_CODE_DTYPE = np.int32
+NUMERIC_DTYPE = np.float64
+DATETIME_DTYPE = "datetime64[ns]"
+
+
+class ColumnarStoreWriter:
+
+    def __init__(self,store_dir:str,column_kinds:dict,datetime_format:str=None) -> None:
+        """
+        Writes a dataframe as a typed columnar store that can be memory-mapped back.
+        Every call to append() writes one segment, so the store can be built chunk by chunk.
+        Inside a segment:
+            category columns -> int32 dictionary codes (-1 for missing) + categories in the segment metadata
+            numeric columns  -> float64 array
+            datetime columns -> datetime64[ns] array
+        store_dir: directory of the store, recreated if it exists
+        column_kinds: {column name: category|numeric|datetime}, unlisted columns are inferred from their dtype
+        datetime_format: strftime format used to parse datetime columns given as strings
+        """
+        try:
+            self.store_dir = store_dir
+            self.column_kinds = dict(column_kinds)
+            self.datetime_format = datetime_format
+            self.columns = None
+            self.segments = []
+            self.rows = 0
+
+            if os.path.exists(store_dir):
+                for segment_dir in ColumnarStoreWriter.list_segment_dirs(store_dir):
+                    for file_name in os.listdir(segment_dir):
+                        os.remove(os.path.join(segment_dir,file_name))
+                    os.rmdir(segment_dir)
+                if os.path.exists(os.path.join(store_dir,STORE_METADATA_FILE_NAME)):
+                    os.remove(os.path.join(store_dir,STORE_METADATA_FILE_NAME))
+            os.makedirs(store_dir,exist_ok=True)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    @staticmethod
+    def list_segment_dirs(store_dir:str) -> List[str]:
+        return sorted(os.path.join(store_dir,name) for name in os.listdir(store_dir)
+                      if name.startswith(SEGMENT_DIR_PREFIX))
+
+    def get_column_kind(self,column:str,series:pd.Series) -> str:
+        if column in self.column_kinds:
+            return self.column_kinds[column]
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return COLUMN_KIND_DATETIME
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            return COLUMN_KIND_NUMERIC
+        return COLUMN_KIND_CATEGORY
+
+    def encode_column(self,series:pd.Series,kind:str):
+        """
+        return: numpy array to persist, segment metadata of the column
+        """
+        if kind == COLUMN_KIND_CATEGORY:
+            codes,categories = pd.factorize(series)
+            return codes.astype(CATEGORY_CODE_DTYPE),{"categories":np.asarray(categories).tolist()}
+        if kind == COLUMN_KIND_DATETIME:
+            if not pd.api.types.is_datetime64_any_dtype(series.dtype):
+                series = pd.to_datetime(series,format=self.datetime_format,errors="coerce")
+            return series.to_numpy(dtype=DATETIME_DTYPE),{}
+        if kind == COLUMN_KIND_NUMERIC:
+            return pd.to_numeric(series,errors="coerce").to_numpy(dtype=NUMERIC_DTYPE),{}
+        raise Exception(f"Unknown column kind [{kind}]")
+
+    def append(self,df:pd.DataFrame) -> int:
+        """
+        Writes df as a new segment.
+        return: number of rows written
+        """
+        try:
+            if self.columns is None:
+                self.columns = [{"name":column,"kind":self.get_column_kind(column,df[column])} for column in df.columns]
+            elif [column["name"] for column in self.columns] != list(df.columns):
+                raise Exception(f"Columns of the new segment do not match the store columns.")
+
+            segment_name = f"{SEGMENT_DIR_PREFIX}{len(self.segments):05d}"
+            segment_dir = os.path.join(self.store_dir,segment_name)
+            os.makedirs(segment_dir,exist_ok=True)
+
+            segment_columns = {}
+            for column_number,column in enumerate(self.columns):
+                array,column_metadata = self.encode_column(df[column["name"]],column["kind"])
+                file_name = f"{column_number:03d}.npy"
+                np.save(os.path.join(segment_dir,file_name),array,allow_pickle=False)
+                column_metadata["file"] = file_name
+                segment_columns[column["name"]] = column_metadata
+
+            with open(os.path.join(segment_dir,SEGMENT_METADATA_FILE_NAME),"w") as segment_file:
+                json.dump({"rows":len(df),"columns":segment_columns},segment_file)
+
+            self.segments.append({"name":segment_name,"rows":len(df)})
+            self.rows += len(df)
+            return len(df)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def link_store(self,source_store_dir:str) -> int:
+        """
+        Adds every segment of an existing closed store to this store without rewriting it.
+        Segment files are immutable once written, so they are hard linked (copied when the
+        stores are on different file systems) and the source store stays untouched.
+        return: number of rows added
+        """
+        try:
+            source_metadata = read_columnar_store_metadata(source_store_dir)
+            if self.columns is None:
+                self.columns = source_metadata["columns"]
+            elif self.columns != source_metadata["columns"]:
+                raise Exception(f"Columns of store [{source_store_dir}] do not match the store columns.")
+
+            rows = 0
+            for source_segment in source_metadata["segments"]:
+                source_segment_dir = os.path.join(source_store_dir,source_segment["name"])
+                segment_name = f"{SEGMENT_DIR_PREFIX}{len(self.segments):05d}"
+                segment_dir = os.path.join(self.store_dir,segment_name)
+                os.makedirs(segment_dir,exist_ok=True)
+                for file_name in os.listdir(source_segment_dir):
+                    try:
+                        os.link(os.path.join(source_segment_dir,file_name),os.path.join(segment_dir,file_name))
+                    except OSError:
+                        shutil.copyfile(os.path.join(source_segment_dir,file_name),os.path.join(segment_dir,file_name))
+                self.segments.append({"name":segment_name,"rows":source_segment["rows"]})
+                rows += source_segment["rows"]
+
+            self.rows += rows
+            return rows
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def close(self) -> str:
+        """
+        Writes the store metadata; the store is only readable once closed.
+        return: store_dir
+        """
+        try:
+            with open(os.path.join(self.store_dir,STORE_METADATA_FILE_NAME),"w") as store_file:
+                json.dump({"columns":self.columns or [],"segments":self.segments,"rows":self.rows},store_file)
+            return self.store_dir
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+
+def save_columnar_data(store_dir:str,dataframe:pd.DataFrame,column_kinds:dict,datetime_format:str=None) -> str:
+    """
+    Saves a whole dataframe as a single segment columnar store
+    store_dir: str location of the store
+    dataframe: pd.DataFrame data to save
+    column_kinds: dict {column name: category|numeric|datetime}
+    """
+    try:
+        store_writer = ColumnarStoreWriter(store_dir=store_dir,column_kinds=column_kinds,
+                                           datetime_format=datetime_format)
+        store_writer.append(dataframe)
+        return store_writer.close()
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
+
+
+def is_columnar_store(store_dir:str) -> bool:
+    return store_dir is not None and os.path.exists(os.path.join(store_dir,STORE_METADATA_FILE_NAME))
+
+
+def read_columnar_store_metadata(store_dir:str) -> dict:
+    try:
+        with open(os.path.join(store_dir,STORE_METADATA_FILE_NAME)) as store_file:
+            return json.load(store_file)
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
+
+
+def load_columnar_data(store_dir:str,columns:List[str]=None,rows:np.ndarray=None) -> pd.DataFrame:
+    """
+    Opens a columnar store with memory-mapped column arrays
+    store_dir: str location of the store
+    columns: optional subset of columns to load
+    rows: optional row numbers to load, in the order they are given
+    return: pd.DataFrame with category, float64 and datetime64 columns
+    """
+    try:
+        store_metadata = read_columnar_store_metadata(store_dir)
+        store_columns = [column for column in store_metadata["columns"]
+                         if columns is None or column["name"] in columns]
+
+        # rows are gathered segment by segment in ascending order and put back in the requested order
+        row_order = None
+        if rows is not None:
+            rows = np.asarray(rows)
+            if len(rows) > 1 and np.any(rows[1:] < rows[:-1]):
+                row_order = np.argsort(rows,kind="stable")
+                rows = rows[row_order]
+
+        segment_metadata_list = []
+        segment_start = 0
+        for segment in store_metadata["segments"]:
+            segment_dir = os.path.join(store_dir,segment["name"])
+            with open(os.path.join(segment_dir,SEGMENT_METADATA_FILE_NAME)) as segment_file:
+                segment_metadata = json.load(segment_file)
+            segment_rows = None
+            if rows is not None:
+                start,end = np.searchsorted(rows,[segment_start,segment_start + segment["rows"]])
+                segment_rows = rows[start:end] - segment_start
+            segment_metadata_list.append((segment_dir,segment_metadata,segment_rows))
+            segment_start += segment["rows"]
+
+        data = {}
+        for column in store_columns:
+            name = column["name"]
+            parts = []
+            for segment_dir,segment_metadata,segment_rows in segment_metadata_list:
+                column_metadata = segment_metadata["columns"][name]
+                array = np.load(os.path.join(segment_dir,column_metadata["file"]),mmap_mode="r",allow_pickle=False)
+                if segment_rows is not None:
+                    array = array[segment_rows]
+                if column["kind"] == COLUMN_KIND_CATEGORY:
+                    array = pd.Categorical.from_codes(array,categories=column_metadata["categories"])
+                parts.append(array)
+
+            if column["kind"] == COLUMN_KIND_CATEGORY:
+                data[name] = pd.api.types.union_categoricals(parts) if len(parts) > 1 else parts[0]
+            elif len(parts) == 1:
+                data[name] = parts[0]
+            else:
+                data[name] = np.concatenate(parts)
+
+        dataframe = pd.DataFrame(data,columns=[column["name"] for column in store_columns])
+        if row_order is not None:
+            dataframe = dataframe.iloc[np.argsort(row_order,kind="stable")].reset_index(drop=True)
+        return dataframe
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
@@ -0,0 +1,105 @@
+from shipment.exception import ShipmentException
+from sklearn.base import clone
+import sklearn
+import numpy as np
+import hashlib
+import json
+import os,sys
+
+# rows hashed at a time, keeps fingerprinting a memory mapped feature store in constant memory
+FINGERPRINT_CHUNK_ROWS = 100000
+
+
+def get_array_fingerprint(*arrays) -> str:
+    """
+    return: sha256 of the shape, dtype and content of the arrays
+    """
+    sha256 = hashlib.sha256()
+    for array in arrays:
+        array = np.asarray(array)
+        sha256.update(f"{array.dtype.str}{array.shape}".encode())
+        for chunk_start in range(0,len(array),FINGERPRINT_CHUNK_ROWS):
+            sha256.update(np.ascontiguousarray(array[chunk_start:chunk_start + FINGERPRINT_CHUNK_ROWS]).tobytes())
+    return sha256.hexdigest()
+
+
+def get_fold_key(train:np.ndarray,test:np.ndarray) -> str:
+    """
+    train: row numbers the candidate is fitted on, a subset of the fold train rows when searching on fewer samples
+    test: row numbers the candidate is scored on
+    return: key of the fold within a cache entry
+    """
+    return get_array_fingerprint(np.asarray(train,dtype=np.int64),np.asarray(test,dtype=np.int64))
+
+
+class CVResultCache:
+
+    def __init__(self,cache_dir:str) -> None:
+        """
+        Cross validation scores kept outside the timestamped artifact tree.
+        Every entry is a json file named after the estimator class, its resolved parameters,
+        the transformed data fingerprint and the scoring, holding the score and fit time of every fold
+        fitted so far, so a search only fits the (candidate, fold) pairs it has not seen.
+        """
+        try:
+            self.cache_dir = cache_dir
+            os.makedirs(cache_dir,exist_ok=True)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    @staticmethod
+    def get_entry_details(estimator,parameters:dict,data_fingerprint:str,scoring=None) -> dict:
+        """
+        return: what the entry key is computed from, the parameters are the full resolved
+                get_params() of the candidate so a changed default is a different entry
+        """
+        candidate = clone(estimator).set_params(**parameters)
+        return {"estimator":f"{type(candidate).__module__}.{type(candidate).__qualname__}",
+                "parameters":{name:repr(value) for name,value in sorted(candidate.get_params(deep=True).items())},
+                "data_fingerprint":data_fingerprint,
+                "scoring":repr(scoring),
+                "sklearn_version":sklearn.__version__}
+
+    @staticmethod
+    def get_entry_key(entry_details:dict) -> str:
+        return hashlib.sha256(json.dumps(entry_details,sort_keys=True).encode()).hexdigest()
+
+    def get_entry_file_path(self,entry_key:str) -> str:
+        return os.path.join(self.cache_dir,f"{entry_key}.json")
+
+    def read_entry(self,entry_key:str) -> dict:
+        """
+        return: {"details": {...}, "folds": {fold key: {"score": .., "fit_time": ..}}}, None when not cached
+        """
+        try:
+            entry_file_path = self.get_entry_file_path(entry_key)
+            if not os.path.exists(entry_file_path):
+                return None
+            with open(entry_file_path) as entry_file:
+                return json.load(entry_file)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_fold_results(self,entry_key:str) -> dict:
+        """
+        return: {fold key: {"score": .., "fit_time": ..}} of the cached folds of the entry
+        """
+        entry = self.read_entry(entry_key)
+        return entry["folds"] if entry is not None else {}
+
+    def store(self,entry_key:str,entry_details:dict,fold_results:dict):
+        """
+        Adds fold results to the entry, the folds already cached are kept.
+        fold_results: {fold key: {"score": .., "fit_time": ..}}
+        """
+        try:
+            entry = self.read_entry(entry_key) or {"details":entry_details,"folds":{}}
+            entry["folds"].update(fold_results)
+            # written next to the entry and renamed so a reader never sees a partly written file
+            entry_file_path = self.get_entry_file_path(entry_key)
+            temp_file_path = f"{entry_file_path}.{os.getpid()}.tmp"
+            with open(temp_file_path,"w") as entry_file:
+                json.dump(entry,entry_file,indent=2)
+            os.replace(temp_file_path,entry_file_path)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
@@ -0,0 +1,146 @@
+from shipment.exception import ShipmentException
+from numpy.lib.format import open_memmap
+import numpy as np
+import json
+import os,sys
+
+FEATURE_STORE_HEADER_FILE_NAME = "header.json"
+FEATURE_FILE_NAME = "X.npy"
+TARGET_FILE_NAME = "y.npy"
+
+FEATURE_STORE_FILE_NAMES = [FEATURE_FILE_NAME,TARGET_FILE_NAME,FEATURE_STORE_HEADER_FILE_NAME]
+
+
+def get_feature_store_file_paths(store_dir:str) -> dict:
+    """
+    return: {file name: file path} of the members of the feature store
+    """
+    return {file_name:os.path.join(store_dir,file_name) for file_name in FEATURE_STORE_FILE_NAMES}
+
+
+class FeatureStoreWriter:
+
+    def __init__(self,store_dir:str,rows:int,n_features:int,feature_dtype=np.float32,target_dtype=np.float64) -> None:
+        """
+        Preallocates X.npy and y.npy of a feature store as memory mapped arrays so that transformed
+        data can be written chunk by chunk without holding the whole feature matrix in memory.
+        rows: number of rows of the store
+        n_features: number of columns of X
+        """
+        try:
+            self.store_dir = store_dir
+            self.file_paths = get_feature_store_file_paths(store_dir)
+            # members are removed rather than overwritten, they may be hard links into the transformation cache
+            for file_path in self.file_paths.values():
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            os.makedirs(store_dir,exist_ok=True)
+
+            feature_dtype,target_dtype = np.dtype(feature_dtype),np.dtype(target_dtype)
+            if feature_dtype.hasobject or target_dtype.hasobject or not np.issubdtype(feature_dtype,np.number) \
+                    or not np.issubdtype(target_dtype,np.number):
+                raise Exception(f"Feature store needs numeric arrays, got [{feature_dtype}] and [{target_dtype}].")
+            if rows > 0:
+                self.X = open_memmap(self.file_paths[FEATURE_FILE_NAME],mode="w+",dtype=feature_dtype,
+                                     shape=(rows,n_features))
+                self.y = open_memmap(self.file_paths[TARGET_FILE_NAME],mode="w+",dtype=target_dtype,shape=(rows,))
+            else:
+                # an empty file can not be memory mapped
+                self.X = np.empty((0,n_features),dtype=feature_dtype)
+                self.y = np.empty(0,dtype=target_dtype)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def write(self,positions,X:np.ndarray,y:np.ndarray=None):
+        """
+        positions: slice or row numbers of the store the rows of X and y are written to
+        """
+        try:
+            self.X[positions] = X
+            if y is not None:
+                self.y[positions] = y
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def close(self,feature_names:list=None,**details) -> str:
+        """
+        Flushes the arrays and writes header.json.
+        feature_names: names of the X columns, e.g. ColumnTransformer.get_feature_names_out()
+        details: recorded in header.json, e.g. the source fingerprint
+        return: store_dir
+        """
+        try:
+            if feature_names is not None and len(feature_names) != self.X.shape[1]:
+                raise Exception(f"{len(feature_names)} feature names given for {self.X.shape[1]} features.")
+            if isinstance(self.X,np.memmap):
+                self.X.flush()
+                self.y.flush()
+            else:
+                np.save(self.file_paths[FEATURE_FILE_NAME],self.X,allow_pickle=False)
+                np.save(self.file_paths[TARGET_FILE_NAME],self.y,allow_pickle=False)
+
+            header = dict(details)
+            header.update({"rows":int(self.X.shape[0]),
+                           "n_features":int(self.X.shape[1]),
+                           "feature_dtype":self.X.dtype.str,
+                           "target_dtype":self.y.dtype.str,
+                           "feature_names":[str(name) for name in feature_names] if feature_names is not None else None})
+            self.X,self.y = None,None
+            with open(self.file_paths[FEATURE_STORE_HEADER_FILE_NAME],"w") as header_file:
+                json.dump(header,header_file,indent=2)
+            return self.store_dir
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+
+def save_feature_store(store_dir:str,X:np.ndarray,y:np.ndarray,feature_names:list=None,**details) -> str:
+    """
+    Writes transformed data as a feature store directory:
+        X.npy       -> 2d C contiguous feature array, numeric dtype
+        y.npy       -> 1d target array, numeric dtype
+        header.json -> shape, dtypes, feature names and details, written last
+    Both arrays are plain .npy files without pickled objects so they can be memory mapped.
+    return: store_dir
+    """
+    try:
+        X = np.asarray(X)
+        y = np.asarray(y)
+        if X.ndim != 2 or y.ndim != 1 or len(X) != len(y):
+            raise Exception(f"Feature store needs a 2d X and 1d y of the same length, got {X.shape} and {y.shape}.")
+        feature_store_writer = FeatureStoreWriter(store_dir=store_dir,rows=X.shape[0],n_features=X.shape[1],
+                                                  feature_dtype=X.dtype,target_dtype=y.dtype)
+        feature_store_writer.write(positions=slice(None),X=X,y=y)
+        return feature_store_writer.close(feature_names=feature_names,**details)
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
+
+
+def is_feature_store(store_dir:str) -> bool:
+    return store_dir is not None and os.path.exists(os.path.join(store_dir,FEATURE_STORE_HEADER_FILE_NAME))
+
+
+def read_feature_store_header(store_dir:str) -> dict:
+    try:
+        with open(os.path.join(store_dir,FEATURE_STORE_HEADER_FILE_NAME)) as header_file:
+            return json.load(header_file)
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
+
+
+def load_feature_store(store_dir:str,mmap_mode:str="r"):
+    """
+    store_dir: str location of the feature store
+    mmap_mode: np.load mmap_mode, "r" maps the arrays read only so that processes share the pages,
+               None reads them into memory
+    return: X, y
+    """
+    try:
+        header = read_feature_store_header(store_dir)
+        file_paths = get_feature_store_file_paths(store_dir)
+        X = np.load(file_paths[FEATURE_FILE_NAME],mmap_mode=mmap_mode,allow_pickle=False)
+        y = np.load(file_paths[TARGET_FILE_NAME],mmap_mode=mmap_mode,allow_pickle=False)
+        if X.shape != (header["rows"],header["n_features"]) or len(y) != header["rows"]:
+            raise Exception(f"Feature store [{store_dir}] does not match its header.")
+        return X,y
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
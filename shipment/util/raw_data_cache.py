@@ -0,0 +1,225 @@
+from shipment.exception import ShipmentException
+from shipment.logger import logging
+from shipment.util.util import read_yaml_file,write_yaml_file
+from urllib.parse import urlparse
+from urllib.request import Request,urlopen,url2pathname
+from urllib.error import HTTPError
+import hashlib
+import shutil
+import os,sys
+
+CACHE_INDEX_FILE_NAME = "index.yaml"
+CACHE_OBJECTS_DIR_NAME = "objects"
+CACHE_SOURCES_KEY = "sources"
+CACHE_SHA256_KEY = "sha256"
+CACHE_SIZE_KEY = "size"
+CACHE_MTIME_KEY = "mtime_ns"
+CACHE_ETAG_KEY = "etag"
+CACHE_LAST_MODIFIED_KEY = "last_modified"
+CACHE_LAST_INGESTION_KEY = "last_ingestion"
+CACHE_INGESTION_FINGERPRINT_KEY = "ingestion_fingerprint"
+CACHE_ARTIFACT_KEY = "artifact"
+CACHE_BATCHES_KEY = "batches"
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def get_file_sha256(file_path:str) -> str:
+    try:
+        sha256 = hashlib.sha256()
+        with open(file_path,"rb") as file_obj:
+            for block in iter(lambda: file_obj.read(HASH_BLOCK_SIZE),b""):
+                sha256.update(block)
+        return sha256.hexdigest()
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
+
+
+def get_local_source_path(source:str) -> str:
+    """
+    return: local file path for file:// urls and plain paths, None for remote urls
+    """
+    parsed_source = urlparse(source)
+    if parsed_source.scheme == "file":
+        return url2pathname(parsed_source.path)
+    # single letter schemes are windows drive letters
+    if len(parsed_source.scheme) <= 1 or os.path.exists(source):
+        return source
+    return None
+
+
+def link_or_copy(source_path:str,destination_path:str):
+    """
+    Hard links source_path to destination_path and falls back to a copy
+    when the two paths are not on the same file system.
+    """
+    try:
+        if os.path.exists(destination_path):
+            os.remove(destination_path)
+        os.makedirs(os.path.dirname(destination_path),exist_ok=True)
+        try:
+            os.link(source_path,destination_path)
+        except OSError:
+            shutil.copyfile(source_path,destination_path)
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
+
+
+class RawDataCache:
+
+    def __init__(self,cache_dir:str) -> None:
+        """
+        Content-addressed cache of raw dataset files kept outside the timestamped artifact tree.
+        Files are stored once under objects/<sha256>; index.yaml remembers per source url/path
+        the last checksum, the validators used for conditional refresh and the last successful ingestion.
+        """
+        try:
+            self.cache_dir = cache_dir
+            self.objects_dir = os.path.join(cache_dir,CACHE_OBJECTS_DIR_NAME)
+            self.index_file_path = os.path.join(cache_dir,CACHE_INDEX_FILE_NAME)
+            os.makedirs(self.objects_dir,exist_ok=True)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def read_index(self) -> dict:
+        if not os.path.exists(self.index_file_path):
+            return {CACHE_SOURCES_KEY:{}}
+        index = read_yaml_file(file_path=self.index_file_path) or {}
+        index.setdefault(CACHE_SOURCES_KEY,{})
+        return index
+
+    def get_source_entry(self,source:str) -> dict:
+        return dict(self.read_index()[CACHE_SOURCES_KEY].get(source) or {})
+
+    def update_source_entry(self,source:str,**values):
+        try:
+            index = self.read_index()
+            source_entry = dict(index[CACHE_SOURCES_KEY].get(source) or {})
+            source_entry.update(values)
+            index[CACHE_SOURCES_KEY][source] = source_entry
+            write_yaml_file(file_path=self.index_file_path,data=index)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_object_path(self,sha256:str) -> str:
+        return os.path.join(self.objects_dir,sha256)
+
+    def has_object(self,sha256:str) -> bool:
+        return sha256 is not None and os.path.exists(self.get_object_path(sha256))
+
+    def add_object(self,file_path:str,sha256:str,move:bool=False) -> str:
+        """
+        Puts file_path into the cache under its checksum, keeping the existing object if already present.
+        """
+        try:
+            object_path = self.get_object_path(sha256)
+            if os.path.exists(object_path):
+                if move:
+                    os.remove(file_path)
+                return object_path
+            if move:
+                os.replace(file_path,object_path)
+            else:
+                temp_object_path = f"{object_path}.tmp"
+                shutil.copyfile(file_path,temp_object_path)
+                os.replace(temp_object_path,object_path)
+            return object_path
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def fetch_local(self,source:str,source_path:str) -> str:
+        try:
+            source_entry = self.get_source_entry(source)
+            file_stat = os.stat(source_path)
+
+            if source_entry.get(CACHE_SIZE_KEY) == file_stat.st_size \
+                    and source_entry.get(CACHE_MTIME_KEY) == file_stat.st_mtime_ns \
+                    and self.has_object(source_entry.get(CACHE_SHA256_KEY)):
+                logging.info(f"Source [{source}] unchanged since last run, using cached copy.")
+                return source_entry[CACHE_SHA256_KEY]
+
+            sha256 = get_file_sha256(file_path=source_path)
+            self.add_object(file_path=source_path,sha256=sha256)
+            self.update_source_entry(source,**{CACHE_SHA256_KEY:sha256,
+                                               CACHE_SIZE_KEY:file_stat.st_size,
+                                               CACHE_MTIME_KEY:file_stat.st_mtime_ns})
+            return sha256
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def fetch_remote(self,source:str) -> str:
+        try:
+            source_entry = self.get_source_entry(source)
+            cached_sha256 = source_entry.get(CACHE_SHA256_KEY)
+
+            request = Request(source)
+            if self.has_object(cached_sha256):
+                if source_entry.get(CACHE_ETAG_KEY):
+                    request.add_header("If-None-Match",source_entry[CACHE_ETAG_KEY])
+                if source_entry.get(CACHE_LAST_MODIFIED_KEY):
+                    request.add_header("If-Modified-Since",source_entry[CACHE_LAST_MODIFIED_KEY])
+
+            try:
+                response = urlopen(request)
+            except HTTPError as e:
+                if e.code == 304:
+                    logging.info(f"Source [{source}] not modified, using cached copy.")
+                    return cached_sha256
+                raise
+
+            sha256 = hashlib.sha256()
+            temp_file_path = os.path.join(self.objects_dir,f"download-{os.getpid()}.tmp")
+            with response, open(temp_file_path,"wb") as temp_file:
+                for block in iter(lambda: response.read(HASH_BLOCK_SIZE),b""):
+                    sha256.update(block)
+                    temp_file.write(block)
+            sha256 = sha256.hexdigest()
+
+            self.add_object(file_path=temp_file_path,sha256=sha256,move=True)
+            self.update_source_entry(source,**{CACHE_SHA256_KEY:sha256,
+                                               CACHE_ETAG_KEY:response.headers.get("ETag"),
+                                               CACHE_LAST_MODIFIED_KEY:response.headers.get("Last-Modified")})
+            return sha256
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def fetch(self,source:str) -> str:
+        """
+        Makes sure the current content of source is in the cache.
+        source: http(s) url, file:// url or local path
+        return: sha256 checksum of the content
+        """
+        try:
+            source_path = get_local_source_path(source)
+            if source_path is not None:
+                return self.fetch_local(source=source,source_path=source_path)
+            return self.fetch_remote(source=source)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_last_ingestion_entry(self,source:str) -> dict:
+        """
+        return: record of the last successful ingestion of source, empty when there is none
+        """
+        return dict(self.get_source_entry(source).get(CACHE_LAST_INGESTION_KEY) or {})
+
+    def get_last_ingestion(self,source:str,sha256:str,ingestion_fingerprint:str) -> dict:
+        """
+        return: artifact of the last successful ingestion of this exact content and settings, else None
+        """
+        last_ingestion = self.get_last_ingestion_entry(source)
+        if last_ingestion.get(CACHE_SHA256_KEY) == sha256 \
+                and last_ingestion.get(CACHE_INGESTION_FINGERPRINT_KEY) == ingestion_fingerprint:
+            return last_ingestion.get(CACHE_ARTIFACT_KEY)
+        return None
+
+    def record_ingestion(self,source:str,sha256:str,ingestion_fingerprint:str,artifact:dict,batches:list=None):
+        """
+        batches: [{"source": batch file, "sha256": checksum}] ingested into the artifact, for incremental ingestion
+        """
+        last_ingestion = {CACHE_SHA256_KEY:sha256,
+                          CACHE_INGESTION_FINGERPRINT_KEY:ingestion_fingerprint,
+                          CACHE_ARTIFACT_KEY:artifact}
+        if batches is not None:
+            last_ingestion[CACHE_BATCHES_KEY] = batches
+        self.update_source_entry(source,**{CACHE_LAST_INGESTION_KEY:last_ingestion})
@@ -0,0 +1,153 @@
+from shipment.exception import ShipmentException
+import numpy as np
+import json
+import os,sys
+
+SPLIT_MANIFEST_FILE_NAME = "manifest.json"
+TRAIN_ROWS_FILE_NAME = "train.npy"
+TEST_ROWS_FILE_NAME = "test.npy"
+FOLD_IDS_FILE_NAME = "folds.npy"
+
+SPLIT_TRAIN = "train"
+SPLIT_TEST = "test"
+
+# manifest.json key of the raw data snapshots the store was built from, oldest first,
+# each with the number of store rows it had, rows after it were appended by later incremental ingestions
+SPLIT_MANIFEST_SNAPSHOTS_KEY = "snapshots"
+SNAPSHOT_SOURCE_SHA256_KEY = "source_sha256"
+SNAPSHOT_STORE_ROWS_KEY = "store_rows"
+
+ROW_INDEX_DTYPE = np.int32
+FOLD_ID_DTYPE = np.int8
+
+
+class SplitManifestWriter:
+
+    def __init__(self,manifest_dir:str) -> None:
+        """
+        Writes the train/test membership of an ingested columnar store as row numbers.
+        Inside manifest_dir:
+            train.npy     -> int32 row numbers of the train rows, in train order
+            test.npy      -> int32 row numbers of the test rows, in test order
+            folds.npy     -> int8 cross validation fold id of every train row
+            manifest.json -> fingerprint, seed and row counts the split was made with
+        manifest_dir: directory of the manifest, recreated if it exists
+        """
+        try:
+            self.manifest_dir = manifest_dir
+            self.train_rows = []
+            self.test_rows = []
+            self.fold_ids = []
+
+            if os.path.exists(manifest_dir):
+                for file_name in [SPLIT_MANIFEST_FILE_NAME,TRAIN_ROWS_FILE_NAME,TEST_ROWS_FILE_NAME,FOLD_IDS_FILE_NAME]:
+                    if os.path.exists(os.path.join(manifest_dir,file_name)):
+                        os.remove(os.path.join(manifest_dir,file_name))
+            os.makedirs(manifest_dir,exist_ok=True)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def add(self,train_rows:np.ndarray,test_rows:np.ndarray,fold_ids:np.ndarray):
+        """
+        train_rows, test_rows: row numbers in the store
+        fold_ids: fold id of each train row
+        """
+        try:
+            if len(train_rows) != len(fold_ids):
+                raise Exception(f"Every train row needs a fold id.")
+            self.train_rows.append(np.asarray(train_rows,dtype=ROW_INDEX_DTYPE))
+            self.test_rows.append(np.asarray(test_rows,dtype=ROW_INDEX_DTYPE))
+            self.fold_ids.append(np.asarray(fold_ids,dtype=FOLD_ID_DTYPE))
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def extend(self,source_manifest_dir:str,row_offset:int):
+        """
+        Adds the split of another manifest whose store rows were appended at row_offset.
+        """
+        try:
+            self.add(train_rows=load_split_rows(source_manifest_dir,SPLIT_TRAIN) + row_offset,
+                     test_rows=load_split_rows(source_manifest_dir,SPLIT_TEST) + row_offset,
+                     fold_ids=load_fold_ids(source_manifest_dir))
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def close(self,**details) -> str:
+        """
+        Writes the row arrays and manifest.json.
+        details: split settings recorded in manifest.json, e.g. source fingerprint and seed
+        return: manifest_dir
+        """
+        try:
+            arrays = {TRAIN_ROWS_FILE_NAME:self.train_rows,TEST_ROWS_FILE_NAME:self.test_rows,
+                      FOLD_IDS_FILE_NAME:self.fold_ids}
+            dtypes = {TRAIN_ROWS_FILE_NAME:ROW_INDEX_DTYPE,TEST_ROWS_FILE_NAME:ROW_INDEX_DTYPE,
+                      FOLD_IDS_FILE_NAME:FOLD_ID_DTYPE}
+            for file_name,parts in arrays.items():
+                array = np.concatenate(parts) if len(parts) > 0 else np.empty(0,dtype=dtypes[file_name])
+                np.save(os.path.join(self.manifest_dir,file_name),array,allow_pickle=False)
+
+            manifest = dict(details)
+            manifest["rows"] = {SPLIT_TRAIN:int(sum(len(part) for part in self.train_rows)),
+                                SPLIT_TEST:int(sum(len(part) for part in self.test_rows))}
+            with open(os.path.join(self.manifest_dir,SPLIT_MANIFEST_FILE_NAME),"w") as manifest_file:
+                json.dump(manifest,manifest_file,indent=2)
+            return self.manifest_dir
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+
+def is_split_manifest(manifest_dir:str) -> bool:
+    return manifest_dir is not None and os.path.exists(os.path.join(manifest_dir,SPLIT_MANIFEST_FILE_NAME))
+
+
+def read_split_manifest(manifest_dir:str) -> dict:
+    try:
+        with open(os.path.join(manifest_dir,SPLIT_MANIFEST_FILE_NAME)) as manifest_file:
+            return json.load(manifest_file)
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
+
+
+def get_last_snapshot(manifest_dir:str) -> dict:
+    """
+    return: {"source_sha256": .., "store_rows": ..} of the raw data the manifest was built from,
+            None for manifests written without snapshots
+    """
+    snapshots = read_split_manifest(manifest_dir).get(SPLIT_MANIFEST_SNAPSHOTS_KEY) or []
+    return snapshots[-1] if len(snapshots) > 0 else None
+
+
+def get_snapshot_store_rows(manifest_dir:str,source_sha256:str) -> int:
+    """
+    source_sha256: checksum of an earlier raw data snapshot
+    return: number of store rows of that snapshot when the store of the manifest was extended from it,
+            the store rows from there on were added since, None when it is not in the manifest history
+    """
+    for snapshot in read_split_manifest(manifest_dir).get(SPLIT_MANIFEST_SNAPSHOTS_KEY) or []:
+        if snapshot[SNAPSHOT_SOURCE_SHA256_KEY] == source_sha256:
+            return snapshot[SNAPSHOT_STORE_ROWS_KEY]
+    return None
+
+
+def load_split_rows(manifest_dir:str,split:str) -> np.ndarray:
+    """
+    manifest_dir: str location of the manifest
+    split: str train or test
+    return: np.array row numbers of the split in the ingested store
+    """
+    try:
+        file_name = {SPLIT_TRAIN:TRAIN_ROWS_FILE_NAME,SPLIT_TEST:TEST_ROWS_FILE_NAME}[split]
+        return np.load(os.path.join(manifest_dir,file_name),allow_pickle=False)
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
+
+
+def load_fold_ids(manifest_dir:str) -> np.ndarray:
+    """
+    return: np.array fold id of every train row, usable as sklearn PredefinedSplit test_fold
+    """
+    try:
+        return np.load(os.path.join(manifest_dir,FOLD_IDS_FILE_NAME),allow_pickle=False)
+    except Exception as e:
+        raise ShipmentException(e,sys) from e
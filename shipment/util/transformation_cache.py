@@ -0,0 +1,78 @@
+from shipment.exception import ShipmentException
+from shipment.util.raw_data_cache import link_or_copy
+import shutil
+import json
+import os,sys
+
+CACHE_ENTRY_FILE_NAME = "entry.json"
+
+
+class TransformationCache:
+
+    def __init__(self,cache_dir:str) -> None:
+        """
+        Fitted preprocessing objects and transformed arrays kept outside the timestamped artifact tree.
+        Every entry is a directory named after its cache key holding the cached files and entry.json,
+        which is written last so only complete entries are ever used.
+        """
+        try:
+            self.cache_dir = cache_dir
+            os.makedirs(cache_dir,exist_ok=True)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def get_entry_dir(self,cache_key:str) -> str:
+        return os.path.join(self.cache_dir,cache_key)
+
+    def read_entry(self,cache_key:str) -> dict:
+        """
+        return: {"files": {name: file name}, "details": {...}} of a complete entry, else None
+        """
+        entry_file_path = os.path.join(self.get_entry_dir(cache_key),CACHE_ENTRY_FILE_NAME)
+        if not os.path.exists(entry_file_path):
+            return None
+        with open(entry_file_path) as entry_file:
+            entry = json.load(entry_file)
+        entry_dir = self.get_entry_dir(cache_key)
+        if not all(os.path.exists(os.path.join(entry_dir,file_name)) for file_name in entry["files"].values()):
+            return None
+        return entry
+
+    def restore(self,cache_key:str,file_paths:dict) -> bool:
+        """
+        Links the cached files of the entry to file_paths.
+        file_paths: {name: destination file path}, names as given to store()
+        return: True on a cache hit
+        """
+        try:
+            entry = self.read_entry(cache_key)
+            if entry is None or set(entry["files"]) != set(file_paths):
+                return False
+            entry_dir = self.get_entry_dir(cache_key)
+            for name,file_path in file_paths.items():
+                link_or_copy(source_path=os.path.join(entry_dir,entry["files"][name]),destination_path=file_path)
+            return True
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
+
+    def store(self,cache_key:str,file_paths:dict,**details):
+        """
+        Adds the files of a run to the cache under cache_key.
+        file_paths: {name: file path of this run}
+        details: what the key was computed from, kept in entry.json
+        """
+        try:
+            entry_dir = self.get_entry_dir(cache_key)
+            if os.path.exists(entry_dir):
+                shutil.rmtree(entry_dir)
+            os.makedirs(entry_dir,exist_ok=True)
+
+            files = {}
+            for name,file_path in file_paths.items():
+                files[name] = f"{name}{os.path.splitext(file_path)[1]}"
+                link_or_copy(source_path=file_path,destination_path=os.path.join(entry_dir,files[name]))
+
+            with open(os.path.join(entry_dir,CACHE_ENTRY_FILE_NAME),"w") as entry_file:
+                json.dump({"files":files,"details":details},entry_file,indent=2)
+        except Exception as e:
+            raise ShipmentException(e,sys) from e
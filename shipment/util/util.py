@@ -1,11 +1,14 @@
 from operator import index
 from shipment.exception import ShipmentException
+from shipment.logger import logging
 from shipment.constant import *
 import yaml
 import pandas as pd
 import numpy as np
 import dill
 import os,sys
+from shipment.util.columnar_store import is_columnar_store,load_columnar_data
+from shipment.config.registry import get_schema
 
 def read_yaml_file(file_path:str)-> dict:
     """
@@ -83,25 +86,56 @@ def load_numpy_array_data(file_path: str) -> np.array:
         raise ShipmentException(e, sys) from e
 
 
-def load_data(file_path: str, schema_file_path: str) -> pd.DataFrame:
+def load_data(file_path: str, schema_file_path: str, store_path: str = None, rows: np.ndarray = None,
+              columns: list = None) -> pd.DataFrame:
+    """
+    Loads an ingested dataset typed by the schema: categorical columns as pandas category,
+    numerical columns as the schema float_dtype and datetime columns parsed with the schema datetime_format.
+    file_path: str csv file of the dataset
+    schema_file_path: str schema file
+    store_path: str optional columnar store of the same dataset, read instead of the csv when present
+    rows: np.array optional row numbers of the store to load, e.g. a split of the split manifest
+    columns: list optional subset of columns to load
+    """
     try:
-        datatset_schema = read_yaml_file(schema_file_path)
+        dataset_schema = get_schema(schema_file_path=schema_file_path)
 
-        schema = datatset_schema[DATASET_COLUMNS_KEY]
-
-        dataframe = pd.read_csv(file_path)
+        if is_columnar_store(store_path):
+            dataframe = load_columnar_data(store_dir=store_path,columns=columns,rows=rows)
+            source_name = f"store [{store_path}]"
+        else:
+            dataset_columns = list(pd.read_csv(file_path,nrows=0).columns)
+            usecols = [column for column in dataset_columns if columns is None or column in columns]
+            read_csv_dtypes = dict(dataset_schema.read_csv_dtypes)
+            # dates repeat a lot, they are read as category so every distinct date string is parsed once
+            read_csv_dtypes.update({column:"category" for column in dataset_schema.datetime_columns})
+            dataframe = pd.read_csv(file_path,usecols=usecols,
+                                    dtype={column:dtype for column,dtype in read_csv_dtypes.items()
+                                           if column in usecols})
+            for column in dataset_schema.datetime_columns:
+                if column in dataframe.columns:
+                    dates = dataframe[column].cat
+                    parsed_dates = pd.to_datetime(dates.categories,format=dataset_schema.datetime_format,
+                                                  errors="coerce")
+                    # missing dates have code -1 and pick the appended NaT
+                    dataframe[column] = np.append(parsed_dates.to_numpy(),np.datetime64("NaT"))[dates.codes]
+            source_name = f"csv file [{file_path}] of [{os.path.getsize(file_path)}] bytes"
 
         error_messgae = ""
-
-
         for column in dataframe.columns:
-            if column in list(schema.keys()):
-                dataframe[column].astype(schema[column])
-            else:
+            if column not in dataset_schema.column_index:
                 error_messgae = f"{error_messgae} \nColumn: [{column}] is not in the schema."
         if len(error_messgae) > 0:
             raise Exception(error_messgae)
+
+        downcast_columns = [column for column in dataset_schema.numerical_columns
+                            if column in dataframe.columns and dataframe[column].dtype != dataset_schema.float_dtype]
+        if len(downcast_columns) > 0:
+            dataframe[downcast_columns] = dataframe[downcast_columns].astype(dataset_schema.float_dtype)
+
+        logging.info(f"Loaded [{len(dataframe)}] rows from {source_name}: "
+                     f"[{int(dataframe.memory_usage(deep=True).sum())}] bytes in memory")
         return dataframe
 
     except Exception as e:
-        raise ShipmentException(e,sys) from e
\ No newline at end of file
+        raise ShipmentException(e,sys) from e